@@ -1,10 +1,23 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
+import asyncio
 import json
+import os
+import time
 import uvicorn
-from pose_worker import PoseAnalysisWorker
-from tts_worker import get_tts_audio
+from pose_pool import PosePool
+import frame_protocol
+from frame_mailbox import LatestFrameMailbox, FlowStats
+from frame_scheduler import ComplexityController, FrameScheduler
+import metrics
+import readiness
+import coop_relay
+import pose_history
+from meditation import generate_script, stream_meditation_audio, warm_up_llm
+import tts_worker
+from tts_worker import get_tts_audio, stream_tts_audio, cached_audio_response, close_client as close_tts_client
 import traceback
 
 app = FastAPI()
@@ -17,59 +30,327 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize pose worker
-pose_worker = None
-try:
-    pose_worker = PoseAnalysisWorker()
-    print("✅ PoseAnalysisWorker initialized.")
-except Exception as e:
-    print("❌ Error initializing PoseWorker:")
-    traceback.print_exc()
+# Pose inference runs in a pool of worker processes (POSE_WORKERS, default: one per core).
+# It is started on app startup rather than at import time, because the spawned
+# workers re-import this module.
+pose_pool = None
+_startup_tasks = []
+
+# Shares inference capacity fairly between sessions; POSE_MAX_FPS is the per-client ceiling
+frame_scheduler = FrameScheduler(max_fps=float(os.getenv("POSE_MAX_FPS", "15") or 15))
+# Moves sessions to a lighter MediaPipe model when frames take longer than POSE_TARGET_LATENCY_MS,
+# between POSE_MIN_COMPLEXITY and POSE_MAX_COMPLEXITY (0 lite, 1 full, 2 heavy)
+complexity_controller = ComplexityController(
+    target_latency=float(os.getenv("POSE_TARGET_LATENCY_MS", "150") or 150) / 1000,
+    min_tier=int(os.getenv("POSE_MIN_COMPLEXITY", "0") or 0),
+    max_tier=int(os.getenv("POSE_MAX_COMPLEXITY", "1") or 1),
+)
+
+# Compact landmark/rule history of each session for /pose_sessions/{id}/summary
+history = pose_history.from_env()
+
+# Co-op rooms: relays landmarks/stats between partners (see coop_relay.py)
+relay = coop_relay.from_env()
+
+@app.on_event("startup")
+async def start_subsystems():
+    # Nothing here blocks startup: each enabled subsystem (SUBSYSTEMS, see readiness.py)
+    # initializes in the background and reports its progress on /ready.
+    for subsystem, start in ((readiness.POSE, start_pose_pool), (readiness.TTS, start_tts), (readiness.LLM, start_llm)):
+        if subsystem.enabled:
+            _startup_tasks.append(asyncio.create_task(start()))
+
+async def start_pose_pool():
+    global pose_pool
+    try:
+        # POSE_MOTION_THRESHOLD (gray levels, e.g. 2.0) enables the motion gate: near-identical
+        # frames reuse the previous landmarks instead of running inference again.
+        motion_threshold = float(os.getenv("POSE_MOTION_THRESHOLD", "0") or 0) or None
+        # POSE_PROCESS_WIDTH (pixels) decodes frames straight to a smaller size before inference;
+        # POSE_ROI_CROP=1 additionally crops to a box around the previous frame's landmarks.
+        process_width = int(os.getenv("POSE_PROCESS_WIDTH", "0") or 0) or None
+        roi_crop = os.getenv("POSE_ROI_CROP", "0").lower() in ("1", "true", "yes")
+        # POSE_BACKEND=stub serves fake landmarks (no mediapipe needed), e.g. for load tests;
+        # POSE_STUB_LATENCY_MS makes the stub burn that much CPU per frame.
+        pose_pool = PosePool(
+            backend=os.getenv("POSE_BACKEND", "mediapipe"),
+            stub_latency_ms=float(os.getenv("POSE_STUB_LATENCY_MS", "0") or 0),
+            motion_threshold=motion_threshold,
+            process_width=process_width,
+            roi_crop=roi_crop,
+            model_complexity=complexity_controller.max_tier,
+            model_tiers=range(complexity_controller.min_tier, complexity_controller.max_tier + 1),
+        )
+        # Spawns the workers, pushes a blank frame through a Pose graph in each and loads
+        # the lighter model tiers sessions may drop to
+        await pose_pool.start()
+        readiness.POSE.mark_ready()
+        print(f"✅ PosePool started with {pose_pool.num_workers} {pose_pool.backend} workers.")
+    except Exception as e:
+        print("❌ Error starting PosePool:")
+        traceback.print_exc()
+        readiness.POSE.mark_failed(e)
+
+async def start_tts():
+    try:
+        await asyncio.to_thread(tts_worker.get_audio_cache)
+        note = None if tts_worker.API_KEY else "ELEVENLABS_API_KEY not set: only cached audio can be served"
+        readiness.TTS.mark_ready(note)
+    except Exception as e:
+        print("❌ Error starting TTS:")
+        traceback.print_exc()
+        readiness.TTS.mark_failed(e)
+
+async def start_llm():
+    try:
+        # Importing google-genai is the slow part; keep it off the event loop
+        await asyncio.to_thread(warm_up_llm)
+        readiness.LLM.mark_ready()
+    except Exception as e:
+        # ImportError: google-genai isn't installed; RuntimeError: no GEMINI_API_KEY
+        print(f"❌ LLM unavailable: {e}")
+        readiness.LLM.mark_failed(f"{type(e).__name__}: {e}")
+
+@app.on_event("shutdown")
+async def stop_subsystems():
+    for task in _startup_tasks:
+        task.cancel()
+    if pose_pool is not None:
+        pose_pool.shutdown()
+    history.shutdown()
+    await close_tts_client()
 
 class TTSRequest(BaseModel):
     text: str
+    # Split into sentences, synthesize them in parallel and stream the audio as it's ready
+    chunked: bool = False
+
+class CustomMeditationRequest(BaseModel):
+    issue: str
+    minutes: float = 5
+    tone: str = "calm"
+    style: str = "breathing"
+    # False returns {"text": script} instead of the streamed audio
+    audio: bool = True
 
-# --- WebSocket: SIMPLE PROCESSING ONLY ---
-# No rooms, no broadcasting. Just Input -> AI -> Output.
+# --- WebSocket: POSE ANALYSIS ---
+# One client's own frames: Input -> AI -> Output. Sharing results with partners is the
+# co-op relay's job (/ws/coop/{room_id} below).
+# Clients that request the frame_protocol subprotocol exchange raw JPEG bytes;
+# everyone else keeps the original JSON + base64 data URL messages.
+# ?output=landmarks returns quantized landmarks + stats instead of an annotated JPEG.
+# About once a second the server also sends a {"type": "flow", ...} text message with
+# received/processed/dropped/skipped (motion gate) counts and average queue/processing time.
+# ?timings=1 adds per-stage milliseconds to every result ("timings", or "_timings" in binary stats).
+# A "seq" field on a JSON frame is echoed back on its result.
+# Mode "auto" recognizes the pose from the landmarks and reports it as "Pose" in the stats.
+# Each session is processed at most at its granted rate (see frame_scheduler.py), which the
+# flow message reports as "granted_fps"; ?max_fps=N asks for a lower ceiling than POSE_MAX_FPS.
+# Under load a session may also drop to a lighter pose model (reported as "model_complexity"
+# in the flow message) and climbs back once there is headroom.
+# The first message is {"type": "session", "session_id": ...}: the id for /pose_sessions/{id}/summary.
 @app.websocket("/ws/analyze")
 async def websocket_endpoint(websocket: WebSocket):
-    await websocket.accept()
-    
-    if pose_worker is None:
-        await websocket.close(code=1011)
+    binary = frame_protocol.SUBPROTOCOL in websocket.scope.get("subprotocols", [])
+    await websocket.accept(subprotocol=frame_protocol.SUBPROTOCOL if binary else None)
+    output = websocket.query_params.get("output", frame_protocol.OUTPUT_IMAGE)
+    if output not in frame_protocol.OUTPUT_MODES:
+        output = frame_protocol.OUTPUT_IMAGE
+    include_timings = websocket.query_params.get("timings", "").lower() in ("1", "true", "yes")
+    try:
+        max_fps = float(websocket.query_params.get("max_fps", 0)) or None
+    except ValueError:
+        max_fps = None
+
+    if not readiness.POSE.ready:
+        # 1013 "try again later" while the pool warms up; 1011 if pose is off or failed
+        await websocket.close(code=1013 if readiness.POSE.state == readiness.STARTING else 1011)
         return
 
+    # Pin this connection to one worker so its tracking state stays in one place
+    session_id = pose_pool.open_session()
+    frame_scheduler.add(session_id, pose_pool.worker_of(session_id), max_fps)
+    complexity_controller.add(session_id)
+    history_id = history.open()
+    metrics.WS_ACTIVE.inc()
+
+    # Latest-frame-wins: the reader keeps overwriting a one-slot mailbox while the
+    # processor is busy, so a slow worker drops stale frames instead of lagging behind.
+    mailbox = LatestFrameMailbox()
+    flow = FlowStats(mailbox)
+
+    async def receive_frames():
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                dropped = mailbox.dropped
+                mailbox.put(message)
+                frame_scheduler.note_arrival(session_id)
+                metrics.WS_FRAMES_IN.inc()
+                if mailbox.dropped != dropped:
+                    metrics.WS_FRAMES_DROPPED.inc()
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+        finally:
+            mailbox.close()
+
+    receiver = asyncio.create_task(receive_frames())
     try:
+        if history_id:
+            await websocket.send_text(json.dumps({"type": "session", "session_id": history_id}))
         while True:
-            data = await websocket.receive_text()
-            try:
-                message = json.loads(data)
-            except json.JSONDecodeError:
-                continue
+            # Hold back until this session's next slot; newer frames replace older ones meanwhile
+            await frame_scheduler.pace(session_id)
+            message, queue_age = await mailbox.get()
+            if message is None:
+                break
 
-            # 1. Process the frame locally
+            started = time.perf_counter()
             try:
-                # process_frame returns a JSON string
-                result_json = pose_worker.process_frame(
-                    message.get('image'), 
-                    message.get('mode')
+                frame_info = await analyze_message(
+                    websocket, session_id, message, output, include_timings,
+                    complexity_controller.tier(session_id)
                 )
-                
-                # 2. Send it RIGHT BACK to the same frontend
-                await websocket.send_text(result_json)
-
             except Exception as e:
                 print(f"Processing Error: {e}")
-                
-    except WebSocketDisconnect:
+                frame_info = None
+            elapsed = time.perf_counter() - started
+            flow.record(queue_age, elapsed, frame_info)
+            if frame_info:
+                history.record(history_id, frame_info)
+                frame_scheduler.record(
+                    session_id, sum(frame_info.get("timings", {}).values()), frame_info.get("inferred", True)
+                )
+                metrics.observe_frame(frame_info)
+                metrics.POSE_FRAME_SECONDS.observe(queue_age + elapsed)
+                if frame_info.get("inferred", True):
+                    # Motion-gated frames cost nothing, so only inferred ones steer the tier
+                    complexity_controller.record(
+                        session_id, queue_age + elapsed, frame_scheduler.throttled(session_id),
+                        frame_info.get("tier")
+                    )
+
+            # Periodically tell the client how far behind we are so it can adapt its send rate
+            if flow.report_due():
+                report = flow.report()
+                report["granted_fps"] = frame_scheduler.granted_fps(session_id)
+                report["model_complexity"] = complexity_controller.tier(session_id)
+                await websocket.send_text(json.dumps(report))
+
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
         print("Client disconnected")
+        receiver.cancel()
+        frame_scheduler.remove(session_id)
+        complexity_controller.remove(session_id)
+        history.close(history_id)
+        metrics.WS_ACTIVE.dec()
+        await pose_pool.close_session(session_id)
+
+async def analyze_message(websocket: WebSocket, session_id, message, output, include_timings=False,
+                          complexity=None):
+    """
+    Runs one received WebSocket message through the pose pool and sends the result back.
+    Returns the worker's frame info, or None if the message wasn't a usable frame.
+    """
+    # 1. Process the frame in this session's worker (never on the event loop)
+    if message.get("bytes") is not None:
+        try:
+            mode, jpeg_bytes = frame_protocol.unpack_frame(message["bytes"])
+        except ValueError:
+            return None
+        result, frame_info = await pose_pool.process_binary(
+            session_id, jpeg_bytes, mode, output, include_timings, complexity
+        )
+        if result:
+            await websocket.send_bytes(result)
+            metrics.WS_FRAMES_OUT.inc()
+        return frame_info
+
+    try:
+        payload = json.loads(message.get("text") or "")
+    except json.JSONDecodeError:
+        return None
 
+    # process_frame returns a JSON string
+    result_json, frame_info = await pose_pool.process_frame(
+        session_id,
+        payload.get('image'),
+        payload.get('mode'),
+        output,
+        include_timings,
+        payload.get('seq'),
+        complexity
+    )
+
+    # 2. Send it RIGHT BACK to the same frontend
+    if result_json:
+        await websocket.send_text(result_json)
+        metrics.WS_FRAMES_OUT.inc()
+    return frame_info
+
+# --- WebSocket: CO-OP RELAY ---
+# Each member publishes the landmarks + stats its own /ws/analyze session returned and
+# receives everyone else's, delta-encoded (wire format in coop_relay.py). ?name= is the
+# display name shown to the others. Needs no pose workers, so it runs with any SUBSYSTEMS.
+@app.websocket("/ws/coop/{room_id}")
+async def coop_endpoint(websocket: WebSocket, room_id: str):
+    await relay.serve(websocket, room_id, websocket.query_params.get("name", ""))
+
+@app.get("/pose_sessions/{session_id}/summary")
+async def pose_session_summary(session_id: str):
+    """Hold times, form score trend and stability for a live or recently finished session."""
+    # Copied on the event loop, between the socket's record() calls, so no sample is torn;
+    # the summary itself is computed in a thread
+    snapshot = history.snapshot(session_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired session")
+    rows, info = snapshot
+    summary = await asyncio.to_thread(pose_history.summarize, rows)
+    summary.update(info)
+    return summary
+
+@app.get("/ready")
+def ready_endpoint():
+    """Per-subsystem startup state; 200 once every enabled subsystem is ready, else 503."""
+    ready, body = readiness.report()
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """Prometheus text-format metrics for this server process."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# Returns 303 to GET /tts/audio/<key>.mp3 when the clip is already cached; that URL is
+# immutable, so replays and seeks are served from the browser cache or with Range
+# requests. Freshly synthesized audio is returned (or streamed, if chunked) directly.
 @app.post("/tts")
-def tts_endpoint(req: TTSRequest):
+async def tts_endpoint(req: TTSRequest):
     text = (req.text or "").strip()
     if not text:
         raise HTTPException(status_code=400, detail="No text provided")
-    return get_tts_audio(text)
+    readiness.TTS.require()
+    if req.chunked:
+        return await stream_tts_audio(text)
+    return await get_tts_audio(text)
+
+@app.api_route("/tts/audio/{name}", methods=["GET", "HEAD"])
+async def tts_audio_endpoint(name: str, request: Request):
+    readiness.TTS.require()
+    return await cached_audio_response(name, request.headers, head=request.method == "HEAD")
+
+@app.post("/custom_meditation_script")
+async def custom_meditation_endpoint(req: CustomMeditationRequest):
+    if not (req.issue or "").strip():
+        raise HTTPException(status_code=400, detail="No issue provided")
+    readiness.LLM.require()
+    if req.audio:
+        readiness.TTS.require()
+        return await stream_meditation_audio(req.issue, req.minutes, req.tone, req.style)
+    return {"text": await generate_script(req.issue, req.minutes, req.tone, req.style)}
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,13 @@
+"""
+Offline benchmarks for the pose pipeline.
+
+Run from the backend directory, e.g.
+    python -m bench.pose_bench --frames 300
+    python -m bench.pose_bench --stub --resolutions 320x240,1280x720 --json out.json
+    python -m bench.ws_load --serve-stub --clients 20
+    python -m bench.tts_stub --requests 50 --texts 3
+
+The whole meditation pipeline runs offline against stand-ins with
+    uvicorn bench.tts_stub:app --port 8100
+    GEMINI_BACKEND=stub ELEVENLABS_BASE_URL=http://127.0.0.1:8100 ELEVENLABS_API_KEY=stub uvicorn app:app
+"""
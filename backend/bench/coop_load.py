@@ -0,0 +1,149 @@
+"""
+Bandwidth check for the co-op relay (/ws/coop/{room_id}), entirely on localhost.
+
+Opens --rooms rooms of --members members. Every member publishes stub landmarks and
+stats at --fps like PoseSession.jsx does with its own results (plus a thumbnail with
+--thumbnail), and decodes everything it receives, checking that the reconstructed
+landmarks match what the sender published to within one grid step. Reports the bytes
+each room receives per second next to what re-broadcasting the annotated base64 JPEG
+(the old co-op path) would cost at the same rate.
+
+    python -m bench.coop_load --serve --rooms 5 --members 2 --duration 10
+"""
+import argparse
+import asyncio
+import base64
+import json
+import time
+
+import numpy as np
+import websockets
+
+import coop_relay
+import frame_protocol
+from bench.corpus import generate_corpus
+from bench.stub_pose import StubPoseDetector
+from bench.ws_load import _free_port, start_stub_server, stop_stub_server
+
+
+class MemberStats:
+    def __init__(self):
+        self.bytes_in = 0
+        self.messages = {}
+        self.max_error = 0.0
+
+
+async def run_member(url, fps, duration, thumbnail, seed, stats, published):
+    """published: slot -> latest (33, 3) landmarks this member sent, shared by the room."""
+    detector = StubPoseDetector(jitter=0.002, seed=seed)
+    interval = 1.0 / fps
+    async with websockets.connect(url, max_size=None) as ws:
+        first = json.loads(await ws.recv())
+        slot = first["you"]
+        received = {}
+
+        async def reader():
+            async for raw in ws:
+                stats.bytes_in += len(raw)
+                if isinstance(raw, str):
+                    stats.messages["members"] = stats.messages.get("members", 0) + 1
+                    continue
+                kind, sender, _seq = coop_relay._HEADER.unpack_from(raw)
+                payload = raw[coop_relay._HEADER.size:]
+                name = coop_relay._KIND_NAMES.get(kind, "other")
+                stats.messages[name] = stats.messages.get(name, 0) + 1
+                if kind == coop_relay.KEYFRAME:
+                    received[sender] = coop_relay.decode_keyframe(payload)
+                elif kind == coop_relay.DELTA:
+                    received[sender] = coop_relay.decode_delta(payload, received[sender])
+                elif kind == coop_relay.NO_POSE:
+                    received.pop(sender, None)
+                if kind in (coop_relay.KEYFRAME, coop_relay.DELTA) and sender in published:
+                    xy = received[sender][:, :2] / coop_relay.GRID
+                    error = float(np.abs(xy - published[sender][:, :2]).max())
+                    stats.max_error = max(stats.max_error, error)
+
+        read_task = asyncio.create_task(reader())
+        started = time.perf_counter()
+        frame = 0
+        while time.perf_counter() - started < duration:
+            # A slow sway on top of the stub's jitter, like someone moving into a pose
+            result = detector.process(None)
+            landmarks = np.array([[lm.x, lm.y, lm.visibility] for lm in result.pose_landmarks.landmark])
+            landmarks[:, 0] += 0.05 * np.sin(frame / 20.0)
+            packed = frame_protocol.pack_landmarks(landmarks)
+            published[slot] = frame_protocol.unpack_landmarks(packed)
+            pose_stats = {"Status": "Good", "Hip angle": int(170 + 5 * np.sin(frame / 7.0))}
+            await ws.send(bytes((coop_relay.POSE, 1)) + packed + json.dumps(pose_stats).encode())
+            if thumbnail is not None:
+                await ws.send(bytes((coop_relay.THUMBNAIL,)) + thumbnail)
+            frame += 1
+            await asyncio.sleep(max(0.0, started + frame * interval - time.perf_counter()))
+        await asyncio.sleep(0.5)  # let the last messages arrive
+        read_task.cancel()
+
+
+async def run_rooms(args, base_url):
+    thumbnail = generate_corpus(160, 120, frames=1, quality=60)[0] if args.thumbnail else None
+    rooms = []
+    tasks = []
+    for r in range(args.rooms):
+        published = {}
+        members = [MemberStats() for _ in range(args.members)]
+        rooms.append(members)
+        for m, stats in enumerate(members):
+            url = f"{base_url}/ws/coop/bench-{r}?name=member{m}"
+            tasks.append(run_member(url, args.fps, args.duration, thumbnail, r * 100 + m, stats, published))
+    await asyncio.gather(*tasks)
+    return rooms
+
+
+def summarize(rooms, args):
+    # The old path: every member re-broadcast its annotated 320x240 frame as a base64 data URL
+    jpeg = generate_corpus(320, 240, frames=1)[0]
+    data_url_bytes = len("data:image/jpeg;base64,") + len(base64.b64encode(jpeg))
+    per_room = [sum(m.bytes_in for m in room) / args.duration for room in rooms]
+    baseline = data_url_bytes * args.fps * args.members * (args.members - 1)
+    messages = {}
+    for room in rooms:
+        for m in room:
+            for kind, n in m.messages.items():
+                messages[kind] = messages.get(kind, 0) + n
+    return {
+        "rooms": args.rooms,
+        "members": args.members,
+        "fps": args.fps,
+        "kbit_per_room": round(float(np.mean(per_room)) * 8 / 1000, 1),
+        "jpeg_broadcast_kbit_per_room": round(baseline * 8 / 1000, 1),
+        "messages": messages,
+        "max_landmark_error": round(max(m.max_error for room in rooms for m in room), 5),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure co-op relay bandwidth on localhost.")
+    parser.add_argument("--url", default="ws://127.0.0.1:8000")
+    parser.add_argument("--rooms", type=int, default=5)
+    parser.add_argument("--members", type=int, default=2)
+    parser.add_argument("--fps", type=float, default=10.0, help="Publish rate (PoseSession.jsx relays at 10)")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--thumbnail", action="store_true", help="Also send a 160x120 thumbnail with every frame")
+    parser.add_argument("--serve", action="store_true", help="Start a local relay-only server")
+    args = parser.parse_args(argv)
+
+    server = None
+    base_url = args.url
+    if args.serve:
+        port = _free_port()
+        server = start_stub_server(port, None, 0, subsystems="")
+        base_url = f"ws://127.0.0.1:{port}"
+    try:
+        rooms = asyncio.run(run_rooms(args, base_url))
+    finally:
+        if server is not None:
+            stop_stub_server(server)
+    print(json.dumps(summarize(rooms, args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
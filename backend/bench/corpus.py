@@ -0,0 +1,66 @@
+"""
+JPEG frame corpora for benchmarks: generated synthetic webcam-like frames, or a directory of real ones.
+"""
+import glob
+import os
+
+import cv2
+import numpy as np
+
+
+def parse_resolutions(spec: str):
+    """"320x240,640x480" -> [(320, 240), (640, 480)]"""
+    out = []
+    for part in spec.split(","):
+        w, h = part.lower().strip().split("x")
+        out.append((int(w), int(h)))
+    return out
+
+
+def generate_corpus(width: int, height: int, frames: int = 30, quality: int = 80, seed: int = 0):
+    """
+    Synthetic frames: a lit background with sensor noise and a figure that sways slightly
+    from frame to frame, so JPEG sizes and decode cost look like a real webcam feed.
+    Returns a list of JPEG byte strings.
+    """
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+    background = np.dstack((
+        90 + 60 * xx / width,
+        110 + 40 * yy / height,
+        140 - 50 * xx / width,
+    ))
+
+    out = []
+    for i in range(frames):
+        frame = background + rng.normal(0, 6, background.shape)
+        frame = np.clip(frame, 0, 255).astype(np.uint8)
+
+        sway = int(0.02 * width * np.sin(i / 5.0))
+        cx, s = width // 2 + sway, min(width, height)
+        color = (60, 50, 160)
+        thick = max(2, s // 40)
+        head, neck, hips = (cx, int(0.2 * height)), (cx, int(0.3 * height)), (cx, int(0.55 * height))
+        cv2.circle(frame, head, max(4, s // 14), (140, 170, 210), -1)
+        cv2.line(frame, neck, hips, color, thick * 2)
+        cv2.line(frame, (cx - int(0.28 * width), neck[1]), (cx + int(0.28 * width), neck[1]), color, thick)
+        cv2.line(frame, hips, (cx - int(0.05 * width), int(0.9 * height)), color, thick)
+        cv2.line(frame, hips, (cx + int(0.05 * width), int(0.9 * height)), color, thick)
+
+        ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ok:
+            raise RuntimeError("cv2.imencode failed while generating the corpus")
+        out.append(buf.tobytes())
+    return out
+
+
+def load_corpus(directory: str):
+    """All *.jpg / *.jpeg files in directory (sorted), as byte strings."""
+    paths = sorted(glob.glob(os.path.join(directory, "*.jpg")) + glob.glob(os.path.join(directory, "*.jpeg")))
+    if not paths:
+        raise FileNotFoundError(f"No .jpg/.jpeg files in {directory}")
+    frames = []
+    for path in paths:
+        with open(path, "rb") as f:
+            frames.append(f.read())
+    return frames
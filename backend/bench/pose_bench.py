@@ -0,0 +1,222 @@
+"""
+Pose pipeline benchmark.
+
+For every resolution x output mode x protocol it pushes a JPEG corpus through
+PoseAnalysisWorker and reports per-stage and end-to-end latency percentiles (the stage
+timings are the worker's own, see last_frame_info), frames per second per core (from
+CPU time) and RSS growth over the run. It also micro-benchmarks the pose rule engine
+and auto-mode pose recognition against libraries of increasing size.
+
+--stub swaps MediaPipe for bench.stub_pose.StubPoseDetector so the decode, rules,
+drawing and serialization layers can be measured on their own.
+"""
+import argparse
+import base64
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+from bench.corpus import generate_corpus, load_corpus, parse_resolutions
+from bench.stub_pose import StubPoseDetector
+import frame_protocol
+
+PERCENTILES = (50, 90, 99)
+
+
+def _rss_bytes():
+    """Current resident set size (Linux /proc), falling back to peak RSS elsewhere."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _percentiles_ms(samples):
+    if not samples:
+        return {}
+    values = np.percentile(np.asarray(samples) * 1000.0, PERCENTILES)
+    return {f"p{p}": round(float(v), 3) for p, v in zip(PERCENTILES, values)}
+
+
+def bench_pipeline(frames, n_frames, output, protocol, stub, warmup=10, worker_kwargs=None):
+    from pose_worker import PoseAnalysisWorker
+
+    kwargs = dict(worker_kwargs or {})
+    if stub:
+        kwargs["pose_detector"] = StubPoseDetector()
+    worker = PoseAnalysisWorker(**kwargs)
+
+    if protocol == "json":
+        inputs = ["data:image/jpeg;base64," + base64.b64encode(f).decode("ascii") for f in frames]
+        run = lambda data: worker.process_frame(data, "warrior", output)
+    else:
+        inputs = frames
+        run = lambda data: worker.process_binary(data, "warrior", output)
+
+    for i in range(warmup):
+        run(inputs[i % len(inputs)])
+
+    stage_samples = {}
+    e2e = []
+    out_bytes = 0
+    rss_start = _rss_bytes()
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+
+    for i in range(n_frames):
+        t = time.perf_counter()
+        result = run(inputs[i % len(inputs)])
+        e2e.append(time.perf_counter() - t)
+        out_bytes += len(result) if result else 0
+        for stage, seconds in worker.last_frame_info.get("timings", {}).items():
+            stage_samples.setdefault(stage, []).append(seconds)
+
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    rss_end = _rss_bytes()
+    worker.close()
+
+    return {
+        "frames": n_frames,
+        "e2e_ms": _percentiles_ms(e2e),
+        "stages_ms": {stage: _percentiles_ms(s) for stage, s in stage_samples.items()},
+        "fps": round(n_frames / wall, 1),
+        "fps_per_core": round(n_frames / cpu, 1) if cpu > 0 else None,
+        "avg_in_bytes": int(sum(len(x) for x in inputs) / len(inputs)),
+        "avg_out_bytes": int(out_bytes / max(n_frames, 1)),
+        "rss_growth_kb": round((rss_end - rss_start) / 1024, 1),
+    }
+
+
+def bench_rules(iterations=20000):
+    """Microseconds per rule-engine evaluation, per pose."""
+    from poses.engine import default_engine
+
+    engine = default_engine()
+    detector = StubPoseDetector()
+    lm = detector.process(None).pose_landmarks.landmark
+    landmarks = np.array([(p.x, p.y, p.visibility) for p in lm], dtype=np.float32)
+
+    out = {}
+    for name, pose in engine.poses.items():
+        t = time.perf_counter()
+        for _ in range(iterations):
+            pose.evaluate(landmarks, 640, 480)
+        out[name] = {
+            "rules": pose.n_rules,
+            "us_per_eval": round((time.perf_counter() - t) / iterations * 1e6, 2),
+        }
+    return out
+
+
+def bench_recognition(sizes=(3, 30, 300, 3000), iterations=5000):
+    """Microseconds per auto-mode recognition against synthetic libraries of each size."""
+    from poses.engine import LANDMARK_INDEX, default_engine
+    from poses.recognition import EMBEDDING_JOINTS, ReferenceIndex
+
+    engine = default_engine()
+    detector = StubPoseDetector()
+    lm = detector.process(None).pose_landmarks.landmark
+    landmarks = np.array([(p.x, p.y, p.visibility) for p in lm], dtype=np.float32)
+    joint_idx = [LANDMARK_INDEX[j] for j in EMBEDDING_JOINTS]
+
+    rng = np.random.default_rng(0)
+    base = landmarks[joint_idx, :2]
+    out = {}
+    for size in sizes:
+        # Jittered copies of a standing pose stand in for a library of `size` poses
+        refs = [(i, base + rng.normal(0.0, 0.05, base.shape)) for i in range(size)]
+        index = ReferenceIndex([f"pose{i}" for i in range(size)], refs, joint_idx)
+        t = time.perf_counter()
+        for _ in range(iterations):
+            index.nearest(landmarks, 640, 480)
+        out[str(size)] = {"us_per_recognition": round((time.perf_counter() - t) / iterations * 1e6, 2)}
+    out["bundled"] = {"poses": len(engine.poses), "references": len(engine.index)}
+    return out
+
+
+def _print_report(report):
+    if report["rules"]:
+        print(f"\n== Rule engine ({report['env']['python']}, numpy {report['env']['numpy']}) ==")
+        for name, r in report["rules"].items():
+            print(f"  {name:<10} {r['rules']} rules  {r['us_per_eval']:>8.2f} us/eval")
+    if report.get("recognition"):
+        print("\n== Auto-mode recognition ==")
+        for size, r in report["recognition"].items():
+            if "us_per_recognition" in r:
+                print(f"  {size:>5} poses  {r['us_per_recognition']:>8.2f} us/recognition")
+
+    for run in report["pipeline"]:
+        print(f"\n== {run['resolution']} output={run['output']} protocol={run['protocol']}"
+              f"{' (stub detector)' if run['stub'] else ''} ==")
+        print(f"  end-to-end ms {run['e2e_ms']}  fps {run['fps']}  fps/core {run['fps_per_core']}")
+        print(f"  bytes in/out {run['avg_in_bytes']}/{run['avg_out_bytes']}  RSS growth {run['rss_growth_kb']} KiB")
+        for stage, p in run["stages_ms"].items():
+            print(f"    {stage:<12} {p}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pose pipeline offline.")
+    parser.add_argument("--resolutions", default="320x240,640x480,1280x720")
+    parser.add_argument("--outputs", default=",".join(frame_protocol.OUTPUT_MODES))
+    parser.add_argument("--protocols", default="json,binary")
+    parser.add_argument("--frames", type=int, default=200, help="Measured frames per configuration")
+    parser.add_argument("--corpus", help="Directory of .jpg frames to use instead of generated ones")
+    parser.add_argument("--stub", action="store_true", help="Replace MediaPipe with a stub landmark detector")
+    parser.add_argument("--process-width", type=int, help="PoseAnalysisWorker process_width")
+    parser.add_argument("--motion-threshold", type=float, help="PoseAnalysisWorker motion_threshold")
+    parser.add_argument("--skip-rules", action="store_true", help="Skip the rule engine and recognition micro-benchmarks")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file")
+    args = parser.parse_args(argv)
+
+    worker_kwargs = {}
+    if args.process_width:
+        worker_kwargs["process_width"] = args.process_width
+    if args.motion_threshold:
+        worker_kwargs["motion_threshold"] = args.motion_threshold
+
+    report = {
+        "env": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "cpu_count": os.cpu_count(),
+        },
+        "rules": {} if args.skip_rules else bench_rules(),
+        "recognition": {} if args.skip_rules else bench_recognition(),
+        "pipeline": [],
+    }
+    try:
+        import cv2
+        report["env"]["opencv"] = cv2.__version__
+        import mediapipe
+        report["env"]["mediapipe"] = mediapipe.__version__
+    except ImportError:
+        pass
+
+    if args.corpus:
+        corpora = [("corpus", load_corpus(args.corpus))]
+    else:
+        corpora = [(f"{w}x{h}", generate_corpus(w, h)) for w, h in parse_resolutions(args.resolutions)]
+
+    for resolution, frames in corpora:
+        for output in args.outputs.split(","):
+            for protocol in args.protocols.split(","):
+                result = bench_pipeline(frames, args.frames, output, protocol, args.stub, worker_kwargs=worker_kwargs)
+                result.update(resolution=resolution, output=output, protocol=protocol, stub=args.stub)
+                report["pipeline"].append(result)
+
+    _print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
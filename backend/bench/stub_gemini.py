@@ -0,0 +1,32 @@
+"""
+A stand-in for gemini.call_gemini's streaming and async calls that "generates" a canned meditation
+script a few words at a time, so the /custom_meditation_script pipeline can be exercised
+without a Gemini key (GEMINI_BACKEND=stub, GEMINI_STUB_DELAY_MS per piece).
+"""
+import asyncio
+import os
+
+DELAY_MS = float(os.getenv("GEMINI_STUB_DELAY_MS", "40") or 0)
+
+_SCRIPT = (
+    "Welcome. Find a comfortable position and let your eyes gently close. "
+    "Take a slow breath in through your nose, and let it out through your mouth. "
+    "Notice where your body meets the chair or the floor beneath you. "
+    "Breathe in for four… 1…2…3…4. Hold for two… 1…2. Breathe out for six… 1…2…3…4…5…6. "
+    "If a worry comes up, simply notice it, and let it pass like a cloud. "
+    "Let your shoulders soften, and your jaw relax. "
+    "With every breath out, let a little more tension leave your body. "
+    "When you are ready, bring your attention back to the room, and open your eyes."
+)
+
+
+async def stream_response(system_prompt: str, prompt: str, model: str = None, use_cache: bool = True):
+    words = _SCRIPT.split(" ")
+    # Roughly token-sized pieces, like the real stream
+    for i in range(0, len(words), 3):
+        await asyncio.sleep(DELAY_MS / 1000.0)
+        yield " ".join(words[i:i + 3]) + " "
+
+
+async def generate_response_async(system_prompt: str, prompt: str, model: str = None, use_cache: bool = True):
+    return "".join([piece async for piece in stream_response(system_prompt, prompt, model)]).strip()
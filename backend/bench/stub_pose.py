@@ -0,0 +1,79 @@
+"""
+A stand-in for mp_pose.Pose that returns a fixed, slightly jittered set of landmarks.
+
+Plug it into PoseAnalysisWorker(pose_detector=StubPoseDetector()) to measure decode,
+rules, drawing and serialization without the MediaPipe model, or to run load tests on
+machines that don't have the model files.
+"""
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+# A standing pose with arms out to the sides, normalized [x, y] in MediaPipe landmark order
+_BASE_POSE = np.array([
+    [0.50, 0.20],                                                  # nose
+    [0.49, 0.19], [0.48, 0.19], [0.47, 0.19],                      # left eye inner/eye/outer
+    [0.51, 0.19], [0.52, 0.19], [0.53, 0.19],                      # right eye inner/eye/outer
+    [0.46, 0.20], [0.54, 0.20],                                    # ears
+    [0.49, 0.22], [0.51, 0.22],                                    # mouth
+    [0.42, 0.30], [0.58, 0.30],                                    # shoulders (left, right)
+    [0.32, 0.30], [0.68, 0.30],                                    # elbows
+    [0.22, 0.30], [0.78, 0.30],                                    # wrists
+    [0.20, 0.30], [0.80, 0.30],                                    # pinkies
+    [0.20, 0.29], [0.80, 0.29],                                    # index fingers
+    [0.21, 0.29], [0.79, 0.29],                                    # thumbs
+    [0.45, 0.55], [0.55, 0.55],                                    # hips
+    [0.45, 0.72], [0.55, 0.72],                                    # knees
+    [0.45, 0.90], [0.55, 0.90],                                    # ankles
+    [0.45, 0.92], [0.55, 0.92],                                    # heels
+    [0.44, 0.94], [0.56, 0.94],                                    # foot index
+])
+
+
+class _Landmark:
+    __slots__ = ("x", "y", "z", "visibility", "presence")
+
+    def __init__(self, x, y, visibility):
+        self.x = x
+        self.y = y
+        self.z = 0.0
+        self.visibility = visibility
+        self.presence = visibility
+
+    def HasField(self, name):  # protobuf-style API used by mp_drawing
+        return name in ("visibility", "presence")
+
+
+class _LandmarkList:
+    def __init__(self, landmark):
+        self.landmark = landmark
+
+
+class StubPoseDetector:
+    """
+    latency_ms simulates model cost: by busy-waiting (busy=True, burns CPU like real
+    inference) or sleeping (busy=False, frees the core).
+    """
+
+    def __init__(self, jitter=0.003, latency_ms=0.0, busy=True, seed=0):
+        self.jitter = jitter
+        self.latency = latency_ms / 1000.0
+        self.busy = busy
+        self._rng = np.random.default_rng(seed)
+
+    def process(self, image_rgb):
+        if self.latency > 0:
+            if self.busy:
+                deadline = time.perf_counter() + self.latency
+                while time.perf_counter() < deadline:
+                    pass
+            else:
+                time.sleep(self.latency)
+
+        xy = _BASE_POSE + self._rng.normal(0.0, self.jitter, _BASE_POSE.shape)
+        landmarks = [_Landmark(float(x), float(y), 0.99) for x, y in xy]
+        return SimpleNamespace(pose_landmarks=_LandmarkList(landmarks))
+
+    def close(self):
+        pass
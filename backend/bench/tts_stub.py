@@ -0,0 +1,106 @@
+"""
+Local stand-in for the ElevenLabs text-to-speech endpoint, plus a concurrency check of TTSClient.
+
+Serve it and point the backend at it (any non-empty API key works):
+    uvicorn bench.tts_stub:app --port 8100
+    ELEVENLABS_BASE_URL=http://127.0.0.1:8100 ELEVENLABS_API_KEY=stub uvicorn app:app
+
+Or run the self-contained check, which fires --requests concurrent synthesize() calls
+spread over --texts distinct texts and reports how many reached the upstream:
+    python -m bench.tts_stub --requests 50 --texts 3 --delay-ms 300
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import socket
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
+
+# Simulated synthesis time per request
+DELAY_MS = float(os.getenv("TTS_STUB_DELAY_MS", "300") or 0)
+
+app = FastAPI()
+app.state.calls = 0
+app.state.active = 0
+app.state.peak_active = 0
+
+
+@app.post("/v1/text-to-speech/{voice_id}")
+async def synthesize(voice_id: str, request: Request):
+    payload = await request.json()
+    app.state.calls += 1
+    app.state.active += 1
+    app.state.peak_active = max(app.state.peak_active, app.state.active)
+    try:
+        await asyncio.sleep(DELAY_MS / 1000.0)
+    finally:
+        app.state.active -= 1
+    # Not real MP3 audio, just deterministic bytes of a plausible size
+    digest = hashlib.sha256(payload.get("text", "").encode("utf-8")).digest()
+    return Response(content=b"ID3" + digest * 512, media_type="audio/mpeg")
+
+
+@app.get("/stats")
+def stats():
+    return {"calls": app.state.calls, "peak_active": app.state.peak_active}
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _check(base_url, n_requests, n_texts, max_concurrency):
+    from tts_worker import TTSClient
+
+    client = TTSClient(url=f"{base_url}/v1/text-to-speech/stub", api_key="stub", max_concurrency=max_concurrency)
+    texts = [f"Breathe in slowly, sentence {i}." for i in range(n_texts)]
+
+    async def one(i):
+        text = texts[i % n_texts]
+        started = time.perf_counter()
+        await client.synthesize(hashlib.md5(text.encode("utf-8")).hexdigest(), text)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    latencies = await asyncio.gather(*(one(i) for i in range(n_requests)))
+    wall = time.perf_counter() - started
+    await client.close()
+    return wall, latencies
+
+
+def main(argv=None):
+    global DELAY_MS
+    parser = argparse.ArgumentParser(description="Check TTSClient deduplication and concurrency against a stub upstream.")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--texts", type=int, default=3, help="Distinct texts the requests are spread over")
+    parser.add_argument("--delay-ms", type=float, default=DELAY_MS)
+    parser.add_argument("--max-concurrency", type=int, default=2)
+    args = parser.parse_args(argv)
+    DELAY_MS = args.delay_ms
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    wall, latencies = asyncio.run(_check(f"http://127.0.0.1:{port}", args.requests, args.texts, args.max_concurrency))
+    server.should_exit = True
+    thread.join()
+
+    print(f"{args.requests} requests over {args.texts} texts in {wall * 1000:.0f} ms "
+          f"(max latency {max(latencies) * 1000:.0f} ms)")
+    print(f"upstream calls: {app.state.calls}  peak concurrent upstream: {app.state.peak_active} "
+          f"(limit {args.max_concurrency})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Concurrent WebSocket load generator for /ws/analyze.
+
+Opens N connections that each replay webcam-sized JPEG frames at a fixed fps using the
+same JSON message format as PoseSession.jsx ({"image": <data URL>, "mode": ...}), plus a
+"seq" the server echoes back so round trips can be timed. Reports round-trip latency
+percentiles, achieved fps per client, server-side drops and error counts.
+
+    python -m bench.ws_load --clients 20 --fps 15 --duration 30
+    python -m bench.ws_load --serve-stub --clients 50     # spawn a local server with the stub pose backend
+
+--serve-stub starts `uvicorn app:app` with POSE_BACKEND=stub, so it runs on CI machines
+without the MediaPipe model; --stub-latency-ms makes each stub frame burn that much CPU.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import numpy as np
+import websockets
+
+from bench.corpus import generate_corpus, parse_resolutions
+
+PERCENTILES = (50, 90, 99)
+
+
+class ClientStats:
+    def __init__(self):
+        self.sent = 0
+        self.received = 0
+        self.latencies = []
+        self.server_dropped = 0
+        self.granted_fps = None
+        self.model_complexity = None
+        self.errors = 0
+        self.connect_failed = False
+
+
+async def run_client(url, frames, fps, duration, mode, stats: ClientStats, start_delay=0.0, adaptive=False):
+    await asyncio.sleep(start_delay)
+    try:
+        ws = await websockets.connect(url, max_size=None, open_timeout=10)
+    except Exception:
+        stats.connect_failed = True
+        stats.errors += 1
+        return
+
+    sent_at = {}
+    interval = 1.0 / fps
+    rate = {"interval": interval}
+    stop_at = time.perf_counter() + duration
+
+    async def sender():
+        seq = 0
+        next_send = time.perf_counter()
+        while time.perf_counter() < stop_at:
+            sent_at[seq] = time.perf_counter()
+            await ws.send(json.dumps({"image": frames[seq % len(frames)], "mode": mode, "seq": seq}))
+            stats.sent += 1
+            seq += 1
+            next_send += rate["interval"]
+            await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+
+    async def receiver():
+        async for raw in ws:
+            now = time.perf_counter()
+            msg = json.loads(raw)
+            if msg.get("type") == "flow":
+                stats.server_dropped = msg.get("dropped", stats.server_dropped)
+                stats.granted_fps = msg.get("granted_fps", stats.granted_fps)
+                stats.model_complexity = msg.get("model_complexity", stats.model_complexity)
+                if adaptive and stats.granted_fps:
+                    # Behave like PoseSession.jsx: send no faster than the server will process
+                    rate["interval"] = 1.0 / min(fps, stats.granted_fps)
+                continue
+            seq = msg.get("seq")
+            if seq is None or seq not in sent_at:
+                continue
+            stats.received += 1
+            stats.latencies.append(now - sent_at[seq])
+            # Older frames were dropped by the server's latest-frame-wins mailbox
+            for old in [s for s in sent_at if s <= seq]:
+                del sent_at[old]
+
+    recv_task = asyncio.create_task(receiver())
+    try:
+        await sender()
+        # Give in-flight frames a moment to come back
+        await asyncio.sleep(min(2.0, 10 * interval))
+    except Exception:
+        stats.errors += 1
+    finally:
+        recv_task.cancel()
+        try:
+            await recv_task
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            stats.errors += 1
+        await ws.close()
+
+
+def summarize(all_stats, duration, clients):
+    latencies = np.concatenate([np.asarray(s.latencies) for s in all_stats]) if all_stats else np.array([])
+    per_client_fps = [s.received / duration for s in all_stats]
+    out = {
+        "clients": clients,
+        "connected": sum(not s.connect_failed for s in all_stats),
+        "sent": sum(s.sent for s in all_stats),
+        "received": sum(s.received for s in all_stats),
+        "server_dropped": sum(s.server_dropped for s in all_stats),
+        "granted_fps": sorted(s.granted_fps for s in all_stats if s.granted_fps is not None),
+        "model_complexity": sorted(s.model_complexity for s in all_stats if s.model_complexity is not None),
+        "errors": sum(s.errors for s in all_stats),
+        "fps_per_client": {
+            "mean": round(float(np.mean(per_client_fps)), 2) if per_client_fps else 0.0,
+            "min": round(float(np.min(per_client_fps)), 2) if per_client_fps else 0.0,
+        },
+        "aggregate_fps": round(sum(per_client_fps), 1),
+        "latency_ms": {},
+    }
+    if len(latencies):
+        values = np.percentile(latencies * 1000.0, PERCENTILES)
+        out["latency_ms"] = {f"p{p}": round(float(v), 1) for p, v in zip(PERCENTILES, values)}
+        out["latency_ms"]["max"] = round(float(latencies.max() * 1000.0), 1)
+    total = out["sent"] or 1
+    out["error_rate"] = round(out["errors"] / max(clients, 1), 3)
+    out["unanswered_rate"] = round(1 - out["received"] / total, 3)
+    return out
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_stub_server(port, workers, stub_latency_ms, subsystems="pose"):
+    """Runs app.py under uvicorn with the stub pose backend; returns the Popen handle once it is ready."""
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, POSE_BACKEND="stub", POSE_STUB_LATENCY_MS=str(stub_latency_ms), SUBSYSTEMS=subsystems)
+    if workers:
+        env["POSE_WORKERS"] = str(workers)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=backend_dir,
+        env=env,
+        stdout=sys.stderr,  # keep stdout for the summary
+        start_new_session=True,  # own process group, so stop_stub_server also reaps the pool workers
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("Stub server exited during startup")
+        try:
+            # /ready answers 200 once the enabled subsystems (pose workers) are warmed up
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/ready", timeout=0.5):
+                return proc
+        except OSError:
+            time.sleep(0.2)
+    stop_stub_server(proc)
+    raise RuntimeError("Stub server did not start within 60s")
+
+
+def stop_stub_server(proc):
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        os.killpg(proc.pid, signal.SIGKILL)
+        proc.wait()
+    except ProcessLookupError:
+        pass
+    # Pool workers can outlive a server that exited on its own
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+async def run_load(args):
+    width, height = parse_resolutions(args.resolution)[0]
+    frames = [
+        "data:image/jpeg;base64," + base64.b64encode(f).decode("ascii")
+        for f in generate_corpus(width, height, frames=30)
+    ]
+    url = args.url
+    if args.output != "image":
+        url += ("&" if "?" in url else "?") + f"output={args.output}"
+
+    all_stats = [ClientStats() for _ in range(args.clients)]
+    ramp = args.ramp / max(args.clients, 1)
+    await asyncio.gather(*(
+        run_client(url, frames, args.fps, args.duration, args.mode, s, start_delay=i * ramp, adaptive=args.adaptive)
+        for i, s in enumerate(all_stats)
+    ))
+    return summarize(all_stats, args.duration, args.clients)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test /ws/analyze with concurrent clients.")
+    parser.add_argument("--url", default="ws://127.0.0.1:8000/ws/analyze")
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--fps", type=float, default=15.0, help="Send rate per client (PoseSession.jsx uses 15)")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds each client sends for")
+    parser.add_argument("--ramp", type=float, default=2.0, help="Seconds over which clients connect")
+    parser.add_argument("--mode", default="warrior")
+    parser.add_argument("--resolution", default="320x240", help="Frame size (PoseSession.jsx uses 320x240)")
+    parser.add_argument("--output", default="image", choices=["image", "landmarks"])
+    parser.add_argument("--adaptive", action="store_true", help="Follow the server's granted_fps like the frontend does")
+    parser.add_argument("--serve-stub", action="store_true", help="Start a local server with POSE_BACKEND=stub")
+    parser.add_argument("--stub-latency-ms", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, help="POSE_WORKERS for --serve-stub")
+    parser.add_argument("--json", dest="json_path", help="Also write the summary to this file")
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.serve_stub:
+        port = _free_port()
+        server = start_stub_server(port, args.workers, args.stub_latency_ms)
+        args.url = f"ws://127.0.0.1:{port}/ws/analyze"
+
+    try:
+        summary = asyncio.run(run_load(args))
+    finally:
+        if server is not None:
+            stop_stub_server(server)
+
+    print(json.dumps(summary, indent=2))
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""
+Co-op relay for /ws/coop/{room_id}: fans each participant's landmarks and stats out to
+the other members of a room, instead of every client re-broadcasting its annotated JPEG.
+
+Members publish what their own /ws/analyze session returned; the relay quantizes the
+landmarks onto a GRID x GRID grid and forwards a keyframe when a member first shows up
+(or a recipient fell behind) and small int8 deltas after that. Stats are forwarded when
+they change, at most every STATS_INTERVAL; an optional thumbnail at most every
+COOP_THUMBNAIL_INTERVAL seconds. A room of two costs a few kB/s instead of ~1.5 Mbit/s.
+
+Client -> relay (binary):
+  [u8 POSE][u8 has landmarks][LANDMARKS_SIZE bytes from frame_protocol.pack_landmarks, if any][stats JSON]
+  [u8 THUMBNAIL][JPEG bytes]
+Relay -> client (binary): [u8 kind][u8 member slot][u16 seq, little-endian][payload]
+  KEYFRAME   33 x (x, y) as u16 on the grid, then 33 x visibility as u8 in [0, VIS_LEVELS]
+  DELTA      33 x (dx, dy, dvisibility) as int8, against that member's previous frame
+  STATS      stats JSON, utf-8
+  THUMBNAIL  JPEG bytes
+  NO_POSE    empty; the member's pose was lost (its next landmarks come as a keyframe)
+Relay -> client (text): {"type": "members", "you": slot, "members": [{"slot": n, "name": "..."}]}
+whenever someone joins or leaves.
+"""
+import asyncio
+import json
+import os
+import struct
+import time
+
+import numpy as np
+from fastapi import WebSocket, WebSocketDisconnect
+
+import frame_protocol
+import metrics
+
+POSE = 1
+THUMBNAIL = 4
+
+KEYFRAME = 1
+DELTA = 2
+STATS = 3
+NO_POSE = 5
+
+# Landmark resolution on the wire: 1/2048 of the frame is well under a pixel for display
+GRID = 2047
+# Visibility only decides whether a joint is drawn; 7 bits keep its deltas inside int8
+VIS_LEVELS = 127
+MAX_STATS_BYTES = 2048
+STATS_INTERVAL = 0.25
+MAX_THUMBNAIL_BYTES = 32 * 1024
+# Messages queued for one slow recipient before it is resynced (see Room._resync)
+OUTBOX_SIZE = 16
+
+_HEADER = struct.Struct("<BBH")
+_KIND_NAMES = {KEYFRAME: "keyframe", DELTA: "delta", STATS: "stats", THUMBNAIL: "thumbnail", NO_POSE: "no_pose"}
+
+
+def quantize_landmarks(packed: bytes):
+    """frame_protocol landmark bytes -> (33, 3) int16 array of [x, y] on the grid and visibility."""
+    lm = frame_protocol.unpack_landmarks(packed)
+    q = np.empty((frame_protocol.NUM_LANDMARKS, 3), dtype=np.int16)
+    q[:, :2] = np.rint(lm[:, :2] * GRID)
+    q[:, 2] = np.rint(lm[:, 2] * VIS_LEVELS)
+    return q
+
+
+def encode_keyframe(q):
+    return q[:, :2].astype("<u2").tobytes() + q[:, 2].astype(np.uint8).tobytes()
+
+
+def encode_delta(q, previous):
+    """int8 deltas, or None if some landmark moved too far for one (send a keyframe instead)."""
+    d = q - previous
+    if np.abs(d).max() > 127:
+        return None
+    return d.astype(np.int8).tobytes()
+
+
+def decode_keyframe(payload: bytes):
+    split = frame_protocol.NUM_LANDMARKS * 4
+    q = np.empty((frame_protocol.NUM_LANDMARKS, 3), dtype=np.int16)
+    q[:, :2] = np.frombuffer(payload[:split], dtype="<u2").reshape(-1, 2)
+    q[:, 2] = np.frombuffer(payload[split:], dtype=np.uint8)
+    return q
+
+
+def decode_delta(payload: bytes, previous):
+    return previous + np.frombuffer(payload, dtype=np.int8).reshape(-1, 3)
+
+
+class _Member:
+    def __init__(self, slot, name, websocket):
+        self.slot = slot
+        self.name = name
+        self.websocket = websocket
+        self.outbox = asyncio.Queue()
+        # Slots whose next landmarks this member must get as a keyframe
+        self.stale = set()
+        # What the other members currently hold for this member
+        self.landmarks = None
+        self.stats = None
+        self.stats_sent_at = 0.0
+        self.thumbnail_sent_at = 0.0
+        self.seq = 0
+
+
+class Room:
+    def __init__(self, room_id):
+        self.room_id = room_id
+        self.members = {}
+
+    def join(self, name, websocket, max_members):
+        if len(self.members) >= max_members:
+            return None
+        slot = next(s for s in range(1, 256) if s not in self.members)
+        member = _Member(slot, name, websocket)
+        # Whatever the others have published so far reaches the newcomer as keyframes
+        member.stale = set(self.members)
+        self.members[slot] = member
+        for other in self.members.values():
+            if other is not member and other.stats is not None:
+                self._queue(member, self._message(STATS, other, other.stats))
+        self._announce()
+        return member
+
+    def leave(self, member):
+        self.members.pop(member.slot, None)
+        for other in self.members.values():
+            other.stale.discard(member.slot)
+        self._announce()
+
+    def publish_pose(self, member, packed_landmarks, stats_json):
+        member.seq = (member.seq + 1) & 0xFFFF
+        if packed_landmarks is None:
+            if member.landmarks is not None:
+                member.landmarks = None
+                self._broadcast(member, NO_POSE, b"")
+        else:
+            q = quantize_landmarks(packed_landmarks)
+            delta = encode_delta(q, member.landmarks) if member.landmarks is not None else None
+            # Set first: a recipient resynced below gets a keyframe of this frame
+            member.landmarks = q
+            keyframe = None
+            for other in self._others(member):
+                if delta is None or member.slot in other.stale:
+                    keyframe = keyframe or self._message(KEYFRAME, member, encode_keyframe(q))
+                    self._queue(other, keyframe)
+                    other.stale.discard(member.slot)
+                else:
+                    self._queue(other, self._message(DELTA, member, delta))
+
+        now = time.monotonic()
+        if stats_json and stats_json != member.stats and now - member.stats_sent_at >= STATS_INTERVAL:
+            member.stats = stats_json
+            member.stats_sent_at = now
+            self._broadcast(member, STATS, stats_json)
+
+    def publish_thumbnail(self, member, jpeg_bytes, interval):
+        now = time.monotonic()
+        if len(jpeg_bytes) > MAX_THUMBNAIL_BYTES or now - member.thumbnail_sent_at < interval:
+            return
+        member.thumbnail_sent_at = now
+        self._broadcast(member, THUMBNAIL, jpeg_bytes)
+
+    def _others(self, member):
+        return [m for m in self.members.values() if m is not member]
+
+    def _message(self, kind, member, payload):
+        return _HEADER.pack(kind, member.slot, member.seq) + payload
+
+    def _broadcast(self, member, kind, payload):
+        message = self._message(kind, member, payload)
+        for other in self._others(member):
+            self._queue(other, message)
+
+    def _queue(self, member, message):
+        # Room for a resync's own messages on top, so one never immediately triggers another
+        if member.outbox.qsize() >= OUTBOX_SIZE + 2 * len(self.members):
+            # A recipient this far behind gets a clean restart instead of stalling the room
+            self._resync(member)
+            return
+        member.outbox.put_nowait(message)
+
+    def _resync(self, member):
+        """
+        Replaces a recipient's backlog with the room's current state: the roster, then each
+        other member's landmarks (a keyframe, or NO_POSE) and latest stats. Stats and the
+        roster are only sent on change, so they must not be lost with the dropped frames.
+        """
+        while not member.outbox.empty():
+            member.outbox.get_nowait()
+        member.outbox.put_nowait(self._roster(member))
+        for other in self._others(member):
+            if other.landmarks is not None:
+                member.outbox.put_nowait(self._message(KEYFRAME, other, encode_keyframe(other.landmarks)))
+            else:
+                member.outbox.put_nowait(self._message(NO_POSE, other, b""))
+            if other.stats is not None:
+                member.outbox.put_nowait(self._message(STATS, other, other.stats))
+        member.stale.clear()
+        metrics.COOP_RECIPIENT_RESETS.inc()
+
+    def _roster(self, member):
+        roster = [{"slot": m.slot, "name": m.name} for m in self.members.values()]
+        return json.dumps({"type": "members", "you": member.slot, "members": roster})
+
+    def _announce(self):
+        for member in self.members.values():
+            self._queue(member, self._roster(member))
+
+
+class CoopRelay:
+    """
+    Rooms are created on first join and dropped when the last member leaves. Nothing is
+    stored, and room ids are whatever the clients agree on (the app uses its yoga_rooms id).
+    """
+
+    def __init__(self, max_members=4, thumbnail_interval=1.0):
+        self.max_members = max_members
+        self.thumbnail_interval = thumbnail_interval
+        self._rooms = {}
+
+    async def serve(self, websocket: WebSocket, room_id: str, name: str):
+        await websocket.accept()
+        room = self._rooms.setdefault(room_id, Room(room_id))
+        member = room.join(name[:64], websocket, self.max_members)
+        if member is None:
+            if not room.members:
+                self._rooms.pop(room_id, None)
+            await websocket.close(code=1008, reason="Room is full")
+            return
+        metrics.COOP_ROOMS.set(len(self._rooms))
+        metrics.COOP_MEMBERS.inc()
+
+        sender = asyncio.create_task(self._send_loop(member))
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                data = message.get("bytes")
+                if not data:
+                    continue
+                try:
+                    self._handle(room, member, data)
+                except ValueError:
+                    continue
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+        finally:
+            sender.cancel()
+            room.leave(member)
+            if not room.members:
+                self._rooms.pop(room_id, None)
+            metrics.COOP_ROOMS.set(len(self._rooms))
+            metrics.COOP_MEMBERS.dec()
+
+    def _handle(self, room, member, data: bytes):
+        kind = data[0]
+        if kind == POSE:
+            if len(data) < 2:
+                raise ValueError("Short pose message")
+            if data[1]:
+                landmarks = data[2:2 + frame_protocol.LANDMARKS_SIZE]
+                if len(landmarks) != frame_protocol.LANDMARKS_SIZE:
+                    raise ValueError("Short landmark payload")
+                stats = data[2 + frame_protocol.LANDMARKS_SIZE:]
+            else:
+                landmarks, stats = None, data[2:]
+            room.publish_pose(member, landmarks, bytes(stats[:MAX_STATS_BYTES]))
+        elif kind == THUMBNAIL:
+            room.publish_thumbnail(member, data[1:], self.thumbnail_interval)
+
+    @staticmethod
+    async def _send_loop(member):
+        websocket = member.websocket
+        try:
+            while True:
+                message = await member.outbox.get()
+                if isinstance(message, str):
+                    await websocket.send_text(message)
+                    metrics.COOP_BYTES_OUT.inc(len(message), kind="members")
+                else:
+                    await websocket.send_bytes(message)
+                    metrics.COOP_BYTES_OUT.inc(len(message), kind=_KIND_NAMES.get(message[0], "other"))
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+
+
+def from_env():
+    """CoopRelay sized by COOP_MAX_MEMBERS and COOP_THUMBNAIL_INTERVAL (seconds; 0 disables thumbnails)."""
+    interval = float(os.getenv("COOP_THUMBNAIL_INTERVAL", "1") or 0)
+    return CoopRelay(
+        max_members=min(int(os.getenv("COOP_MAX_MEMBERS", "4") or 4), 255),
+        thumbnail_interval=interval if interval > 0 else float("inf"),
+    )
@@ -0,0 +1,96 @@
+"""
+Reduced-resolution JPEG decoding and region-of-interest helpers for the pose pipeline.
+
+libjpeg can decode directly at 1/2, 1/4 or 1/8 scale (cv2.IMREAD_REDUCED_COLOR_*),
+skipping most of the IDCT work, so decoding "straight to" the processing resolution
+is much cheaper than decoding the full frame and resizing it afterwards.
+"""
+import cv2
+import numpy as np
+
+_REDUCED_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+# Start-of-frame markers that carry the image size (SOF0-SOF15 minus DHT/JPG/DAC)
+_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def jpeg_size(data: bytes):
+    """Returns (width, height) from a JPEG's SOF header without decoding it, or None."""
+    if data[:2] != b"\xff\xd8":
+        return None
+    i, n = 2, len(data)
+    while i + 9 <= n:
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:  # standalone markers
+            i += 2
+            continue
+        if marker in _SOF_MARKERS:
+            height = int.from_bytes(data[i + 5:i + 7], "big")
+            width = int.from_bytes(data[i + 7:i + 9], "big")
+            return width, height
+        i += 2 + int.from_bytes(data[i + 2:i + 4], "big")
+    return None
+
+
+def decode_jpeg(jpeg_bytes: bytes, max_width=None):
+    """
+    Decodes a JPEG to BGR, no wider than max_width (if given).
+    Uses the largest libjpeg reduction that stays >= max_width, then INTER_AREA for the rest.
+    Returns None if the bytes can't be decoded.
+    """
+    flag = cv2.IMREAD_COLOR
+    if max_width:
+        size = jpeg_size(jpeg_bytes)
+        if size is not None:
+            width = size[0]
+            for factor, reduced_flag in _REDUCED_FLAGS:
+                if -(-width // factor) >= max_width:
+                    flag = reduced_flag
+                    break
+
+    image = cv2.imdecode(np.frombuffer(jpeg_bytes, np.uint8), flag)
+    if image is None:
+        return None
+
+    h, w = image.shape[:2]
+    if max_width and w > max_width:
+        image = cv2.resize(image, (max_width, max(1, round(h * max_width / w))), interpolation=cv2.INTER_AREA)
+    return image
+
+
+def roi_from_landmarks(landmarks, margin=0.25, min_visibility=0.5):
+    """
+    Normalized (x0, y0, x1, y1) box around the visible landmarks, grown by margin
+    (fraction of the box size) on each side and clamped to the frame. None if nothing is visible.
+    """
+    visible = landmarks[landmarks[:, 2] >= min_visibility, :2]
+    if len(visible) == 0:
+        return None
+    lo = visible.min(axis=0)
+    hi = visible.max(axis=0)
+    pad = (hi - lo) * margin
+    x0, y0 = np.clip(lo - pad, 0.0, 1.0)
+    x1, y1 = np.clip(hi + pad, 0.0, 1.0)
+    if x1 - x0 < 0.05 or y1 - y0 < 0.05:
+        return None
+    return float(x0), float(y0), float(x1), float(y1)
+
+
+def roi_contains(roi, landmarks, inset=0.1, min_visibility=0.5):
+    """True if every visible landmark lies inside roi shrunk by inset (fraction of its size)."""
+    x0, y0, x1, y1 = roi
+    dx, dy = (x1 - x0) * inset, (y1 - y0) * inset
+    visible = landmarks[landmarks[:, 2] >= min_visibility, :2]
+    return bool(
+        np.all((visible[:, 0] >= x0 + dx) & (visible[:, 0] <= x1 - dx)
+               & (visible[:, 1] >= y0 + dy) & (visible[:, 1] <= y1 - dy))
+    )
@@ -0,0 +1,86 @@
+import asyncio
+import time
+
+
+class LatestFrameMailbox:
+    """
+    One-slot, latest-frame-wins mailbox between a WebSocket reader and its processor.
+    put() overwrites any frame that hasn't been taken yet (counted as dropped), so a
+    slow processor always works on the newest frame instead of an ever-growing backlog.
+    """
+
+    def __init__(self):
+        self._item = None
+        self._put_at = 0.0
+        self._event = asyncio.Event()
+        self._closed = False
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, item):
+        if self._item is not None:
+            self.dropped += 1
+        self._item = item
+        self._put_at = time.monotonic()
+        self.received += 1
+        self._event.set()
+
+    def close(self):
+        self._closed = True
+        self._event.set()
+
+    async def get(self):
+        """
+        Waits for the next frame. Returns (item, queue_age_seconds),
+        or (None, 0.0) once the mailbox is closed and empty.
+        """
+        while self._item is None:
+            if self._closed:
+                return None, 0.0
+            await self._event.wait()
+            self._event.clear()
+        item, self._item = self._item, None
+        return item, time.monotonic() - self._put_at
+
+
+class FlowStats:
+    """Per-connection counters reported back to the client as {"type": "flow", ...} messages."""
+
+    def __init__(self, mailbox: LatestFrameMailbox, interval: float = 1.0):
+        self.mailbox = mailbox
+        self.interval = interval
+        self.processed = 0
+        self.skipped = 0
+        self._window_frames = 0
+        self._window_queue = 0.0
+        self._window_process = 0.0
+        self._last_report = time.monotonic()
+
+    def record(self, queue_age: float, process_time: float, frame_info=None):
+        self.processed += 1
+        if frame_info and frame_info.get("inferred") is False:
+            self.skipped += 1
+        self._window_frames += 1
+        self._window_queue += queue_age
+        self._window_process += process_time
+
+    def report_due(self) -> bool:
+        return time.monotonic() - self._last_report >= self.interval
+
+    def report(self) -> dict:
+        """Returns the flow message for the current window and starts a new one."""
+        n = max(self._window_frames, 1)
+        msg = {
+            "type": "flow",
+            "received": self.mailbox.received,
+            "processed": self.processed,
+            "dropped": self.mailbox.dropped,
+            "skipped": self.skipped,
+            "queue_ms": round(1000 * self._window_queue / n, 1),
+            "process_ms": round(1000 * self._window_process / n, 1),
+        }
+        self._window_frames = 0
+        self._window_queue = 0.0
+        self._window_process = 0.0
+        self._last_report = time.monotonic()
+        return msg
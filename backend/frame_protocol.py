@@ -0,0 +1,84 @@
+"""
+Binary frame protocol for /ws/analyze.
+
+Clients opt in by requesting the SUBPROTOCOL when opening the socket, e.g.
+new WebSocket(url, ["pose.binary.v1"]). Clients that don't keep the JSON/base64 path.
+
+Client -> server:  [u8 mode length][mode, utf-8][JPEG bytes]
+Server -> client:  [u16 stats length, big-endian][stats JSON, utf-8][payload]
+
+The payload depends on the output mode picked with ?output=... on the socket URL:
+  "image"      the annotated JPEG (default)
+  "landmarks"  LANDMARKS_SIZE bytes from pack_landmarks (empty if no pose was found);
+               the client draws the skeleton itself. JSON clients get the same bytes
+               base64-encoded under "landmarks" (in "image" mode too, for the co-op relay).
+"""
+import json
+import struct
+
+import numpy as np
+
+SUBPROTOCOL = "pose.binary.v1"
+
+OUTPUT_IMAGE = "image"
+OUTPUT_LANDMARKS = "landmarks"
+OUTPUT_MODES = (OUTPUT_IMAGE, OUTPUT_LANDMARKS)
+
+# With ?timings=1, binary results carry per-stage milliseconds under this key of the stats header
+TIMINGS_KEY = "_timings"
+
+NUM_LANDMARKS = 33
+# 33 x (x, y) as little-endian u16 in [0, 1] * 65535, then 33 x visibility as u8 in [0, 1] * 255
+LANDMARKS_SIZE = NUM_LANDMARKS * 5
+
+_STATS_LEN = struct.Struct(">H")
+
+
+def unpack_frame(message: bytes):
+    """Splits a client frame into (mode, jpeg_bytes). Raises ValueError if malformed."""
+    if not message:
+        raise ValueError("Empty frame")
+    mode_len = message[0]
+    if len(message) < 1 + mode_len:
+        raise ValueError("Frame shorter than its mode header")
+    mode = message[1:1 + mode_len].decode("utf-8")
+    return mode, message[1 + mode_len:]
+
+
+def pack_frame(mode: str, jpeg_bytes: bytes) -> bytes:
+    mode_bytes = mode.encode("utf-8")
+    if len(mode_bytes) > 255:
+        raise ValueError("Mode name too long")
+    return b"".join((bytes((len(mode_bytes),)), mode_bytes, jpeg_bytes))
+
+
+def pack_result(payload: bytes, stats: dict) -> bytes:
+    header = json.dumps(stats, separators=(",", ":")).encode("utf-8")
+    return b"".join((_STATS_LEN.pack(len(header)), header, payload))
+
+
+def unpack_result(message: bytes):
+    """Splits a server result into (stats, payload)."""
+    (stats_len,) = _STATS_LEN.unpack_from(message)
+    start = _STATS_LEN.size
+    stats = json.loads(message[start:start + stats_len])
+    return stats, message[start + stats_len:]
+
+
+def pack_landmarks(landmarks) -> bytes:
+    """Quantizes a (33, 3) array of normalized [x, y, visibility] into LANDMARKS_SIZE bytes."""
+    lm = np.clip(np.asarray(landmarks, dtype=np.float32), 0.0, 1.0)
+    xy = np.rint(lm[:, :2] * 65535).astype("<u2")
+    vis = np.rint(lm[:, 2] * 255).astype(np.uint8)
+    return xy.tobytes() + vis.tobytes()
+
+
+def unpack_landmarks(payload: bytes):
+    """Inverse of pack_landmarks: returns a (33, 3) float32 array of [x, y, visibility]."""
+    if len(payload) != LANDMARKS_SIZE:
+        raise ValueError("Unexpected landmark payload size")
+    split = NUM_LANDMARKS * 4
+    out = np.empty((NUM_LANDMARKS, 3), dtype=np.float32)
+    out[:, :2] = np.frombuffer(payload[:split], dtype="<u2").reshape(NUM_LANDMARKS, 2) / 65535.0
+    out[:, 2] = np.frombuffer(payload[split:], dtype=np.uint8) / 255.0
+    return out
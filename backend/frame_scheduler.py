@@ -0,0 +1,196 @@
+import asyncio
+import time
+
+import metrics
+
+# Weight of the newest sample in the moving averages below
+_EWMA_ALPHA = 0.2
+# How often grants are recomputed (seconds)
+_REBALANCE_INTERVAL = 0.5
+
+
+class FrameScheduler:
+    """
+    Shares pose inference capacity fairly between the sessions on this server.
+
+    Each worker process can run about `utilization / cost` frames per second, where cost
+    is a moving average of the worker's own per-frame compute time. That capacity is
+    split max-min fairly between the sessions pinned to the worker: a session sending
+    less than an equal share keeps what it uses and the rest is shared by the others.
+    Every session is granted at most its fps ceiling (the server's max_fps, or lower if
+    the client asked for less) and, once the worker is past capacity, everyone's grant
+    drops together, down to min_fps.
+
+    The processor loop calls pace() before taking a frame from its mailbox, so a session
+    is never processed faster than its grant; frames that arrive in between overwrite
+    each other in the latest-frame-wins mailbox without costing any inference. The grant
+    is reported to the client (granted_fps in the flow message) so it can stop sending
+    frames that would only be dropped.
+    """
+
+    def __init__(self, max_fps=15.0, min_fps=1.0, utilization=0.85, initial_cost=0.03):
+        self.max_fps = max_fps
+        self.min_fps = min_fps
+        self.utilization = utilization
+        self.initial_cost = initial_cost
+        self._sessions = {}
+        self._cost = {}  # worker index -> seconds per frame (EWMA)
+        self._last_rebalance = 0.0
+
+    def add(self, session_id, worker, max_fps=None):
+        ceiling = min(self.max_fps, max_fps) if max_fps else self.max_fps
+        self._sessions[session_id] = {
+            "worker": worker,
+            "ceiling": max(ceiling, self.min_fps),
+            "granted": max(ceiling, self.min_fps),
+            "demand": ceiling,
+            "last_arrival": None,
+            "next_slot": 0.0,
+        }
+        self._rebalance()
+
+    def remove(self, session_id):
+        if self._sessions.pop(session_id, None) is not None:
+            self._rebalance()
+
+    def note_arrival(self, session_id):
+        """A frame arrived from this client; tracks how fast it is actually sending."""
+        s = self._sessions.get(session_id)
+        if s is None:
+            return
+        now = time.monotonic()
+        if s["last_arrival"] is not None:
+            fps = 1.0 / max(now - s["last_arrival"], 1e-3)
+            s["demand"] += _EWMA_ALPHA * (fps - s["demand"])
+        s["last_arrival"] = now
+
+    def record(self, session_id, cost, inferred=True):
+        """
+        Worker compute time (seconds) of a frame processed for this session. Frames the
+        motion gate skipped (inferred=False) are left out of the cost: capacity is planned
+        for inference, which every frame needs again as soon as the user moves.
+        """
+        s = self._sessions.get(session_id)
+        if s is None or cost <= 0 or not inferred:
+            return
+        w = s["worker"]
+        prev = self._cost.get(w, self.initial_cost)
+        self._cost[w] = prev + _EWMA_ALPHA * (cost - prev)
+        if time.monotonic() - self._last_rebalance >= _REBALANCE_INTERVAL:
+            self._rebalance()
+
+    def granted_fps(self, session_id):
+        s = self._sessions.get(session_id)
+        return round(s["granted"], 1) if s else self.max_fps
+
+    def throttled(self, session_id):
+        """True when this session's worker is saturated and it gets less than its ceiling."""
+        s = self._sessions.get(session_id)
+        return s is not None and s["granted"] < s["ceiling"]
+
+    async def pace(self, session_id):
+        """Waits until this session may start its next frame, then claims that slot."""
+        s = self._sessions.get(session_id)
+        if s is None:
+            return
+        delay = s["next_slot"] - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        s["next_slot"] = max(s["next_slot"], time.monotonic()) + 1.0 / s["granted"]
+
+    def _rebalance(self):
+        self._last_rebalance = time.monotonic()
+        by_worker = {}
+        for s in self._sessions.values():
+            by_worker.setdefault(s["worker"], []).append(s)
+
+        for worker, sessions in by_worker.items():
+            capacity = self.utilization / self._cost.get(worker, self.initial_cost)
+            metrics.POSE_WORKER_CAPACITY.set(round(capacity, 1), worker=worker)
+            # Water-filling: satisfy the smallest wants first, split the rest evenly
+            wants = sorted(min(s["demand"], s["ceiling"]) for s in sessions)
+            level = float("inf")
+            remaining, n = capacity, len(wants)
+            for want in wants:
+                share = remaining / n
+                if want > share:
+                    level = share
+                    break
+                remaining -= want
+                n -= 1
+            for s in sessions:
+                s["granted"] = max(self.min_fps, min(s["ceiling"], level))
+
+
+class ComplexityController:
+    """
+    Picks the MediaPipe model tier (0 lite, 1 full, 2 heavy) each session runs at.
+
+    Every session starts at max_tier. When its end-to-end frame latency (time queued in
+    the mailbox plus time in the worker, as a moving average) goes over target_latency,
+    or the scheduler can no longer grant it its full fps ceiling, it moves one tier down;
+    when latency falls under half the target with the full rate granted, it moves back up.
+    A step down waits down_cooldown seconds after the previous change and a step up the
+    longer up_cooldown, so a session doesn't flap between tiers on a noisy average.
+    A tier the worker couldn't switch to (its model is still loading, or failed to) is
+    skipped for unavailable_retry seconds.
+    """
+
+    def __init__(self, target_latency=0.15, min_tier=0, max_tier=1, down_cooldown=3.0, up_cooldown=10.0,
+                 unavailable_retry=60.0):
+        self.target_latency = target_latency
+        self.min_tier = min(min_tier, max_tier)
+        self.max_tier = max_tier
+        self.down_cooldown = down_cooldown
+        self.up_cooldown = up_cooldown
+        self.unavailable_retry = unavailable_retry
+        self._sessions = {}
+
+    def add(self, session_id):
+        self._sessions[session_id] = {
+            "tier": self.max_tier, "latency": None, "changed": time.monotonic(), "unavailable": {},
+        }
+
+    def remove(self, session_id):
+        self._sessions.pop(session_id, None)
+
+    def tier(self, session_id):
+        s = self._sessions.get(session_id)
+        return s["tier"] if s else self.max_tier
+
+    def record(self, session_id, latency, throttled=False, tier=None):
+        """
+        Latency (seconds, receipt to result) of a processed frame; throttled when the
+        scheduler grants this session less than its ceiling; tier is the one the worker
+        actually ran, if known. Returns the tier for the next frame.
+        """
+        s = self._sessions.get(session_id)
+        if s is None:
+            return self.max_tier
+        if tier is not None and tier != s["tier"]:
+            # The worker couldn't switch to the tier we asked for; don't ask again for a while
+            s["unavailable"][s["tier"]] = time.monotonic() + self.unavailable_retry
+            s["tier"] = tier
+        prev = s["latency"]
+        s["latency"] = latency if prev is None else prev + _EWMA_ALPHA * (latency - prev)
+
+        since_change = time.monotonic() - s["changed"]
+        overloaded = s["latency"] > self.target_latency or throttled
+        if overloaded and since_change >= self.down_cooldown:
+            self._move(s, -1)
+        elif not overloaded and s["latency"] < self.target_latency / 2 and since_change >= self.up_cooldown:
+            self._move(s, +1)
+        return s["tier"]
+
+    def _move(self, s, step):
+        target = s["tier"] + step
+        now = time.monotonic()
+        while s["unavailable"].get(target, 0.0) > now:
+            target += step
+        if not self.min_tier <= target <= self.max_tier:
+            return
+        s["tier"] = target
+        s["changed"] = time.monotonic()
+        # The average was measured on the old tier; start over on the new one
+        s["latency"] = None
+        metrics.POSE_TIER_CHANGES.inc(direction="down" if step < 0 else "up")
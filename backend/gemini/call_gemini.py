@@ -1,11 +1,17 @@
 # backend/gemini/call_gemini.py
+import asyncio
 import os
-import sys
+import threading
+import time
+from functools import lru_cache
 from dotenv import load_dotenv, find_dotenv  # type: ignore
 
 from google import genai  # type: ignore
 from google.genai import types  # type: ignore
 
+import metrics
+from gemini.response_cache import ResponseCache, cache_key
+
 # Load .env (if present)
 dotenv_path = find_dotenv()
 if dotenv_path:
@@ -15,41 +21,232 @@ else:
 
 api_key = os.getenv("GEMINI_API_KEY")
 
-if not api_key:
-    print("ERROR: GEMINI_API_KEY not set. Create a .env file with GEMINI_API_KEY=your_key", file=sys.stderr)
-    sys.exit(1)
+# Created on first use, so importing this module never fails or blocks on a missing key
+_client = None
+_response_cache = None
+_init_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    with _init_lock:
+        if _client is None:
+            if not api_key:
+                raise RuntimeError("GEMINI_API_KEY not set. Create a .env file with GEMINI_API_KEY=your_key")
+            _client = genai.Client(api_key=api_key)
+    return _client
+
+
+def get_response_cache():
+    """
+    Responses are cached on disk (GEMINI_CACHE_PATH) for GEMINI_CACHE_TTL_HOURS, up to
+    GEMINI_CACHE_MAX_ENTRIES; repeated prompts are answered without touching the API quota.
+    """
+    global _response_cache
+    with _init_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache(
+                os.getenv("GEMINI_CACHE_PATH", "gemini_cache.sqlite3"),
+                ttl=float(os.getenv("GEMINI_CACHE_TTL_HOURS", "168") or 168) * 3600,
+                max_entries=int(os.getenv("GEMINI_CACHE_MAX_ENTRIES", "2000") or 2000),
+            )
+    return _response_cache
+
+
+def warm_up():
+    """Creates the client and opens the cache (blocking; run it off the event loop)."""
+    get_client()
+    get_response_cache()
+
+
+# Identical prompts currently waiting on the API: cache key -> asyncio.Task
+_inflight = {}
+# Identical prompts currently streaming from the API: cache key -> _SharedStream
+_inflight_streams = {}
 
-client = genai.Client(api_key=api_key)
 
+def _model(model):
+    # Determine the model to use: explicit argument -> env -> fallback
+    return model or os.environ.get("GEMINI_FAST_MODEL", "gemini-2.5-flash")
 
-def generate_response(system_prompt: str, prompt: str, model: str = None):
+
+@lru_cache(maxsize=32)
+def _config(system_instruction: str):
+    # Create a minimal config. Keep it small; we rely on system instruction for strictness.
+    return types.GenerateContentConfig(system_instruction=system_instruction)
+
+
+def generate_response(system_prompt: str, prompt: str, model: str = None, use_cache: bool = True):
     """
     Generate a response using the Gemini client.
     system_prompt must be provided (string). prompt is the user prompt.
     model: optional. If None, we will check environment GEMINI_FAST_MODEL, otherwise fall back to 'gemini-2.5-flash'.
     """
-    try:
-        # Determine the model to use: explicit argument -> env -> fallback
-        model_to_use = model or os.environ.get("GEMINI_FAST_MODEL", "gemini-2.5-flash")
-
-        # Make sure system_prompt is a string
-        system_instruction = system_prompt if isinstance(system_prompt, str) else str(system_prompt)
+    model_to_use = _model(model)
+    # Make sure system_prompt is a string
+    system_instruction = system_prompt if isinstance(system_prompt, str) else str(system_prompt)
+    key = cache_key(model_to_use, system_instruction, prompt)
 
-        # Create a minimal config. Keep it small; we rely on system instruction for strictness.
-        config = types.GenerateContentConfig(system_instruction=system_instruction)
+    if use_cache:
+        cached = get_response_cache().get(key)
+        if cached is not None:
+            metrics.LLM_CACHE.inc(result="hit")
+            return cached
+        metrics.LLM_CACHE.inc(result="miss")
 
-        response = client.models.generate_content(
+    try:
+        started = time.perf_counter()
+        response = get_client().models.generate_content(
             model=model_to_use,
-            config=config,
+            config=_config(system_instruction),
             contents=prompt
         )
-
-        return response.text
+        metrics.LLM_UPSTREAM_SECONDS.observe(time.perf_counter() - started)
 
     except Exception as e:
         # propagate so callers may handle/log
         raise RuntimeError(f"API request failed {e}")
 
+    if use_cache and response.text:
+        get_response_cache().put(key, model_to_use, response.text)
+    return response.text
+
+
+async def generate_response_async(system_prompt: str, prompt: str, model: str = None, use_cache: bool = True):
+    """
+    Async generate_response on the shared client. Identical prompts that arrive while one
+    is already waiting on the API share its result instead of making their own call.
+    """
+    model_to_use = _model(model)
+    system_instruction = system_prompt if isinstance(system_prompt, str) else str(system_prompt)
+    key = cache_key(model_to_use, system_instruction, prompt)
+
+    if use_cache:
+        cached = await asyncio.to_thread(lambda: get_response_cache().get(key))
+        if cached is not None:
+            metrics.LLM_CACHE.inc(result="hit")
+            return cached
+
+    task = _inflight.get(key)
+    if task is not None:
+        metrics.LLM_CACHE.inc(result="shared")
+    else:
+        metrics.LLM_CACHE.inc(result="miss")
+
+        async def fetch():
+            try:
+                started = time.perf_counter()
+                response = await get_client().aio.models.generate_content(
+                    model=model_to_use,
+                    config=_config(system_instruction),
+                    contents=prompt
+                )
+                metrics.LLM_UPSTREAM_SECONDS.observe(time.perf_counter() - started)
+            except Exception as e:
+                raise RuntimeError(f"API request failed {e}")
+            if use_cache and response.text:
+                await asyncio.to_thread(lambda: get_response_cache().put(key, model_to_use, response.text))
+            return response.text
+
+        task = asyncio.ensure_future(fetch())
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    # shield: one caller going away must not cancel the request for the others
+    return await asyncio.shield(task)
+
+
+class _SharedStream:
+    """
+    One upstream stream, read by its own task as fast as the API sends it and replayed
+    from the start to every caller of the same prompt, so a slow reader (e.g. one waiting
+    on TTS) neither holds up the others nor the upstream request.
+    """
+
+    def __init__(self, produce):
+        self.pieces = []
+        self.error = None
+        self.done = False
+        self._changed = asyncio.Event()
+        self.task = asyncio.ensure_future(self._run(produce))
+
+    async def _run(self, produce):
+        try:
+            async for piece in produce():
+                self.pieces.append(piece)
+                self._notify()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def follow(self):
+        """Every piece so far, then the rest as they arrive; raises if the stream failed."""
+        i = 0
+        while True:
+            changed = self._changed
+            while i < len(self.pieces):
+                yield self.pieces[i]
+                i += 1
+            if self.done and i == len(self.pieces):
+                break
+            await changed.wait()
+        if self.error is not None:
+            raise RuntimeError(f"API request failed {self.error}")
+
+
+async def stream_response(system_prompt: str, prompt: str, model: str = None, use_cache: bool = True):
+    """
+    Streaming variant of generate_response: an async generator of text pieces as the
+    model produces them, so callers can act on the first sentences before the rest exists.
+    A cached response is yielded in one piece; a completed stream is cached. Identical
+    prompts that arrive while one is streaming share it instead of making their own call.
+    """
+    model_to_use = _model(model)
+    system_instruction = system_prompt if isinstance(system_prompt, str) else str(system_prompt)
+    key = cache_key(model_to_use, system_instruction, prompt)
+
+    if use_cache:
+        cached = await asyncio.to_thread(lambda: get_response_cache().get(key))
+        if cached is not None:
+            metrics.LLM_CACHE.inc(result="hit")
+            yield cached
+            return
+
+    stream = _inflight_streams.get(key)
+    if stream is not None:
+        metrics.LLM_CACHE.inc(result="shared")
+    else:
+        metrics.LLM_CACHE.inc(result="miss")
+
+        async def produce():
+            pieces = []
+            started = time.perf_counter()
+            response = await get_client().aio.models.generate_content_stream(
+                model=model_to_use,
+                config=_config(system_instruction),
+                contents=prompt
+            )
+            async for chunk in response:
+                if chunk.text:
+                    pieces.append(chunk.text)
+                    yield chunk.text
+            # _SharedStream only buffers each piece, so this is the upstream time alone
+            metrics.LLM_UPSTREAM_SECONDS.observe(time.perf_counter() - started)
+            if use_cache and pieces:
+                await asyncio.to_thread(lambda: get_response_cache().put(key, model_to_use, "".join(pieces)))
+
+        stream = _SharedStream(produce)
+        _inflight_streams[key] = stream
+        stream.task.add_done_callback(lambda _: _inflight_streams.pop(key, None))
+
+    async for piece in stream.follow():
+        yield piece
+
 
 if __name__ == "__main__":
-    print(generate_response(system_prompt="You are friendly", prompt="Explain to me what gemini is"))
\ No newline at end of file
+    print(generate_response(system_prompt="You are friendly", prompt="Explain to me what gemini is"))
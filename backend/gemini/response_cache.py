@@ -0,0 +1,83 @@
+"""
+Persistent cache of Gemini responses.
+
+Keyed by sha256 over (model, system prompt, normalized prompt), stored in a small SQLite
+database so it survives restarts and is shared by every uvicorn worker on the machine.
+Entries expire after ttl seconds; beyond max_entries the least recently used are dropped.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str):
+    """
+    Prompts that differ only in whitespace share a cache entry. Case is kept: user text
+    inside a prompt can change the answer ("US" vs "us").
+    """
+    return _WHITESPACE.sub(" ", prompt).strip()
+
+
+def cache_key(model: str, system_prompt: str, prompt: str):
+    blob = json.dumps([model, system_prompt, normalize_prompt(prompt)], ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path, ttl=7 * 24 * 3600, max_entries=2000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, model TEXT, response TEXT, created REAL, accessed REAL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per call: cheap for SQLite, and safe from any thread
+        db = sqlite3.connect(self.path, timeout=5)
+        db.execute("PRAGMA synchronous=NORMAL")  # WAL: durable enough for a cache, far fewer fsyncs
+        try:
+            with db:  # commits on success, rolls back on error
+                yield db
+        finally:
+            db.close()
+
+    def get(self, key):
+        """Cached response text, or None if missing or expired. Blocking; call from a thread."""
+        now = time.time()
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT response FROM responses WHERE key = ? AND created > ?", (key, now - self.ttl)
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def put(self, key, model, response):
+        """Stores a response, then drops expired and least recently used entries. Blocking."""
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, model, response, now, now),
+            )
+            db.execute("DELETE FROM responses WHERE created <= ?", (now - self.ttl,))
+            db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
@@ -0,0 +1,86 @@
+"""
+Custom meditation scripts: Gemini writes the script, TTS voices it.
+
+The script is streamed from the model and cut into sentences as it arrives; every
+completed sentence goes straight into (cached, parallel) TTS and the audio is streamed to
+the client in order. The user hears the first sentence while the model is still writing
+the rest, instead of waiting for full generation followed by full synthesis.
+"""
+import os
+
+from fastapi import HTTPException
+
+from tts_worker import SentenceSplitter, streaming_audio_response, synthesize_stream
+
+# A slow, meditative speaking pace
+WORDS_PER_MINUTE = 110
+MAX_MINUTES = 20
+
+SYSTEM_PROMPT = (
+    "You write guided meditation scripts that will be read aloud by a text-to-speech voice. "
+    "Write only the words to be spoken: no titles, headings, stage directions, markdown or "
+    "lists. Use short, complete sentences. Use '…' for pauses inside a sentence."
+)
+
+
+def build_prompt(issue: str, minutes: float, tone: str, style: str):
+    minutes = min(max(float(minutes or 5), 1), MAX_MINUTES)
+    words = int(minutes * WORDS_PER_MINUTE)
+    return (
+        f"Write a {minutes:g}-minute guided meditation (about {words} words) for someone who says: "
+        f"\"{issue.strip()}\". Tone: {tone or 'calm'}. Techniques: {style or 'breathing'}."
+    )
+
+
+def _load_llm():
+    """The gemini.call_gemini module, or the canned stand-in when GEMINI_BACKEND=stub."""
+    if os.getenv("GEMINI_BACKEND", "gemini") == "stub":
+        from bench import stub_gemini
+        return stub_gemini
+    # Imported lazily: google-genai is slow to import and only this path needs it
+    from gemini import call_gemini
+    return call_gemini
+
+
+def _llm():
+    try:
+        return _load_llm()
+    except ImportError as e:
+        raise HTTPException(status_code=500, detail=f"Gemini is not configured: {e}")
+
+
+def warm_up_llm():
+    """Imports the LLM backend and creates its client; raises if it can't be used (blocking)."""
+    llm = _load_llm()
+    if hasattr(llm, "warm_up"):
+        llm.warm_up()
+
+
+async def generate_script(issue: str, minutes: float, tone: str, style: str):
+    """The whole script as text (cached; identical concurrent requests share one call)."""
+    llm = _llm()
+    try:
+        text = await llm.generate_response_async(SYSTEM_PROMPT, build_prompt(issue, minutes, tone, style))
+    except RuntimeError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    return (text or "").strip()
+
+
+async def stream_meditation_audio(issue: str, minutes: float, tone: str, style: str):
+    """StreamingResponse of the script's audio, synthesized sentence by sentence as it is written."""
+    stream_response = _llm().stream_response
+    prompt = build_prompt(issue, minutes, tone, style)
+
+    async def sentences():
+        splitter = SentenceSplitter()
+        async for piece in stream_response(SYSTEM_PROMPT, prompt):
+            for sentence in splitter.feed(piece):
+                yield sentence
+        for sentence in splitter.flush():
+            yield sentence
+
+    try:
+        return await streaming_audio_response(synthesize_stream(sentences()))
+    except RuntimeError as e:
+        # Gemini failed before the first sentence was complete
+        raise HTTPException(status_code=502, detail=str(e))
@@ -0,0 +1,188 @@
+"""
+Minimal in-process metrics with Prometheus text-format export (served on /metrics).
+
+Counters, gauges and fixed-bucket histograms, optionally split by one set of labels.
+Recording is a dict lookup plus a few additions under a lock, cheap enough for every frame.
+Each server process keeps its own numbers.
+"""
+import bisect
+import threading
+
+# Seconds; tuned for per-stage frame timings (sub-ms decode up to multi-second TTS calls)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = []
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in pairs)
+    return "{" + body + "}"
+
+
+def _format_value(v):
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        if not self.labelnames:
+            # Unlabelled metrics are exported as 0 before their first update
+            self._values[()] = self._zero()
+        _registry.append(self)
+
+    def _zero(self):
+        return 0
+
+    def _key(self, labels):
+        if tuple(sorted(labels)) != tuple(sorted(self.labelnames)):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _zero(self):
+        # [per-bucket counts..., +Inf bucket], sum
+        return [[0] * (len(self.buckets) + 1), 0.0]
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = self._zero()
+            state[0][idx] += 1
+            state[1] += value
+
+    def snapshot(self, **labels):
+        """Returns (bucket_counts, count, sum) for one label set; counts are non-cumulative."""
+        with self._lock:
+            state = self._values.get(self._key(labels)) or self._zero()
+            return list(state[0]), sum(state[0]), state[1]
+
+    def _render_sample(self, key, state):
+        counts, total = state
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = _format_labels(self.labelnames, key, [("le", _format_value(float(bound)))])
+            lines.append(f"{self.name}_bucket{le} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(float(total))}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def render():
+    """All registered metrics in Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- Pose pipeline ---
+WS_ACTIVE = Gauge("ws_active_sockets", "Open /ws/analyze connections")
+WS_FRAMES_IN = Counter("ws_frames_in_total", "Frames received on /ws/analyze")
+WS_FRAMES_OUT = Counter("ws_frames_out_total", "Results sent on /ws/analyze")
+WS_FRAMES_DROPPED = Counter("ws_frames_dropped_total", "Frames dropped by latest-frame-wins backpressure")
+POSE_FRAMES = Counter(
+    "pose_frames_total", "Analyzed frames by outcome (detected, no_pose, skipped by the motion gate)", ["result"]
+)
+POSE_STAGE_SECONDS = Histogram("pose_stage_seconds", "Per-stage frame processing time", ["stage"])
+POSE_WORKER_CAPACITY = Gauge("pose_worker_capacity_fps", "Estimated frames/s each pose worker can serve (scheduler)", ["worker"])
+POSE_TIER_CHANGES = Counter("pose_tier_changes_total", "Sessions moved to a lighter (down) or heavier (up) pose model", ["direction"])
+POSE_FRAME_SECONDS = Histogram("pose_frame_seconds", "Time from frame receipt to result sent (incl. queueing)")
+
+
+def observe_frame(frame_info):
+    """Records the worker's per-frame info (see PoseAnalysisWorker.last_frame_info)."""
+    if not frame_info:
+        return
+    for stage, seconds in frame_info.get("timings", {}).items():
+        POSE_STAGE_SECONDS.observe(seconds, stage=stage)
+    if frame_info.get("inferred") is False:
+        POSE_FRAMES.inc(result="skipped")
+    elif "detected" in frame_info:
+        POSE_FRAMES.inc(result="detected" if frame_info["detected"] else "no_pose")
+
+
+# --- Co-op relay ---
+COOP_ROOMS = Gauge("coop_rooms", "Open co-op relay rooms")
+COOP_MEMBERS = Gauge("coop_members", "Connected co-op relay members")
+COOP_BYTES_OUT = Counter("coop_bytes_out_total", "Bytes fanned out by the co-op relay by message kind", ["kind"])
+COOP_RECIPIENT_RESETS = Counter("coop_recipient_resets_total", "Slow co-op recipients whose backlog was replaced with the current room state")
+
+# --- TTS ---
+TTS_CACHE = Counter("tts_cache_requests_total", "TTS requests by cache result (memory, hit, miss, shared in-flight)", ["result"])
+TTS_UPSTREAM_SECONDS = Histogram("tts_upstream_seconds", "ElevenLabs synthesis request latency")
+TTS_CACHE_BYTES = Gauge("tts_cache_bytes", "Size of the evictable on-disk TTS cache as last scanned")
+TTS_CACHE_EVICTIONS = Counter("tts_cache_evictions_total", "TTS clips evicted from the on-disk cache")
+TTS_AUDIO_REQUESTS = Counter("tts_audio_requests_total", "GET /tts/audio responses by status (200, 206, 304, 416)", ["status"])
+TTS_UPSTREAM_INFLIGHT = Gauge("tts_upstream_inflight", "ElevenLabs requests currently in flight")
+
+# --- LLM ---
+LLM_CACHE = Counter("llm_cache_requests_total", "Gemini requests by response-cache result (hit, miss, shared in-flight)", ["result"])
+LLM_UPSTREAM_SECONDS = Histogram("llm_upstream_seconds", "Gemini request latency (full response or stream)")
@@ -0,0 +1,256 @@
+"""
+Per-session pose history: a compact time series of what /ws/analyze saw, so sessions can
+be summarized (hold time, form score over time, stability) without keeping any video.
+
+Each session gets a fixed-size ring buffer of RECORD rows (175 bytes: timestamp, the
+quantized landmarks from frame_protocol, pose index, flags and the rule pass bitmask),
+sampled at most `fps` times a second, plus a sample whenever detection or the pose changes.
+At 5 fps an hour is 18,000 rows, about 3 MB, and a buffer never holds more than `seconds`
+of history: older rows are overwritten. With a spill directory the buffers are np.memmap
+files instead of process memory.
+"""
+import os
+import secrets
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import frame_protocol
+from poses.engine import default_engine
+
+NUM_LANDMARKS = frame_protocol.NUM_LANDMARKS
+RECORD = np.dtype([
+    ("t", "<f4"),                       # seconds since the session started
+    ("xy", "<u2", (NUM_LANDMARKS, 2)),  # normalized x, y * 65535 (frame_protocol.pack_landmarks)
+    ("vis", "u1", NUM_LANDMARKS),       # visibility * 255
+    ("pose", "u1"),                     # index into the engine's poses, UNKNOWN_POSE if none
+    ("flags", "u1"),                    # DETECTED | INFERRED
+    ("checks", "<u4"),                  # bit i set = rule i passed
+])
+DETECTED = 1
+INFERRED = 2
+UNKNOWN_POSE = 255
+
+# Samples further apart than this (e.g. the user stepped out of frame) break a hold
+MAX_GAP = 1.0
+_VISIBLE = 128
+
+
+class SessionHistory:
+    def __init__(self, capacity, min_interval=0.0, path=None):
+        self.capacity = capacity
+        self.min_interval = min_interval
+        self.path = path
+        if path:
+            self._rows = np.memmap(path, dtype=RECORD, mode="w+", shape=(capacity,))
+        else:
+            # Zeroed pages are only backed by memory once written, so short sessions stay small
+            self._rows = np.zeros(capacity, dtype=RECORD)
+        self.count = 0  # rows ever written
+        self.started = time.monotonic()
+        self.ended = None
+        self._last = -np.inf
+        self._last_state = None
+
+    def append(self, pose_index, frame_info):
+        """
+        Adds a sample for a processed frame, unless the last one is under min_interval old
+        and saw the same pose and detection state (a pose lost or found is always kept).
+        """
+        now = time.monotonic() - self.started
+        flags = (DETECTED if frame_info.get("detected") else 0) | (INFERRED if frame_info.get("inferred") else 0)
+        state = (pose_index, flags)
+        if now - self._last < self.min_interval and state == self._last_state:
+            return False
+        self._last = now
+        self._last_state = state
+
+        packed = frame_info.get("landmarks")
+        if packed is not None:
+            split = NUM_LANDMARKS * 4
+            xy = np.frombuffer(packed[:split], dtype="<u2").reshape(NUM_LANDMARKS, 2)
+            vis = np.frombuffer(packed[split:], dtype=np.uint8)
+        else:
+            xy, vis = 0, 0
+        self._rows[self.count % self.capacity] = (now, xy, vis, pose_index, flags, frame_info.get("checks", 0))
+        self.count += 1
+        return True
+
+    def rows(self):
+        """A chronological copy of the buffered samples."""
+        n = min(self.count, self.capacity)
+        start = self.count % self.capacity if self.count > self.capacity else 0
+        return np.concatenate((self._rows[start:n], self._rows[:start]))
+
+    @property
+    def nbytes(self):
+        return min(self.count, self.capacity) * RECORD.itemsize
+
+    def finish(self):
+        """Marks the session ended; an in-memory buffer shrinks to the rows it holds."""
+        self.ended = time.monotonic()
+        if not self.path:
+            self._rows = self.rows()
+            self.count = self.capacity = len(self._rows)
+
+    def close(self):
+        if self.path:
+            rows, self._rows = self._rows, None
+            del rows
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+def _runs(mask, t):
+    """(start, end) sample indices of the runs of True in mask, split at gaps over MAX_GAP."""
+    gap = np.r_[True, np.diff(t) > MAX_GAP]
+    starts = np.flatnonzero(mask & (gap | ~np.r_[False, mask[:-1]]))
+    ends = np.flatnonzero(mask & (np.r_[gap[1:], True] | ~np.r_[mask[1:], False]))
+    return starts, ends
+
+
+def summarize(rows, engine=None, bucket_seconds=60.0):
+    """Vectorized summary of one session's samples (see SessionHistory.rows)."""
+    engine = engine or default_engine()
+    names = list(engine.poses)
+    t = rows["t"].astype(np.float64)
+    detected = (rows["flags"] & DETECTED) != 0
+    out = {
+        "samples": int(len(rows)),
+        "duration_s": round(float(t[-1] - t[0]), 1) if len(rows) else 0.0,
+        "detected_fraction": round(float(detected.mean()), 3) if len(rows) else 0.0,
+        "poses": {},
+    }
+
+    xy = rows["xy"].astype(np.float32) / 65535.0
+    visible = rows["vis"] >= _VISIBLE
+    # Mean speed of the landmarks visible in both of two consecutive samples (frame widths/s)
+    dt = np.diff(t)
+    step = np.linalg.norm(np.diff(xy, axis=0), axis=2)
+    both = visible[1:] & visible[:-1]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        speed = (step * both).sum(axis=1) / both.sum(axis=1) / dt
+    pair_ok = detected[1:] & detected[:-1] & (dt > 0) & (dt <= MAX_GAP) & np.isfinite(speed)
+
+    for p in np.unique(rows["pose"][detected]):
+        if p == UNKNOWN_POSE or p >= len(names):
+            continue
+        pose = engine.poses[names[p]]
+        in_pose = detected & (rows["pose"] == p)
+        bits = ((rows["checks"][:, None] >> np.arange(pose.n_rules, dtype=np.uint32)) & 1).astype(bool)
+        checks = bits[:, pose.is_check]
+        score = checks.mean(axis=1) if checks.shape[1] else np.ones(len(rows))
+        holding = in_pose & checks.all(axis=1)
+
+        starts, ends = _runs(holding, t)
+        holds = t[ends] - t[starts]
+
+        # Form score (fraction of checks passed) per bucket_seconds of the session
+        bucket = ((t[in_pose] - t[0]) // bucket_seconds).astype(np.intp)
+        counts = np.bincount(bucket)
+        sums = np.bincount(bucket, weights=score[in_pose])
+        trend = [round(float(s / c), 3) if c else None for s, c in zip(sums, counts)]
+
+        moving = pair_ok & in_pose[1:] & in_pose[:-1]
+        still = moving & holding[1:] & holding[:-1]
+        out["poses"][names[p]] = {
+            "samples": int(in_pose.sum()),
+            "form_score": round(float(score[in_pose].mean()), 3),
+            "form_score_trend": trend,
+            "rule_pass_rate": {
+                pose.rule_names[i]: round(float(bits[in_pose, i].mean()), 3)
+                for i in np.flatnonzero(pose.is_check)
+            },
+            "longest_hold_s": round(float(holds.max()), 1) if len(holds) else 0.0,
+            "total_hold_s": round(float(holds.sum()), 1),
+            "holds": int(len(holds)),
+            # Median landmark speed: lower is steadier
+            "landmark_speed": round(float(np.median(speed[moving])), 4) if moving.any() else None,
+            "landmark_speed_holding": round(float(np.median(speed[still])), 4) if still.any() else None,
+        }
+    return out
+
+
+class PoseHistoryStore:
+    """
+    History of every live session plus the most recently finished ones (at most
+    keep_finished of them, holding at most keep_bytes), looked up by an unguessable token
+    that the client gets when its socket opens. Only touch it from the event loop.
+    """
+
+    def __init__(self, fps=5.0, seconds=3600, spill_dir=None, keep_finished=100, keep_bytes=64 << 20):
+        self.enabled = fps > 0
+        self.min_interval = 1.0 / fps if self.enabled else 0.0
+        self.capacity = max(int(fps * seconds), 1)
+        self.spill_dir = spill_dir
+        self.keep_finished = keep_finished
+        self.keep_bytes = keep_bytes
+        self._finished_bytes = 0
+        self._live = {}
+        self._finished = OrderedDict()
+        self._pose_index = {name: i for i, name in enumerate(default_engine().poses)}
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def open(self):
+        """Starts a session's history; returns its token, or None when history is off."""
+        if not self.enabled:
+            return None
+        token = secrets.token_urlsafe(12)
+        path = os.path.join(self.spill_dir, f"{token}.poses") if self.spill_dir else None
+        self._live[token] = SessionHistory(self.capacity, self.min_interval, path)
+        return token
+
+    def record(self, token, frame_info):
+        history = self._live.get(token)
+        if history is None or not frame_info:
+            return
+        history.append(self._pose_index.get(frame_info.get("mode"), UNKNOWN_POSE), frame_info)
+
+    def close(self, token):
+        history = self._live.pop(token, None)
+        if history is None:
+            return
+        history.finish()
+        self._finished[token] = history
+        self._finished_bytes += history.nbytes
+        while self._finished and (len(self._finished) > self.keep_finished or self._finished_bytes > self.keep_bytes):
+            _, old = self._finished.popitem(last=False)
+            self._finished_bytes -= old.nbytes
+            old.close()
+
+    def snapshot(self, token):
+        """
+        (rows, info) for a session, or None: a copy of its samples, safe to summarize in a
+        thread, and its live flag and buffer size.
+        """
+        history = self._live.get(token) or self._finished.get(token)
+        if history is None:
+            return None
+        return history.rows(), {"live": token in self._live, "buffer_bytes": history.nbytes}
+
+    def shutdown(self):
+        for history in list(self._live.values()) + list(self._finished.values()):
+            history.close()
+        self._live.clear()
+        self._finished.clear()
+        self._finished_bytes = 0
+
+
+def from_env():
+    """
+    POSE_HISTORY_FPS samples per second (0 turns history off), POSE_HISTORY_SECONDS per
+    session ring buffer, POSE_HISTORY_DIR to spill buffers to memory-mapped files, and
+    POSE_HISTORY_KEEP finished sessions, holding at most POSE_HISTORY_KEEP_MB, kept for
+    their summaries.
+    """
+    return PoseHistoryStore(
+        fps=float(os.getenv("POSE_HISTORY_FPS", "5") or 0),
+        seconds=float(os.getenv("POSE_HISTORY_SECONDS", "3600") or 3600),
+        spill_dir=os.getenv("POSE_HISTORY_DIR") or None,
+        keep_finished=int(os.getenv("POSE_HISTORY_KEEP", "100") or 100),
+        keep_bytes=int(float(os.getenv("POSE_HISTORY_KEEP_MB", "64") or 64) * (1 << 20)),
+    )
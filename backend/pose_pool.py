@@ -0,0 +1,205 @@
+import asyncio
+import itertools
+import multiprocessing
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import frame_protocol
+
+# --- Worker-process side ---
+# Everything below runs inside the pool's child processes. Each process keeps
+# one PoseAnalysisWorker (and therefore one mp_pose.Pose) per WebSocket session,
+# so MediaPipe's tracking state is never shared between users.
+_sessions = {}
+_spare = None  # a pre-built PoseAnalysisWorker from _warm_up, handed to the next session
+_worker_kwargs = {}
+_backend = "mediapipe"
+_stub_latency_ms = 0.0
+
+
+def _init_worker(worker_kwargs, backend, stub_latency_ms):
+    global _worker_kwargs, _backend, _stub_latency_ms
+    _worker_kwargs = dict(worker_kwargs)
+    _backend = backend
+    _stub_latency_ms = stub_latency_ms
+    # Import here so only the child processes pay for cv2/mediapipe.
+    import pose_worker  # noqa: F401
+
+
+def _ping():
+    return os.getpid()
+
+
+def _new_pose_worker(seed=0):
+    from pose_worker import PoseAnalysisWorker
+
+    kwargs = dict(_worker_kwargs)
+    if _backend == "stub":
+        from bench.stub_pose import StubPoseDetector
+        kwargs["pose_detector"] = StubPoseDetector(latency_ms=_stub_latency_ms, seed=seed)
+    return PoseAnalysisWorker(**kwargs)
+
+
+def _warm_up(tiers=()):
+    """
+    Loads MediaPipe and builds a Pose graph by pushing one blank frame through it, so the
+    first real session in this process doesn't pay for model loading. The other model
+    tiers a session may switch to are built too (fetching their model files), so that
+    never happens in the middle of an overload. The warmed worker (no person seen, so no
+    tracking state) is kept for that session.
+    """
+    global _spare
+    import cv2
+    import numpy as np
+
+    ok, jpeg = cv2.imencode(".jpg", np.full((240, 320, 3), 127, dtype=np.uint8))
+    worker = _new_pose_worker()
+    worker.process_binary(jpeg.tobytes(), "tree", frame_protocol.OUTPUT_LANDMARKS)
+    worker.warm_tiers(tiers)
+    _spare = worker
+    return os.getpid()
+
+
+def _session_worker(session_id, complexity=None):
+    global _spare
+
+    worker = _sessions.get(session_id)
+    if worker is None:
+        if _spare is not None:
+            worker, _spare = _spare, None
+        else:
+            worker = _new_pose_worker(seed=session_id)
+        _sessions[session_id] = worker
+    if complexity is not None:
+        worker.set_model_complexity(complexity)
+    return worker
+
+
+def _process(session_id, image, mode, output, include_timings, seq, complexity=None):
+    worker = _session_worker(session_id, complexity)
+    return worker.process_frame(image, mode, output, include_timings, seq), worker.last_frame_info
+
+
+def _process_binary(session_id, jpeg_bytes, mode, output, include_timings, complexity=None):
+    worker = _session_worker(session_id, complexity)
+    return worker.process_binary(jpeg_bytes, mode, output, include_timings), worker.last_frame_info
+
+
+def _close_session(session_id):
+    worker = _sessions.pop(session_id, None)
+    if worker is not None:
+        worker.close()
+
+
+# --- Server side ---
+def _default_num_workers():
+    configured = int(os.getenv("POSE_WORKERS", "0") or 0)
+    return configured if configured > 0 else (os.cpu_count() or 1)
+
+
+class PosePool:
+    """
+    Runs pose inference in a fixed set of worker processes.
+    Each session is pinned to one worker for its whole lifetime (least-loaded
+    worker at open time), so frames for a session always hit the same Pose graph.
+
+    backend="stub" replaces MediaPipe with bench.stub_pose.StubPoseDetector (optionally
+    burning stub_latency_ms of CPU per frame), for load tests on machines without the model.
+    model_tiers: every model_complexity sessions may be switched to, loaded at warm-up.
+    """
+
+    def __init__(self, num_workers=None, backend="mediapipe", stub_latency_ms=0.0, model_tiers=(), **worker_kwargs):
+        if backend not in ("mediapipe", "stub"):
+            raise ValueError(f"Unknown pose backend '{backend}'")
+        self.num_workers = num_workers or _default_num_workers()
+        self.backend = backend
+        self.model_tiers = tuple(model_tiers)
+        self._stub_latency_ms = stub_latency_ms
+        self._worker_kwargs = worker_kwargs
+        self._ctx = multiprocessing.get_context("spawn")
+        self._executors = [self._new_executor() for _ in range(self.num_workers)]
+        self._load = [0] * self.num_workers
+        self._affinity = {}
+        self._session_ids = itertools.count(1)
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=self._ctx,
+            initializer=_init_worker,
+            initargs=(self._worker_kwargs, self.backend, self._stub_latency_ms),
+        )
+
+    async def start(self, warm_up=True):
+        """
+        Spawns every worker process up front instead of on the first frame and, with
+        warm_up, runs one blank frame through a Pose graph in each of them and builds the
+        other model_tiers.
+        """
+        loop = asyncio.get_running_loop()
+        if warm_up:
+            calls = [loop.run_in_executor(ex, _warm_up, self.model_tiers) for ex in self._executors]
+        else:
+            calls = [loop.run_in_executor(ex, _ping) for ex in self._executors]
+        await asyncio.gather(*calls)
+
+    def open_session(self):
+        idx = min(range(self.num_workers), key=self._load.__getitem__)
+        session_id = next(self._session_ids)
+        self._affinity[session_id] = idx
+        self._load[idx] += 1
+        return session_id
+
+    def worker_of(self, session_id):
+        return self._affinity.get(session_id)
+
+    async def process_frame(self, session_id, image, mode, output=frame_protocol.OUTPUT_IMAGE,
+                            include_timings=False, seq=None, complexity=None):
+        """
+        JSON/base64 path: returns (json_string, frame_info) from
+        PoseAnalysisWorker.process_frame and its last_frame_info.
+        complexity switches the session's model tier first (None keeps the current one).
+        """
+        return await self._submit(session_id, _process, image, mode, output, include_timings, seq, complexity)
+
+    async def process_binary(self, session_id, jpeg_bytes, mode, output=frame_protocol.OUTPUT_IMAGE,
+                             include_timings=False, complexity=None):
+        """Binary path: returns (packed frame_protocol result, frame_info)."""
+        return await self._submit(session_id, _process_binary, jpeg_bytes, mode, output, include_timings, complexity)
+
+    async def _submit(self, session_id, fn, *args):
+        idx = self._affinity[session_id]
+        executor = self._executors[idx]
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(executor, fn, session_id, *args)
+        except BrokenProcessPool:
+            # The worker died (e.g. a native crash inside mediapipe). Replace it so the
+            # other sessions pinned to this slot recover on their next frame.
+            if self._executors[idx] is executor:
+                print(f"❌ Pose worker {idx} crashed, restarting it.")
+                self._restart_worker(idx)
+            raise
+
+    async def close_session(self, session_id):
+        idx = self._affinity.pop(session_id, None)
+        if idx is None:
+            return
+        self._load[idx] -= 1
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self._executors[idx], _close_session, session_id)
+        except Exception:
+            print(f"Error closing pose session {session_id}:")
+            traceback.print_exc()
+
+    def _restart_worker(self, idx):
+        old = self._executors[idx]
+        self._executors[idx] = self._new_executor()
+        old.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        for ex in self._executors:
+            ex.shutdown(wait=True, cancel_futures=True)
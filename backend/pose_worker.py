@@ -2,161 +2,534 @@ import cv2
 import numpy as np
 import base64
 import json
+import threading
+import time
 import traceback
 
-# Try to import mediapipe in a robust way (works across multiple versions/install styles).
-_mp_solutions = None
+# mediapipe is imported on first use, so processes that only run a stub detector
+# (bench.stub_pose, POSE_BACKEND=stub) don't need it installed.
+_mp_pose_module = None
+_mp_drawing = None
 _mp_name = None
-try:
-    # Preferred: import mediapipe as mp (typical)
-    import mediapipe as mp
-    _mp_solutions = mp.solutions
-    _mp_name = "mediapipe (import mediapipe as mp)"
-except Exception:
+
+def _load_mediapipe():
+    """Imports mediapipe in a robust way (works across multiple versions/install styles)."""
+    global _mp_pose_module, _mp_drawing, _mp_name
+    if _mp_pose_module is not None:
+        return
     try:
-        # Alternative packaging: from mediapipe import solutions
-        from mediapipe import solutions as _mp_solutions
-        _mp_name = "mediapipe.solutions (from mediapipe import solutions)"
-    except Exception as e:
-        raise ImportError(
-            "Could not import mediapipe. Make sure mediapipe is installed and "
-            "compatible with your Python version. If you upgraded mediapipe recently, "
-            "consider pinning to the previously-working version (e.g. mediapipe==0.10.14). "
-            f"Original import error: {e}"
-        ) from e
-
-# Now get the pose & drawing modules
-_mp_pose_module = getattr(_mp_solutions, "pose", None)
-_mp_drawing = getattr(_mp_solutions, "drawing_utils", None)
-
-if _mp_pose_module is None:
-    raise ImportError("mediapipe.solutions.pose not found in the mediapipe installation.")
-
-# Import specific pose logic (user's pose calculation modules)
-from poses import tree, warrior, sphinx
+        # Preferred: import mediapipe as mp (typical)
+        import mediapipe as mp
+        mp_solutions = mp.solutions
+        mp_name = "mediapipe (import mediapipe as mp)"
+    except Exception:
+        try:
+            # Alternative packaging: from mediapipe import solutions
+            from mediapipe import solutions as mp_solutions
+            mp_name = "mediapipe.solutions (from mediapipe import solutions)"
+        except Exception as e:
+            raise ImportError(
+                "Could not import mediapipe. Make sure mediapipe is installed and "
+                "compatible with your Python version. If you upgraded mediapipe recently, "
+                "consider pinning to the previously-working version (e.g. mediapipe==0.10.14). "
+                f"Original import error: {e}"
+            ) from e
+
+    # Now get the pose & drawing modules
+    pose_module = getattr(mp_solutions, "pose", None)
+    if pose_module is None:
+        raise ImportError("mediapipe.solutions.pose not found in the mediapipe installation.")
+    _mp_pose_module = pose_module
+    _mp_drawing = getattr(mp_solutions, "drawing_utils", None)
+    _mp_name = mp_name
+
+# Declarative pose rules (poses/pose_library.json)
+from poses.engine import AUTO_MODE, default_engine
+import frame_protocol
+import frame_decode
+
+# Motion gate: frames are compared as tiny grayscale thumbnails
+_MOTION_THUMB_SIZE = (32, 24)
+
+# MediaPipe Pose model_complexity tiers
+MODEL_TIERS = {0: "lite", 1: "full", 2: "heavy"}
+# mediapipe downloads the lite/heavy model files the first time they're built, so the frame
+# path only builds tiers that have loaded in this process before (warm_tiers at startup);
+# any other tier is loaded on a background thread and retried TIER_RETRY_SECONDS after a failure
+TIER_RETRY_SECONDS = 60.0
+_loaded_tiers = set()
+_loading_tiers = set()
+_tier_retry_at = {}  # tier -> time.monotonic() before which it isn't retried
+# In auto mode, another pose (or "not recognized") must come up this many frames in a row to take over
+AUTO_SWITCH_FRAMES = 3
+# No challenger yet; distinct from None, which is the "not recognized" result
+_NO_CANDIDATE = object()
+
+def _timings_ms(timings):
+    return {stage: round(seconds * 1000, 2) for stage, seconds in timings.items()}
 
 class PoseAnalysisWorker:
-    def __init__(self, min_detection_confidence=0.7, min_tracking_confidence=0.7):
-        print(f"Initializing PoseAnalysisWorker using {_mp_name}")
+    def __init__(self, min_detection_confidence=0.7, min_tracking_confidence=0.7,
+                 motion_threshold=None, motion_max_skip=15, process_width=None, roi_crop=False,
+                 pose_detector=None, model_complexity=1):
+        """
+        model_complexity: MediaPipe Pose tier to start with (0 lite, 1 full, 2 heavy); see
+        set_model_complexity for switching under load.
+        pose_detector: optional stand-in for mp_pose.Pose (anything with process(rgb_image) and
+        close()), e.g. bench.stub_pose.StubPoseDetector to measure everything except the model.
+        process_width: if set, frames are decoded (using libjpeg's reduced-resolution decode
+        where possible) to at most this width before anything else touches them.
+        roi_crop: if True, MediaPipe only sees a box around the previous frame's landmarks.
+        The box is kept until the pose drifts near its edges, so tracking sees a stable crop.
+
+        motion_threshold: if set, frames whose mean absolute difference (0-255 gray levels,
+        on a 32x24 thumbnail) from the last inferred frame is below this value reuse that
+        frame's landmarks instead of running pose.process. At most motion_max_skip frames
+        in a row are skipped so tracking can't go stale.
+        """
+        if pose_detector is None:
+            _load_mediapipe()
+        else:
+            # Stub detectors still use mediapipe's drawing utils when it's installed
+            try:
+                _load_mediapipe()
+            except ImportError:
+                pass
+        print(f"Initializing PoseAnalysisWorker using {_mp_name if pose_detector is None else type(pose_detector).__name__}")
         self.mp_pose = _mp_pose_module
-        self.mp_drawing = _mp_drawing
+        self.mp_drawing = _mp_drawing if _mp_drawing and hasattr(_mp_drawing, "draw_landmarks") else None
+        if self.mp_drawing is None:
+            print("Warning: drawing_utils not available; frames will be returned without a skeleton.")
+        self.rules = default_engine()
 
+        self.motion_threshold = motion_threshold
+        self.motion_max_skip = motion_max_skip
+        self._ref_thumb = None
+        self._last_results = None
+        self._skip_run = 0
+        # Auto mode: the pose currently recognized and a challenger with its consecutive votes
+        self._auto_pose = None
+        self._auto_candidate = _NO_CANDIDATE
+        self._auto_votes = 0
+        self.frames_inferred = 0
+        self.frames_skipped = 0
+        self.process_width = process_width
+        self.roi_crop = roi_crop
+        self._roi = None
+        # Per-frame info for the caller: {"inferred": bool, "detected": bool, "tier": int,
+        # "mode": str, "timings": {stage: seconds}} for the most recent frame, plus packed
+        # "landmarks" and the rule "checks" bitmask when a pose was found
+        # (recorded by pose_history)
+        self.last_frame_info = {}
+
+        self.min_detection_confidence = min_detection_confidence
+        self.min_tracking_confidence = min_tracking_confidence
+        self.model_complexity = model_complexity
+        self._stub_detector = pose_detector
+        # One Pose graph per tier used so far, so switching back and forth is cheap
+        self._poses = {}
+        self.pose = self._pose_for(model_complexity)
+
+    def _pose_for(self, complexity):
+        if self._stub_detector is not None:
+            return self._stub_detector
+        pose = self._poses.get(complexity)
+        if pose is not None:
+            return pose
         # Create the Pose object. Wrap in try/except to show clear error if model initialization fails.
         try:
-            self.pose = self.mp_pose.Pose(
-                min_detection_confidence=min_detection_confidence,
-                min_tracking_confidence=min_tracking_confidence
+            pose = self.mp_pose.Pose(
+                model_complexity=complexity,
+                min_detection_confidence=self.min_detection_confidence,
+                min_tracking_confidence=self.min_tracking_confidence
             )
         except Exception as e:
             traceback.print_exc()
             raise RuntimeError("Failed to initialize MediaPipe Pose object. See traceback above.") from e
+        self._poses[complexity] = pose
+        _loaded_tiers.add(complexity)
+        return pose
+
+    def warm_tiers(self, tiers):
+        """
+        Builds a graph for each tier up front (downloading its model file if needed), so a
+        later switch under load never waits on the network. Failures are logged, not raised.
+        """
+        for complexity in tiers:
+            if complexity not in MODEL_TIERS:
+                continue
+            try:
+                self._pose_for(complexity)
+            except RuntimeError:
+                print(f"Pose model tier {complexity} failed to load; retrying when it's needed.")
+                _tier_retry_at[complexity] = time.monotonic() + TIER_RETRY_SECONDS
+
+    def _load_tier_in_background(self, complexity):
+        if complexity in _loading_tiers or time.monotonic() < _tier_retry_at.get(complexity, 0.0):
+            return
+        _loading_tiers.add(complexity)
+        mp_pose = self.mp_pose
+
+        def load():
+            try:
+                mp_pose.Pose(model_complexity=complexity).close()
+                _loaded_tiers.add(complexity)
+                print(f"Pose model tier {complexity} loaded.")
+            except Exception:
+                print(f"Pose model tier {complexity} failed to load; retrying in {TIER_RETRY_SECONDS:.0f}s:")
+                traceback.print_exc()
+                _tier_retry_at[complexity] = time.monotonic() + TIER_RETRY_SECONDS
+            finally:
+                _loading_tiers.discard(complexity)
+
+        threading.Thread(target=load, name=f"pose-tier-{complexity}", daemon=True).start()
 
-    def process_frame(self, base64_image: str, mode: str) -> str:
+    def set_model_complexity(self, complexity: int):
         """
-        Decodes base64 -> Processes with MediaPipe -> Draws -> Encodes base64
-        Returns a JSON string: {"image": "...", "stats": {...}}
+        Switches inference to another model tier (built on first use, then kept).
+        The other graph's tracking state is stale after a switch, so it re-detects
+        on its first frame; the ROI crop is reset for the same reason. A tier that hasn't
+        loaded in this process yet is loaded in the background and the current one kept
+        meanwhile (see last_frame_info["tier"]), so the caller may ask again later.
         """
+        if complexity == self.model_complexity or complexity not in MODEL_TIERS:
+            return
+        if self._stub_detector is None and complexity not in self._poses and complexity not in _loaded_tiers:
+            self._load_tier_in_background(complexity)
+            return
+        try:
+            self.pose = self._pose_for(complexity)
+        except RuntimeError:
+            print(f"Pose model tier {complexity} is unavailable, staying on {self.model_complexity}.")
+            _tier_retry_at[complexity] = time.monotonic() + TIER_RETRY_SECONDS
+            _loaded_tiers.discard(complexity)
+            return
+        self.model_complexity = complexity
+        self._roi = None
+
+    def close(self):
+        """Releases the MediaPipe graphs owned by this worker."""
+        for pose in list(self._poses.values()) or [self.pose]:
+            try:
+                pose.close()
+            except Exception:
+                traceback.print_exc()
+
+    def process_frame(self, base64_image: str, mode: str, output: str = frame_protocol.OUTPUT_IMAGE,
+                      include_timings: bool = False, seq=None) -> str:
+        """
+        Decodes base64 -> analyze_jpeg -> Encodes base64
+        Returns a JSON string: {"image": "...", "landmarks": ..., "stats": {...}}
+        or, for output="landmarks": {"landmarks": "<base64 packed landmarks>" | null, "stats": {...}}
+        With include_timings, a "timings" object of per-stage milliseconds is added.
+        A client-supplied seq is echoed back so clients can match results to frames.
+        """
+        self.last_frame_info = {}
         if not base64_image:
             return None
 
-        # 1. Decode Base64 to OpenCV Image
+        # 1. Decode Base64 to JPEG bytes
+        started = time.perf_counter()
         try:
             # Accept either full data URL or raw base64
             if ',' in base64_image:
                 encoded_data = base64_image.split(',')[1]
             else:
                 encoded_data = base64_image
-
-            nparr = np.frombuffer(base64.b64decode(encoded_data), np.uint8)
-            image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            if image is None:
-                print("Failed to decode image from base64")
-                return None
+            jpeg_bytes = base64.b64decode(encoded_data)
         except Exception:
             print("Exception decoding base64 image:")
             traceback.print_exc()
             return None
 
-        # 2. Convert to RGB for MediaPipe
+        b64_time = time.perf_counter() - started
+
+        draw = output != frame_protocol.OUTPUT_LANDMARKS
+        result = self.analyze_jpeg(jpeg_bytes, mode, draw=draw)
+        if result is None:
+            return None
+        out_jpeg, pose_stats, landmarks = result
+        timings = self.last_frame_info["timings"]
+        timings["b64decode"] = b64_time
+        started = time.perf_counter()
+
+        packed = None
+        if landmarks is not None:
+            packed = base64.b64encode(frame_protocol.pack_landmarks(landmarks)).decode('ascii')
+
+        if not draw:
+            response = {"landmarks": packed, "stats": pose_stats}
+            if include_timings:
+                response["timings"] = _timings_ms(timings)
+            if seq is not None:
+                response["seq"] = seq
+            result_json = json.dumps(response)
+            timings["serialize"] = time.perf_counter() - started
+            return result_json
+
+        # 2. Encode back to Base64 to return to React
+        if out_jpeg is jpeg_bytes:
+            # Nothing was drawn/re-encoded: echo the caller's data URL untouched
+            image_data_url = base64_image
+        else:
+            img_str = base64.b64encode(out_jpeg).decode('utf-8')
+            image_data_url = f"data:image/jpeg;base64,{img_str}"
+
+        # 3. Return JSON structure (landmarks too, ~220 bytes, for the co-op relay)
+        response = {
+            "image": image_data_url,
+            "landmarks": packed,
+            "stats": pose_stats
+        }
+        if include_timings:
+            response["timings"] = _timings_ms(timings)
+        if seq is not None:
+            response["seq"] = seq
+        result_json = json.dumps(response)
+        timings["serialize"] = time.perf_counter() - started
+        return result_json
+
+    def process_binary(self, jpeg_bytes: bytes, mode: str, output: str = frame_protocol.OUTPUT_IMAGE,
+                       include_timings: bool = False) -> bytes:
+        """
+        Binary-protocol counterpart of process_frame (see frame_protocol).
+        Returns a packed result message, or None if the frame could not be decoded.
+        """
+        self.last_frame_info = {}
+        draw = output != frame_protocol.OUTPUT_LANDMARKS
+        result = self.analyze_jpeg(jpeg_bytes, mode, draw=draw)
+        if result is None:
+            return None
+        out_jpeg, pose_stats, landmarks = result
+        timings = self.last_frame_info["timings"]
+        started = time.perf_counter()
+        if draw:
+            payload = out_jpeg
+        else:
+            payload = frame_protocol.pack_landmarks(landmarks) if landmarks is not None else b""
+        header = pose_stats
+        if include_timings:
+            header = dict(pose_stats, **{frame_protocol.TIMINGS_KEY: _timings_ms(timings)})
+        packed = frame_protocol.pack_result(payload, header)
+        timings["serialize"] = time.perf_counter() - started
+        return packed
+
+    def _recognize(self, landmarks, width, height):
+        """Auto mode: the recognized pose, which only changes once AUTO_SWITCH_FRAMES frames agree."""
+        name, _distance = self.rules.recognize(landmarks, width, height)
+        if name == self._auto_pose:
+            self._auto_candidate, self._auto_votes = _NO_CANDIDATE, 0
+            return name
+        if self._auto_candidate is _NO_CANDIDATE or name != self._auto_candidate:
+            self._auto_candidate, self._auto_votes = name, 0
+        self._auto_votes += 1
+        if self._auto_votes >= AUTO_SWITCH_FRAMES:
+            self._auto_pose = name
+            self._auto_candidate, self._auto_votes = _NO_CANDIDATE, 0
+        return self._auto_pose
+
+    def _draw_landmarks(self, image, pose_landmarks):
+        """Draws the skeleton onto image in place. Drawing errors are non-fatal."""
+        if self.mp_drawing is None:
+            return
+        # Some mediapipe versions expect different args; use the common signature
         try:
-            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            self.mp_drawing.draw_landmarks(
+                image,
+                pose_landmarks,
+                self.mp_pose.POSE_CONNECTIONS
+            )
+        except Exception:
+            # fallback: try drawing without connections if connection constant changed
+            try:
+                self.mp_drawing.draw_landmarks(
+                    image,
+                    pose_landmarks
+                )
+            except Exception:
+                # swallow drawing errors (we can still compute stats)
+                print("Warning: failed to draw landmarks (non-fatal).")
+                traceback.print_exc()
+
+    def _roi_pixels(self, image):
+        """The current ROI as an (x0, y0, x1, y1) pixel box in image, or None for the full frame."""
+        if self._roi is None:
+            return None
+        h, w = image.shape[:2]
+        x0, y0, x1, y1 = self._roi
+        box = (int(x0 * w), int(y0 * h), int(np.ceil(x1 * w)), int(np.ceil(y1 * h)))
+        if box[2] - box[0] < 16 or box[3] - box[1] < 16:
+            return None
+        return box
+
+    @staticmethod
+    def _uncrop_landmarks(pose_landmarks, roi_box, image_shape):
+        """Maps landmarks normalized to the crop back to full-frame normalized coordinates."""
+        h, w = image_shape[:2]
+        x0, y0, x1, y1 = roi_box
+        sx, sy = (x1 - x0) / w, (y1 - y0) / h
+        ox, oy = x0 / w, y0 / h
+        for lm in pose_landmarks.landmark:
+            lm.x = ox + lm.x * sx
+            lm.y = oy + lm.y * sy
+
+    def _motion_gate_allows_skip(self, image) -> bool:
+        """
+        True if image is close enough to the last inferred frame to reuse its results.
+        Also records the reference thumbnail whenever inference is going to run.
+        """
+        if not self.motion_threshold:
+            return False
+        try:
+            thumb = cv2.cvtColor(
+                cv2.resize(image, _MOTION_THUMB_SIZE, interpolation=cv2.INTER_AREA),
+                cv2.COLOR_BGR2GRAY
+            )
         except Exception:
-            # If conversion fails, send back original image with empty stats
-            print("cv2.cvtColor failed on image:")
             traceback.print_exc()
-            return json.dumps({"image": base64_image, "stats": {}})
+            return False
 
-        # Process
+        ref = self._ref_thumb
+        if (
+            ref is not None
+            and self._last_results is not None
+            and self._skip_run < self.motion_max_skip
+            and float(cv2.absdiff(thumb, ref).mean()) < self.motion_threshold
+        ):
+            return True
+        self._ref_thumb = thumb
+        return False
+
+    def analyze_jpeg(self, jpeg_bytes: bytes, mode: str, draw: bool = True):
+        """
+        Decodes JPEG -> Processes with MediaPipe -> Draws -> Encodes JPEG
+        Returns (jpeg_bytes, stats, landmarks), or None if the input could not be decoded.
+        landmarks is a (33, 3) array of normalized [x, y, visibility], or None if no pose was found.
+        If drawing/encoding fails the input bytes are returned as-is; with draw=False
+        the drawing and re-encode are skipped entirely and jpeg_bytes is None.
+        """
+        timings = {}
+        self.last_frame_info = {"timings": timings, "tier": self.model_complexity, "mode": mode}
+        clock = time.perf_counter
+        t = clock()
+
+        # 1. Decode JPEG to OpenCV Image (directly at the processing resolution if configured)
         try:
-            results = self.pose.process(image_rgb)
+            image = frame_decode.decode_jpeg(jpeg_bytes, self.process_width)
+            if image is None:
+                print("Failed to decode JPEG image")
+                return None
         except Exception:
-            print("MediaPipe pose.process raised an exception:")
+            print("Exception decoding JPEG image:")
             traceback.print_exc()
-            results = None
+            return None
+        timings["decode"], t = clock() - t, clock()
 
-        # Initialize empty stats
-        pose_stats = {}
+        # 2. Motion gate: reuse the last landmarks while the user is holding still
+        skip = self._motion_gate_allows_skip(image)
+        if self.motion_threshold:
+            timings["motion_gate"], t = clock() - t, clock()
+        if skip:
+            results = self._last_results
+            self._skip_run += 1
+            self.frames_skipped += 1
+            self.last_frame_info["inferred"] = False
+        else:
+            # 3. Crop to the region of interest and convert to RGB for MediaPipe
+            roi_box = self._roi_pixels(image) if self.roi_crop else None
+            if roi_box is not None:
+                x0, y0, x1, y1 = roi_box
+                model_input = image[y0:y1, x0:x1]
+            else:
+                model_input = image
+            try:
+                image_rgb = cv2.cvtColor(model_input, cv2.COLOR_BGR2RGB)
+            except Exception:
+                # If conversion fails, send back original image with empty stats
+                print("cv2.cvtColor failed on image:")
+                traceback.print_exc()
+                return (jpeg_bytes if draw else None), {}, None
+            timings["cvtColor"], t = clock() - t, clock()
 
-        # 3. Draw Skeleton & Route to specific pose logic
-        if results and getattr(results, "pose_landmarks", None):
+            # Process
             try:
-                if self.mp_drawing and hasattr(self.mp_drawing, "draw_landmarks"):
-                    # Some mediapipe versions expect different args; use the common signature
-                    try:
-                        self.mp_drawing.draw_landmarks(
-                            image,
-                            results.pose_landmarks,
-                            self.mp_pose.POSE_CONNECTIONS
-                        )
-                    except Exception:
-                        # fallback: try drawing without connections if connection constant changed
-                        try:
-                            self.mp_drawing.draw_landmarks(
-                                image,
-                                results.pose_landmarks
-                            )
-                        except Exception:
-                            # swallow drawing errors (we can still compute stats)
-                            print("Warning: failed to draw landmarks (non-fatal).")
-                            traceback.print_exc()
-                else:
-                    print("Warning: drawing_utils not available in this mediapipe build.")
+                results = self.pose.process(image_rgb)
             except Exception:
-                print("Unexpected error while drawing landmarks:")
+                print("MediaPipe pose.process raised an exception:")
                 traceback.print_exc()
+                results = None
+            timings["inference"], t = clock() - t, clock()
+
+            if results and getattr(results, "pose_landmarks", None):
+                if roi_box is not None:
+                    self._uncrop_landmarks(results.pose_landmarks, roi_box, image.shape)
+            else:
+                # Lost the pose: search the whole frame again next time
+                self._roi = None
+
+            self._last_results = results
+            self._skip_run = 0
+            self.frames_inferred += 1
+            self.last_frame_info["inferred"] = True
 
-            # Route to pose-specific logic
+        # Initialize empty stats
+        pose_stats = {}
+        landmark_array = None
+
+        # 4. Draw Skeleton & Route to specific pose logic
+        detected = bool(results and getattr(results, "pose_landmarks", None))
+        self.last_frame_info["detected"] = detected
+        if detected:
+            landmark_array = np.array(
+                [(lm.x, lm.y, lm.visibility) for lm in results.pose_landmarks.landmark],
+                dtype=np.float32
+            )
+            if self.roi_crop and self.last_frame_info.get("inferred"):
+                if self._roi is None or not frame_decode.roi_contains(self._roi, landmark_array):
+                    self._roi = frame_decode.roi_from_landmarks(landmark_array)
+            if draw:
+                t = clock()
+                self._draw_landmarks(image, results.pose_landmarks)
+                timings["draw"] = clock() - t
+
+            # Route to pose-specific rules. Landmarks are normalized to the full frame,
+            # so the (possibly downscaled) frame size only has to preserve the aspect ratio.
+            t = clock()
             try:
-                landmarks = results.pose_landmarks.landmark
-                if mode == 'tree':
-                    pose_stats = tree.process(image, landmarks, self.mp_pose)
-                elif mode == 'warrior':
-                    pose_stats = warrior.process(image, landmarks, self.mp_pose)
-                elif mode == 'sphinx':
-                    pose_stats = sphinx.process(image, landmarks, self.mp_pose)
+                h, w = image.shape[:2]
+                pose_name = mode
+                if mode == AUTO_MODE:
+                    pose_name = self._recognize(landmark_array, w, h)
+                    self.last_frame_info["mode"] = pose_name
+                pose_stats, passed = self.rules.evaluate_checks(pose_name, landmark_array, w, h)
+                if pose_stats is None:
+                    pose_stats = {"Status": "Pose not recognized" if mode == AUTO_MODE else "Unknown mode"}
                 else:
-                    pose_stats = {"Status": "Unknown mode"}
+                    if mode == AUTO_MODE:
+                        pose_stats = {"Pose": pose_name, **pose_stats}
+                    # Bit i set = rule i passed; kept with the landmarks in the session history
+                    self.last_frame_info["checks"] = sum(1 << i for i, ok in enumerate(passed) if ok)
             except Exception:
                 print("Pose calculation error:")
                 traceback.print_exc()
                 pose_stats = {"Status": "Error in pose calculation"}
+            timings["rules"] = clock() - t
+            self.last_frame_info["landmarks"] = frame_protocol.pack_landmarks(landmark_array)
+
+        if not draw:
+            return None, pose_stats, landmark_array
 
-        # 4. Encode back to Base64 to return to React
+        # 5. Encode back to JPEG
+        t = clock()
         try:
             success, buffer = cv2.imencode('.jpg', image)
+            timings["encode"] = clock() - t
             if not success:
                 print("cv2.imencode failed")
-                return json.dumps({"image": base64_image, "stats": pose_stats})
-            img_str = base64.b64encode(buffer).decode('utf-8')
-            image_data_url = f"data:image/jpeg;base64,{img_str}"
+                return jpeg_bytes, pose_stats, landmark_array
+            return buffer.tobytes(), pose_stats, landmark_array
         except Exception:
-            print("Error encoding image back to base64:")
+            print("Error encoding image back to JPEG:")
             traceback.print_exc()
             # fallback to returning the original input if encoding fails
-            image_data_url = base64_image
-
-        # 5. Return JSON structure
-        return json.dumps({
-            "image": image_data_url,
-            "stats": pose_stats
-        })
+            return jpeg_bytes, pose_stats, landmark_array
@@ -1,8 +1,16 @@
 import numpy as np
 
+def calculate_angles(a, b, c):
+    """
+    Batched joint angles in degrees. a, b, c are (N, 2) arrays of points;
+    row i gives the angle a[i] -> b[i] -> c[i] at vertex b[i].
+    """
+    ba = np.asarray(a, dtype=np.float64) - b
+    bc = np.asarray(c, dtype=np.float64) - b
+    dot = np.einsum("ij,ij->i", ba, bc)
+    norms = np.linalg.norm(ba, axis=1) * np.linalg.norm(bc, axis=1)
+    cosine_angle = dot / (norms + 1e-9)
+    return np.degrees(np.arccos(np.clip(cosine_angle, -1.0, 1.0)))
+
 def calculate_angle(a, b, c):
-    a = np.array(a); b = np.array(b); c = np.array(c)
-    ba = a - b; bc = c - b
-    cosine_angle = np.dot(ba, bc) / (np.linalg.norm(ba) * np.linalg.norm(bc) + 1e-9)
-    angle = np.arccos(np.clip(cosine_angle, -1.0, 1.0))
-    return float(np.degrees(angle))
+    return float(calculate_angles([a], [b], [c])[0])
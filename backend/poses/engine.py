@@ -0,0 +1,207 @@
+"""
+Declarative pose rules.
+
+Poses are data (see pose_library.json), not code. Each pose is a list of rules:
+
+  {"name": "Leg Straight", "type": "angle",
+   "joints": [["RIGHT_HIP", "RIGHT_KNEE", "RIGHT_ANKLE"], ...],   # angle at the middle joint
+   "min": 165, "max": 180,          # optional, exclusive bounds -> the rule becomes a check
+   "reduce": "mean" | "all",        # check the mean of all measurements, or every one of them
+   "truncate": "terms" | "mean",    # int() each measurement, or their mean, before checking
+   "labels": ["True", "False"],     # strings reported for pass/fail
+   "display": "degrees"}            # report the (mean) value as "123°" instead of a check
+
+  {"name": "Back Lifted", "type": "vertical" | "horizontal",
+   "pairs": [[A, B], ...],          # A/B: a landmark name or a list of names (averaged)
+   "abs": true,                     # compare |offset| instead of the signed offset
+   "min": 0.1}
+
+For vertical/horizontal rules the measurement is B - A along y/x, in fractions of the
+frame height/width, so "vertical" with A above B gives a positive value.
+
+Every pose is compiled once into index/weight arrays, so a frame costs one batched
+angle computation, one matrix product for the offsets and a handful of vector ops,
+no matter how many rules the pose has.
+"""
+import functools
+import json
+import os
+
+import numpy as np
+
+from poses.calculate_angle import calculate_angles
+from poses.recognition import ReferenceIndex
+
+# MediaPipe Pose landmark order
+LANDMARK_NAMES = (
+    "NOSE", "LEFT_EYE_INNER", "LEFT_EYE", "LEFT_EYE_OUTER", "RIGHT_EYE_INNER",
+    "RIGHT_EYE", "RIGHT_EYE_OUTER", "LEFT_EAR", "RIGHT_EAR", "MOUTH_LEFT",
+    "MOUTH_RIGHT", "LEFT_SHOULDER", "RIGHT_SHOULDER", "LEFT_ELBOW", "RIGHT_ELBOW",
+    "LEFT_WRIST", "RIGHT_WRIST", "LEFT_PINKY", "RIGHT_PINKY", "LEFT_INDEX",
+    "RIGHT_INDEX", "LEFT_THUMB", "RIGHT_THUMB", "LEFT_HIP", "RIGHT_HIP",
+    "LEFT_KNEE", "RIGHT_KNEE", "LEFT_ANKLE", "RIGHT_ANKLE", "LEFT_HEEL",
+    "RIGHT_HEEL", "LEFT_FOOT_INDEX", "RIGHT_FOOT_INDEX",
+)
+LANDMARK_INDEX = {name: i for i, name in enumerate(LANDMARK_NAMES)}
+
+# mode that picks the pose by recognition (see poses/recognition.py) instead of by name
+AUTO_MODE = "auto"
+
+DEFAULT_LIBRARY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pose_library.json")
+
+_AXES = {"horizontal": 0, "vertical": 1}
+
+
+class CompiledPose:
+    """One pose's rules flattened into index/weight arrays."""
+
+    def __init__(self, name, rules):
+        self.name = name
+        self.rule_names = [r["name"] for r in rules]
+
+        angle_triples = []    # (k, 3) landmark indices
+        point_weights = []    # (m, 33) rows averaging landmarks into points
+        offsets = []          # (t, 4): point A, point B, axis, abs
+        term_source = []      # per measurement term: ("angle", i) or ("offset", i)
+        term_rule = []
+
+        def point(spec):
+            names = [spec] if isinstance(spec, str) else list(spec)
+            row = np.zeros(len(LANDMARK_NAMES))
+            for n in names:
+                row[LANDMARK_INDEX[n]] += 1.0 / len(names)
+            point_weights.append(row)
+            return len(point_weights) - 1
+
+        n_rules = len(rules)
+        lo = np.full(n_rules, -np.inf)
+        hi = np.full(n_rules, np.inf)
+        is_all = np.zeros(n_rules, dtype=bool)
+        trunc_terms = np.zeros(n_rules, dtype=bool)
+        trunc_mean = np.zeros(n_rules, dtype=bool)
+        self.display = []
+        self.labels = []
+
+        for r_idx, rule in enumerate(rules):
+            kind = rule["type"]
+            if kind == "angle":
+                for triple in rule["joints"]:
+                    angle_triples.append([LANDMARK_INDEX[n] for n in triple])
+                    term_source.append(("angle", len(angle_triples) - 1))
+                    term_rule.append(r_idx)
+            elif kind in _AXES:
+                for a, b in rule["pairs"]:
+                    offsets.append((point(a), point(b), _AXES[kind], bool(rule.get("abs", False))))
+                    term_source.append(("offset", len(offsets) - 1))
+                    term_rule.append(r_idx)
+            else:
+                raise ValueError(f"Pose '{name}': unknown rule type '{kind}'")
+
+            lo[r_idx] = rule.get("min", -np.inf)
+            hi[r_idx] = rule.get("max", np.inf)
+            is_all[r_idx] = rule.get("reduce", "mean") == "all"
+            trunc_terms[r_idx] = rule.get("truncate") == "terms"
+            trunc_mean[r_idx] = rule.get("truncate") == "mean"
+            self.display.append(rule.get("display"))
+            self.labels.append(tuple(rule.get("labels", ("True", "False"))))
+
+        self.angle_idx = np.array(angle_triples, dtype=np.intp).reshape(-1, 3)
+        self.point_weights = np.array(point_weights).reshape(-1, len(LANDMARK_NAMES))
+        offsets = np.array(offsets, dtype=np.intp).reshape(-1, 4)
+        self.offset_a, self.offset_b = offsets[:, 0], offsets[:, 1]
+        self.offset_axis, self.offset_abs = offsets[:, 2], offsets[:, 3].astype(bool)
+
+        # Measurements vector = [angles..., offsets...]; map each term into it
+        n_angles = len(self.angle_idx)
+        self.term_meas = np.array(
+            [i if src == "angle" else n_angles + i for src, i in term_source], dtype=np.intp
+        )
+        self.term_rule = np.array(term_rule, dtype=np.intp)
+        self.term_lo, self.term_hi = lo[self.term_rule], hi[self.term_rule]
+        self.term_trunc, self.value_trunc = trunc_terms[self.term_rule], trunc_mean
+
+        # (rules x terms) averaging matrix: mean of each rule's measurements
+        counts = np.bincount(self.term_rule, minlength=n_rules)
+        self.rule_mean = np.zeros((n_rules, len(self.term_rule)))
+        self.rule_mean[self.term_rule, np.arange(len(self.term_rule))] = 1.0 / counts[self.term_rule]
+
+        self.lo, self.hi, self.is_all = lo, hi, is_all
+        # Rules with bounds are pass/fail checks; the rest only display a value
+        self.is_check = np.isfinite(lo) | np.isfinite(hi)
+        self.n_rules = n_rules
+
+    def measure(self, landmarks, width, height):
+        """Returns (values, passed): per-rule mean measurement and pass/fail arrays."""
+        xy = np.asarray(landmarks, dtype=np.float64)[:, :2]
+
+        # Angles are computed in pixel space so the aspect ratio doesn't skew them
+        px = xy * (width, height)
+        ai = self.angle_idx
+        angles = calculate_angles(px[ai[:, 0]], px[ai[:, 1]], px[ai[:, 2]])
+
+        # Offsets stay normalized (fractions of the frame)
+        points = self.point_weights @ xy
+        diff = points[self.offset_b, self.offset_axis] - points[self.offset_a, self.offset_axis]
+        diff = np.where(self.offset_abs, np.abs(diff), diff)
+
+        terms = np.concatenate((angles, diff))[self.term_meas]
+        terms = np.where(self.term_trunc, np.trunc(terms), terms)
+        values = self.rule_mean @ terms
+        values = np.where(self.value_trunc, np.trunc(values), values)
+
+        term_ok = (self.term_lo < terms) & (terms < self.term_hi)
+        all_ok = np.bincount(self.term_rule[~term_ok], minlength=self.n_rules) == 0
+        mean_ok = (self.lo < values) & (values < self.hi)
+        return values, np.where(self.is_all, all_ok, mean_ok)
+
+    def evaluate(self, landmarks, width, height):
+        """Returns the stats dict shown to the user."""
+        return self.stats(*self.measure(landmarks, width, height))
+
+    def stats(self, values, passed):
+        stats = {}
+        for i, name in enumerate(self.rule_names):
+            if self.display[i] == "degrees":
+                stats[name] = f"{int(values[i])}°"
+            else:
+                stats[name] = self.labels[i][0] if passed[i] else self.labels[i][1]
+        return stats
+
+
+class PoseRuleEngine:
+    def __init__(self, library: dict):
+        self.poses = {name: CompiledPose(name, spec["rules"]) for name, spec in library.items()}
+        self.index = ReferenceIndex.from_library(library, LANDMARK_INDEX)
+
+    @classmethod
+    def from_file(cls, path: str = DEFAULT_LIBRARY):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def evaluate(self, mode, landmarks, width, height):
+        """
+        landmarks: (33, 3) array of normalized [x, y, visibility].
+        Returns the stats dict for the pose, or None if the pose is unknown.
+        """
+        pose = self.poses.get(mode)
+        if pose is None:
+            return None
+        return pose.evaluate(landmarks, width, height)
+
+    def recognize(self, landmarks, width, height):
+        """(name of the closest reference pose or None, its distance); one batched pass over all references."""
+        return self.index.nearest(landmarks, width, height)
+
+    def evaluate_checks(self, mode, landmarks, width, height):
+        """Like evaluate, but returns (stats, passed) with the per-rule pass/fail array; (None, None) if unknown."""
+        pose = self.poses.get(mode)
+        if pose is None:
+            return None, None
+        values, passed = pose.measure(landmarks, width, height)
+        return pose.stats(values, passed), passed
+
+
+@functools.lru_cache(maxsize=None)
+def default_engine():
+    """The engine for the bundled pose_library.json, compiled once per process."""
+    return PoseRuleEngine.from_file(DEFAULT_LIBRARY)
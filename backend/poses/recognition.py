@@ -0,0 +1,109 @@
+"""
+Automatic pose recognition: which library pose does a frame look like?
+
+A pose in pose_library.json may carry a "reference": normalized [x, y] of the
+EMBEDDING_JOINTS in one canonical example, on a 4:3 frame ("references": [...] for several).
+A frame is embedded the same way as the references: joints centred on the hips and
+scaled by their RMS distance from that centre, so neither where the user stands nor how
+far they are from the camera matters. It is then compared with every reference at once:
+the visibility-weighted squared distances to all N references come out of two
+matrix-vector products against precomputed (N, ...) matrices, so the cost grows with the
+size of those products, not with a Python loop over poses. Mirror images of every
+reference are indexed too, so a pose held on the other side is still recognized.
+"""
+import numpy as np
+
+EMBEDDING_JOINTS = (
+    "NOSE",
+    "LEFT_SHOULDER", "RIGHT_SHOULDER", "LEFT_ELBOW", "RIGHT_ELBOW", "LEFT_WRIST", "RIGHT_WRIST",
+    "LEFT_HIP", "RIGHT_HIP", "LEFT_KNEE", "RIGHT_KNEE", "LEFT_ANKLE", "RIGHT_ANKLE",
+)
+# Reference coordinates are given on a frame of this width / height
+REFERENCE_ASPECT = 4 / 3
+# Best matches further than this (RMS joint distance, in units of body size) are rejected
+MAX_DISTANCE = 0.35
+
+_HIPS = [EMBEDDING_JOINTS.index("LEFT_HIP"), EMBEDDING_JOINTS.index("RIGHT_HIP")]
+
+
+def _mirror_order():
+    swap = {"LEFT_": "RIGHT_", "RIGHT_": "LEFT_"}
+    out = []
+    for name in EMBEDDING_JOINTS:
+        side = next((s for s in swap if name.startswith(s)), None)
+        out.append(EMBEDDING_JOINTS.index(swap[side] + name[len(side):]) if side else EMBEDDING_JOINTS.index(name))
+    return np.array(out, dtype=np.intp)
+
+
+_MIRROR = _mirror_order()
+
+
+def embed(xy):
+    """(..., joints, 2) joint coordinates (aspect-corrected) -> centred, unit-RMS embedding."""
+    xy = np.asarray(xy, dtype=np.float64)
+    centred = xy - xy[..., _HIPS, :].mean(axis=-2, keepdims=True)
+    scale = np.sqrt((centred ** 2).sum(axis=-1).mean(axis=-1))[..., None, None]
+    return centred / np.maximum(scale, 1e-9)
+
+
+class ReferenceIndex:
+    def __init__(self, names, references, joint_idx, max_distance=MAX_DISTANCE):
+        """
+        names: pose names; references: list of (name index, (joints, 2) array of normalized
+        [x, y] in EMBEDDING_JOINTS order); joint_idx: where EMBEDDING_JOINTS are among the
+        33 MediaPipe landmarks.
+        """
+        self.names = list(names)
+        self.joint_idx = np.asarray(joint_idx, dtype=np.intp)
+        self.max_distance = max_distance
+        if not references:
+            self._labels = np.zeros(0, dtype=np.intp)
+            return
+
+        labels = np.array([label for label, _ in references], dtype=np.intp)
+        xy = np.stack([np.asarray(ref, dtype=np.float64) for _, ref in references]) * (REFERENCE_ASPECT, 1.0)
+        # The mirror image: flip x and swap left/right joints
+        mirrored = xy[:, _MIRROR] * (-1.0, 1.0)
+        refs = embed(np.concatenate((xy, mirrored)))
+
+        self._labels = np.concatenate((labels, labels))
+        n = len(refs)
+        # |r - e|^2 per joint = |r|^2 - 2 r.e + |e|^2: keep |r|^2 (N, joints) and r (N, 2 * joints)
+        self._ref_sq = (refs ** 2).sum(axis=-1)
+        self._ref_flat = refs.reshape(n, -1)
+
+    @classmethod
+    def from_library(cls, library: dict, landmark_index: dict, max_distance=MAX_DISTANCE):
+        names = list(library)
+        references = []
+        for i, name in enumerate(names):
+            spec = library[name]
+            refs = spec.get("references") or ([spec["reference"]] if "reference" in spec else [])
+            for ref in refs:
+                references.append((i, [ref[j] for j in EMBEDDING_JOINTS]))
+        return cls(names, references, [landmark_index[j] for j in EMBEDDING_JOINTS], max_distance)
+
+    def __len__(self):
+        return len(self._labels)
+
+    def nearest(self, landmarks, width, height):
+        """
+        landmarks: (33, 3) normalized [x, y, visibility]. Returns (pose name, distance),
+        or (None, distance) if no reference is within max_distance.
+        """
+        if not len(self._labels):
+            return None, float("inf")
+        lm = np.asarray(landmarks, dtype=np.float64)[self.joint_idx]
+        e = embed(lm[:, :2] * (width / height, 1.0))
+        w = np.clip(lm[:, 2], 0.0, 1.0)
+        total = w.sum()
+        if total <= 0:
+            return None, float("inf")
+
+        # Visibility-weighted mean squared joint distance to every reference at once
+        dist = (self._ref_sq @ w - 2.0 * (self._ref_flat @ (e * w[:, None]).ravel()) + w @ (e ** 2).sum(axis=-1)) / total
+        best = int(np.argmin(dist))
+        distance = float(np.sqrt(max(dist[best], 0.0)))
+        if distance > self.max_distance:
+            return None, distance
+        return self.names[self._labels[best]], distance
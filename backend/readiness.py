@@ -0,0 +1,87 @@
+"""
+Startup state of the server's subsystems (pose, tts, llm), reported on /ready.
+
+SUBSYSTEMS (comma-separated, default "pose,tts,llm") picks which ones this server runs,
+so e.g. a TTS-only replica (SUBSYSTEMS=tts) never spawns pose workers. Each enabled
+subsystem initializes in the background after startup; until it is ready its routes
+answer 503 and /ready reports it as "starting".
+
+/ready waits for the subsystems listed in SUBSYSTEMS. Without it, the llm subsystem still
+starts but is optional: a server with no Gemini key (or no google-genai) is ready once
+pose and tts are, as it was before the LLM routes existed.
+"""
+import os
+import time
+
+from fastapi import HTTPException
+
+DISABLED = "disabled"
+STARTING = "starting"
+READY = "ready"
+FAILED = "failed"
+
+_started_at = time.monotonic()
+
+
+class Subsystem:
+    def __init__(self, name, enabled, required=True):
+        self.name = name
+        self.state = STARTING if enabled else DISABLED
+        self.required = required
+        self.error = None
+        self.note = None
+        self.ready_after = None
+
+    @property
+    def enabled(self):
+        return self.state != DISABLED
+
+    @property
+    def ready(self):
+        return self.state == READY
+
+    def mark_ready(self, note=None):
+        self.state = READY
+        self.error = None
+        self.note = note
+        self.ready_after = round(time.monotonic() - _started_at, 3)
+
+    def mark_failed(self, error):
+        self.state = FAILED
+        self.error = str(error)
+
+    def require(self):
+        """Raises 503 unless the subsystem is up."""
+        if self.state == DISABLED:
+            raise HTTPException(status_code=503, detail=f"{self.name} is disabled on this server")
+        if self.state == STARTING:
+            raise HTTPException(status_code=503, detail=f"{self.name} is still starting", headers={"Retry-After": "2"})
+        if self.state == FAILED:
+            raise HTTPException(status_code=503, detail=f"{self.name} failed to start: {self.error}")
+
+    def snapshot(self):
+        out = {"state": self.state}
+        if not self.required:
+            out["optional"] = True
+        if self.error:
+            out["error"] = self.error
+        if self.note:
+            out["note"] = self.note
+        if self.ready_after is not None:
+            out["ready_after_s"] = self.ready_after
+        return out
+
+
+_listed = os.getenv("SUBSYSTEMS")
+_enabled = {s.strip() for s in (_listed if _listed is not None else "pose,tts,llm").lower().split(",") if s.strip()}
+
+POSE = Subsystem("pose", "pose" in _enabled)
+TTS = Subsystem("tts", "tts" in _enabled)
+LLM = Subsystem("llm", "llm" in _enabled, required=_listed is not None)
+ALL = (POSE, TTS, LLM)
+
+
+def report():
+    """(all enabled, required subsystems ready, JSON body for /ready)"""
+    ready = all(s.ready for s in ALL if s.enabled and s.required)
+    return ready, {"ready": ready, "subsystems": {s.name: s.snapshot() for s in ALL}}
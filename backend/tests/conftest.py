@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The backend modules import each other by flat name (run from backend/, like uvicorn app:app)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,59 @@
+"""Auto mode debounce: PoseAnalysisWorker._recognize only switches after AUTO_SWITCH_FRAMES agree."""
+import pytest
+
+import pose_worker
+from bench.stub_pose import StubPoseDetector
+from pose_worker import AUTO_SWITCH_FRAMES, PoseAnalysisWorker
+
+
+class _ScriptedRules:
+    """Stands in for the rule engine: recognize() returns the next name from a script."""
+
+    def __init__(self, names):
+        self._names = iter(names)
+
+    def recognize(self, landmarks, width, height):
+        return next(self._names), 0.0
+
+
+def _run(names):
+    worker = PoseAnalysisWorker(pose_detector=StubPoseDetector())
+    worker.rules = _ScriptedRules(names)
+    return [worker._recognize(None, 640, 480) for _ in names]
+
+
+def test_switch_frames_is_three():
+    # The sequences below are written for the default
+    assert AUTO_SWITCH_FRAMES == 3
+
+
+def test_first_pose_needs_consecutive_frames():
+    assert _run(["tree", "tree", "tree"]) == [None, None, "tree"]
+
+
+def test_drop_out_takes_switch_frames_unrecognized():
+    seq = ["tree"] * 3 + [None, None, None]
+    assert _run(seq) == [None, None, "tree", "tree", "tree", None]
+
+
+def test_brief_drop_out_keeps_pose():
+    seq = ["tree"] * 3 + [None, None, "tree", None, None, "tree"]
+    assert _run(seq)[3:] == ["tree"] * 6
+
+
+def test_reacquire_after_drop_out():
+    seq = ["tree"] * 3 + [None] * 3 + ["tree", "tree", "tree"]
+    assert _run(seq)[6:] == [None, None, "tree"]
+
+
+def test_votes_reset_on_switch():
+    # Two sphinx votes before the switch to None must not count towards a later sphinx
+    seq = ["tree"] * 3 + ["sphinx", "sphinx", None, None, None, "sphinx"]
+    assert _run(seq)[3:] == ["tree", "tree", "tree", "tree", None, None]
+
+
+@pytest.mark.parametrize("challenger", ["warrior", None])
+def test_interrupted_challenger_starts_over(challenger):
+    other = "sphinx" if challenger else "warrior"
+    seq = ["tree"] * 3 + [challenger, challenger, other, challenger, challenger]
+    assert _run(seq)[3:] == ["tree"] * 5
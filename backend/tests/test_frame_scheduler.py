@@ -0,0 +1,37 @@
+"""FrameScheduler capacity: motion-gated frames must not make inference look cheaper."""
+from frame_scheduler import FrameScheduler
+
+
+def _scheduler():
+    scheduler = FrameScheduler(max_fps=15, utilization=1.0)
+    scheduler.add("a", worker=0)
+    scheduler.add("b", worker=0)
+    return scheduler
+
+
+def _feed(scheduler, frames):
+    for cost, inferred in frames:
+        scheduler.record("a", cost, inferred)
+    scheduler._rebalance()
+
+
+def test_inferred_cost_sets_capacity():
+    scheduler = _scheduler()
+    _feed(scheduler, [(0.1, True)] * 50)
+    # 10 frames/s of capacity split between two sessions
+    assert scheduler.granted_fps("a") == 5.0
+    assert scheduler.granted_fps("b") == 5.0
+
+
+def test_gated_frames_do_not_raise_capacity():
+    scheduler = _scheduler()
+    _feed(scheduler, [(0.1, True)] * 50)
+    _feed(scheduler, [(0.001, False)] * 50)
+    assert scheduler.granted_fps("a") == 5.0
+
+
+def test_mixed_frames_track_inferred_cost_only():
+    scheduler = _scheduler()
+    _feed(scheduler, [(0.1, True), (0.001, False), (0.001, False)] * 30)
+    assert scheduler.granted_fps("a") == 5.0
+    assert scheduler.throttled("a")
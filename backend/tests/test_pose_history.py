@@ -0,0 +1,56 @@
+"""Pose history sampling and retention (pose_history.py)."""
+from pose_history import DETECTED, RECORD, UNKNOWN_POSE, PoseHistoryStore, SessionHistory
+
+
+def _frame(detected=True):
+    return {"detected": detected}
+
+
+def test_min_interval_throttles_unchanged_samples():
+    history = SessionHistory(100, min_interval=60.0)
+    assert history.append(0, _frame())
+    assert not history.append(0, _frame())
+    assert history.count == 1
+
+
+def test_pose_lost_and_found_are_always_sampled():
+    history = SessionHistory(100, min_interval=60.0)
+    history.append(0, _frame())
+    assert history.append(UNKNOWN_POSE, _frame(detected=False))
+    assert not history.append(UNKNOWN_POSE, _frame(detected=False))
+    assert history.append(0, _frame())
+    assert list(history.rows()["flags"] & DETECTED) == [DETECTED, 0, DETECTED]
+
+
+def test_pose_change_is_sampled():
+    history = SessionHistory(100, min_interval=60.0)
+    history.append(0, _frame())
+    assert history.append(1, _frame())
+    assert list(history.rows()["pose"]) == [0, 1]
+
+
+def _finish_session(store, samples):
+    token = store.open()
+    history = store._live[token]
+    for i in range(samples):
+        history.append(i % 2, _frame())
+    store.close(token)
+    return token
+
+
+def test_finished_buffers_shrink_to_their_samples():
+    store = PoseHistoryStore(fps=1000, seconds=60)
+    token = _finish_session(store, 10)
+    rows, info = store.snapshot(token)
+    assert len(rows) == 10
+    assert info == {"live": False, "buffer_bytes": 10 * RECORD.itemsize}
+    assert store._finished[token]._rows.nbytes == 10 * RECORD.itemsize
+
+
+def test_finished_sessions_are_capped_by_bytes():
+    store = PoseHistoryStore(fps=1000, seconds=60, keep_finished=100, keep_bytes=25 * RECORD.itemsize)
+    tokens = [_finish_session(store, 10) for _ in range(3)]
+    assert store.snapshot(tokens[0]) is None
+    assert store.snapshot(tokens[1]) is not None
+    assert store.snapshot(tokens[2]) is not None
+    assert store._finished_bytes == 20 * RECORD.itemsize
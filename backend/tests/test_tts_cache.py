@@ -0,0 +1,51 @@
+"""TTS audio cache recency (tts_cache.py): clips served from memory must not look cold."""
+import os
+
+import tts_cache
+from tts_cache import AudioCache
+
+HOT = "a" * 64
+COLD = "b" * 64
+
+
+def _age(cache, key, seconds):
+    mtime = os.stat(cache.path(key)).st_mtime - seconds
+    os.utime(cache.path(key), (mtime, mtime))
+
+
+def _cache(tmp_path):
+    cache = AudioCache(str(tmp_path), max_entries=2)
+    cache.put(HOT, b"hot clip")
+    cache.put(COLD, b"cold clip")
+    # The hot clip was written first and has been served from memory ever since
+    _age(cache, HOT, 3600)
+    _age(cache, COLD, 60)
+    return cache
+
+
+def test_memory_hit_keeps_file_from_eviction(tmp_path, monkeypatch):
+    monkeypatch.setattr(tts_cache, "_BUMP_INTERVAL", 0)
+    cache = _cache(tmp_path)
+    assert cache.get(HOT) == b"hot clip"
+    cache.max_entries = 1
+    cache.evict()
+    assert os.path.exists(cache.path(HOT))
+    assert not os.path.exists(cache.path(COLD))
+
+
+def test_memory_range_read_keeps_file_from_eviction(tmp_path, monkeypatch):
+    monkeypatch.setattr(tts_cache, "_BUMP_INTERVAL", 0)
+    cache = _cache(tmp_path)
+    assert cache.read_range(HOT, 0, 3, cache.stat(HOT)) == b"hot"
+    cache.max_entries = 1
+    cache.evict()
+    assert os.path.exists(cache.path(HOT))
+    assert not os.path.exists(cache.path(COLD))
+
+
+def test_memory_hits_bump_at_most_every_interval(tmp_path):
+    cache = _cache(tmp_path)
+    before = os.stat(cache.path(HOT)).st_mtime
+    # Just written: the next bump isn't due for _BUMP_INTERVAL seconds
+    assert cache.get(HOT) == b"hot clip"
+    assert os.stat(cache.path(HOT)).st_mtime == before
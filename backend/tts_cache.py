@@ -0,0 +1,242 @@
+"""
+Content-addressed cache for synthesized TTS audio.
+
+Entries are keyed by sha256 over everything that changes the audio (text, voice, model
+and voice settings) and stored as <key>.mp3 in the cache directory. Files are written to
+a temp file and os.replace()d into place, so a crash never leaves a truncated clip and
+several uvicorn workers can share the directory. Recency is the file mtime (bumped on
+every read), which lets any worker evict the least recently used clips once the
+directory is over its byte or entry budget. The most recently played clips are also kept
+in a small in-process memory tier and served without reading the disk; a memory hit
+still bumps the file, at most every _BUMP_INTERVAL seconds, so the hottest clips don't
+look the oldest to evict().
+
+Clips are also served over HTTP by key (GET /tts/audio/<key>.mp3, see tts_worker). Since
+a key's content never changes, the responses are immutable; stat() and read_range() let
+that route answer conditional and range requests without reading the whole file. Memory
+tier entries remember which file version (identity()) they came from, so a range is
+never served from bytes that don't match the ETag the route computed from stat().
+
+Files named md5(text).mp3 are the pre-generated clips shipped in pre_loaded_audio: they
+are served read-only for the default voice/model/settings and never evicted.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import metrics
+
+_KEY_RE = re.compile(r"^[0-9a-f]{64}\.mp3$")
+_TMP_SUFFIX = ".tmp"
+# Temp files older than this are leftovers from a crashed writer
+_STALE_TMP_SECONDS = 600
+# A clip served from the memory tier has its file's mtime bumped at most this often
+_BUMP_INTERVAL = 60
+
+
+def cache_key(text, voice_id, model_id, voice_settings):
+    blob = json.dumps(
+        {"text": text, "voice_id": voice_id, "model_id": model_id, "voice_settings": voice_settings},
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False,
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def legacy_key(text):
+    return hashlib.md5(text.encode("utf-8")).hexdigest()
+
+
+def identity(st):
+    """Which version of a clip a stat result is: os.replace() gives a rewrite a new inode."""
+    return st.st_ino, st.st_size
+
+
+class AudioCache:
+    def __init__(self, directory, max_bytes=500 * 2**20, max_entries=5000, memory_bytes=32 * 2**20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.memory_bytes = memory_bytes
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._remove_stale_tmp()
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.mp3")
+
+    def get(self, key, legacy=False):
+        """
+        Audio bytes for key, or None. legacy=True looks up a shipped md5(text) clip, which
+        is not recency-tracked. Blocking disk I/O; call from a thread.
+        """
+        entry = self._from_memory(key, legacy)
+        if entry is not None:
+            metrics.TTS_CACHE.inc(result="memory")
+            return entry[0]
+
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                audio = f.read()
+                st = os.fstat(f.fileno())
+        except FileNotFoundError:
+            return None
+        if not audio:
+            return None
+        if not legacy:
+            self._bump(path)
+        self._remember(key, audio, identity(st))
+        metrics.TTS_CACHE.inc(result="hit")
+        return audio
+
+    def stat(self, key):
+        """os.stat_result of key's clip, or None if it isn't cached. Does not count as a read."""
+        try:
+            st = os.stat(self.path(key))
+        except FileNotFoundError:
+            return None
+        return st if st.st_size else None
+
+    def touch(self, key):
+        """Marks key as just used (so it isn't the next one evicted) and returns its stat, or None."""
+        st = self.stat(key)
+        if st is not None and self._bump(self.path(key)):
+            return st
+        return None
+
+    def read_range(self, key, start, length, st, legacy=False):
+        """
+        length bytes from offset start of the version of key's clip that st (from stat())
+        describes, memory tier first; None if that version is gone or was replaced since.
+        Bumps recency like get(). Blocking disk I/O; call from a thread.
+        """
+        entry = self._from_memory(key, legacy)
+        if entry is not None and entry[1] == identity(st):
+            return entry[0][start:start + length]
+
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                if identity(os.fstat(f.fileno())) != identity(st):
+                    return None
+                f.seek(start)
+                data = f.read(length)
+        except FileNotFoundError:
+            return None
+        if not legacy:
+            self._bump(path)
+        if start == 0 and len(data) == st.st_size:
+            self._remember(key, data, identity(st))
+        return data
+
+    def _from_memory(self, key, legacy=False):
+        """Memory tier entry for key, or None; a hit bumps the file's recency when it's due."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            self._memory.move_to_end(key)
+            due = not legacy and now - entry[2] >= _BUMP_INTERVAL
+            if due:
+                entry = self._memory[key] = (entry[0], entry[1], now)
+        if due:
+            self._bump(self.path(key))
+        return entry
+
+    @staticmethod
+    def _bump(path):
+        try:
+            os.utime(path)  # LRU recency, shared with the other workers
+            return True
+        except OSError:
+            return False  # evicted by another worker in the meantime
+
+    def put(self, key, audio):
+        """Atomically stores audio under key, then enforces the budgets. Call from a thread."""
+        tmp = os.path.join(self.directory, f".{key}.{os.getpid()}.{uuid.uuid4().hex[:8]}{_TMP_SUFFIX}")
+        try:
+            with open(tmp, "wb") as f:
+                f.write(audio)
+                f.flush()
+                os.fsync(f.fileno())
+            st = os.stat(tmp)
+            os.replace(tmp, self.path(key))
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        self._remember(key, audio, identity(st))
+        self.evict()
+
+    def _remember(self, key, audio, ident):
+        """
+        Memory tier entry: the bytes, the identity() of the file they were read from and
+        when that file's recency was last bumped (callers have just bumped or written it).
+        """
+        if len(audio) > self.memory_bytes // 4:
+            return  # one long clip shouldn't flush the whole memory tier
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_size -= len(old[0])
+            self._memory[key] = (audio, ident, time.monotonic())
+            self._memory_size += len(audio)
+            while self._memory_size > self.memory_bytes:
+                _, dropped = self._memory.popitem(last=False)
+                self._memory_size -= len(dropped[0])
+
+    def evict(self):
+        """Deletes least recently used entries until the directory is within budget."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not _KEY_RE.match(entry.name):
+                continue
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        count = len(entries)
+        metrics.TTS_CACHE_BYTES.set(total)
+        if total <= self.max_bytes and count <= self.max_entries:
+            return
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes and count <= self.max_entries:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # another worker got there first
+            total -= size
+            count -= 1
+            metrics.TTS_CACHE_EVICTIONS.inc()
+            key = os.path.basename(path)[:-4]
+            with self._lock:
+                dropped = self._memory.pop(key, None)
+                if dropped is not None:
+                    self._memory_size -= len(dropped[0])
+        metrics.TTS_CACHE_BYTES.set(total)
+
+    def _remove_stale_tmp(self):
+        cutoff = time.time() - _STALE_TMP_SECONDS
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(_TMP_SUFFIX):
+                try:
+                    if entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                except OSError:
+                    pass
@@ -1,81 +1,475 @@
 import os
-import requests
+import asyncio
 import hashlib
+import httpx
 from dotenv import load_dotenv
 from fastapi import HTTPException
-from fastapi.responses import FileResponse
+from fastapi.responses import RedirectResponse, Response, StreamingResponse
+import re
+import time
 import traceback
+import metrics
+from tts_cache import AudioCache, cache_key, legacy_key
 
 load_dotenv()
 
 API_KEY = os.getenv("ELEVENLABS_API_KEY")
 VOICE_ID = os.getenv("ELEVENLABS_VOICE_ID", "21m00Tcm4TlvDq8ikWAM")
 MODEL_ID = os.getenv("ELEVENLABS_MODEL_ID", "eleven_monolingual_v1")
-ELEVEN_URL = f"https://api.elevenlabs.io/v1/text-to-speech/{VOICE_ID}"
+# ELEVENLABS_BASE_URL points the client at a local stand-in server (see bench/tts_stub.py)
+ELEVEN_BASE_URL = os.getenv("ELEVENLABS_BASE_URL", "https://api.elevenlabs.io").rstrip("/")
+ELEVEN_URL = f"{ELEVEN_BASE_URL}/v1/text-to-speech/{VOICE_ID}"
+# Upper bound on simultaneous ElevenLabs requests; further cache misses wait their turn
+TTS_MAX_CONCURRENCY = int(os.getenv("TTS_MAX_CONCURRENCY", "4") or 4)
+# Chunked /tts: sentences synthesized ahead of playback, and the shortest chunk sent on its own
+TTS_CHUNK_PARALLELISM = int(os.getenv("TTS_CHUNK_PARALLELISM", "3") or 3)
+TTS_MIN_CHUNK_CHARS = 40
+VOICE_SETTINGS = {
+    "stability": 0.4,
+    "similarity_boost": 0.7
+}
 
 # Define the folder for cached audio
 CACHE_DIR = "pre_loaded_audio"
+# The shipped md5(text) clips were generated with these; they are only reused when they match
+_LEGACY_PARAMS = ("21m00Tcm4TlvDq8ikWAM", "eleven_monolingual_v1", {"stability": 0.4, "similarity_boost": 0.7})
 
-# Ensure the directory exists when the app starts
-os.makedirs(CACHE_DIR, exist_ok=True)
+# Stable, content-addressed URLs for cached clips: GET {AUDIO_ROUTE}/<key>.mp3
+AUDIO_ROUTE = "/tts/audio"
+# A key's audio never changes, so browsers may keep it for good
+AUDIO_CACHE_CONTROL = "public, max-age=31536000, immutable"
+_AUDIO_NAME = re.compile(r"^([0-9a-f]{64}|[0-9a-f]{32})\.mp3$")
+_BYTE_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
 
-def get_tts_audio(text: str):
+_audio_cache = None
+
+
+def get_audio_cache():
     """
-    Checks if audio for the given text exists in 'pre_loaded_audio'.
-    If yes, returns it.
-    If no, calls ElevenLabs, saves it, then returns it.
+    The audio cache, created (directory and stale temp file cleanup included) on first use.
+    TTS_CACHE_MAX_MB / TTS_CACHE_MAX_ENTRIES bound the directory (LRU eviction);
+    TTS_CACHE_MEMORY_MB is the in-process tier for the most recently played clips.
     """
-    
-    # 1. Create a unique filename based on the text content (MD5 Hash)
-    # This ensures the same text always maps to the same file.
-    text_hash = hashlib.md5(text.encode("utf-8")).hexdigest()
-    audio_filename = os.path.join(CACHE_DIR, f"{text_hash}.mp3")
+    global _audio_cache
+    if _audio_cache is None:
+        _audio_cache = AudioCache(
+            CACHE_DIR,
+            max_bytes=int(float(os.getenv("TTS_CACHE_MAX_MB", "500") or 500) * 2**20),
+            max_entries=int(os.getenv("TTS_CACHE_MAX_ENTRIES", "5000") or 5000),
+            memory_bytes=int(float(os.getenv("TTS_CACHE_MEMORY_MB", "32") or 32) * 2**20),
+        )
+    return _audio_cache
 
-    # 2. Check if this file already exists locally
-    if os.path.exists(audio_filename):
-        print(f"Loading cached audio for text hash {text_hash[:8]}...")
-        return FileResponse(audio_filename, media_type="audio/mpeg")
 
-    # 3. If not, we must generate it. Verify API Key first.
-    if not API_KEY:
-        raise HTTPException(status_code=500, detail="Missing ELEVENLABS_API_KEY in environment (.env)")
+class TTSClient:
+    """
+    Async ElevenLabs client over one pooled HTTP/1.1 connection pool (keep-alive, so no TLS
+    handshake per request). Concurrent synthesize() calls for the same key share a single
+    upstream request, and at most max_concurrency requests are in flight at once.
+    Must be used from one event loop; create it lazily inside that loop.
+    """
+
+    def __init__(self, url=ELEVEN_URL, api_key=API_KEY, max_concurrency=TTS_MAX_CONCURRENCY, timeout=60.0):
+        self.url = url
+        self.api_key = api_key
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(timeout, connect=10.0),
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._inflight = {}
 
-    print(f"Generating new audio via ElevenLabs for: '{text[:30]}...'")
+    async def synthesize(self, key, text, on_audio=None):
+        """
+        Returns the MP3 bytes for text. Callers passing the same key while a request is
+        running get that request's result. on_audio(bytes) runs once, before waiters are
+        released (e.g. to write the cache file).
+        """
+        task = self._inflight.get(key)
+        if task is not None:
+            metrics.TTS_CACHE.inc(result="shared")
+        else:
+            task = asyncio.ensure_future(self._fetch(text, on_audio))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield: a client that disconnects must not cancel the request for everyone else
+        return await asyncio.shield(task)
 
-    headers = {
-        "xi-api-key": API_KEY,
-        "Content-Type": "application/json",
-        "Accept": "audio/mpeg",
-    }
+    def in_flight(self, key):
+        return key in self._inflight
 
-    payload = {
-        "text": text,
-        "model_id": MODEL_ID,
-        "voice_settings": {
-            "stability": 0.4,
-            "similarity_boost": 0.7
+    async def _fetch(self, text, on_audio):
+        headers = {
+            "xi-api-key": self.api_key,
+            "Content-Type": "application/json",
+            "Accept": "audio/mpeg",
         }
-    }
 
-    try:
-        r = requests.post(ELEVEN_URL, headers=headers, json=payload, timeout=60)
-        
+        payload = {
+            "text": text,
+            "model_id": MODEL_ID,
+            "voice_settings": VOICE_SETTINGS,
+        }
+
+        async with self._semaphore:
+            metrics.TTS_UPSTREAM_INFLIGHT.inc()
+            started = time.perf_counter()
+            try:
+                r = await self._client.post(self.url, headers=headers, json=payload)
+            finally:
+                metrics.TTS_UPSTREAM_INFLIGHT.dec()
+                metrics.TTS_UPSTREAM_SECONDS.observe(time.perf_counter() - started)
+
         if r.status_code != 200:
             print("ElevenLabs returned non-200:", r.status_code, r.text)
             raise HTTPException(status_code=500, detail=f"ElevenLabs Error: {r.status_code} - {r.text}")
 
-        # 4. Save the new audio to the pre_loaded_audio folder
-        with open(audio_filename, "wb") as f:
-            f.write(r.content)
-            
-        print(f"Saved new audio to: {audio_filename}")
+        if on_audio is not None:
+            await asyncio.to_thread(on_audio, r.content)
+        return r.content
+
+    async def close(self):
+        await self._client.aclose()
+
+
+_client = None
+
+
+def get_client():
+    global _client
+    if _client is None:
+        _client = TTSClient()
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+async def synthesize_cached(text: str):
+    """
+    Returns the MP3 bytes for the given text: from the cache (memory tier, then
+    'pre_loaded_audio') if possible, otherwise from ElevenLabs, caching the result.
+    """
+
+    # 1. Key the cache on everything that changes the audio, not just the text
+    key = cache_key(text, VOICE_ID, MODEL_ID, VOICE_SETTINGS)
 
-        # 5. Return the newly saved file
-        return FileResponse(audio_filename, media_type="audio/mpeg")
+    # 2. Check the cache (and the shipped clips, if we're using the voice they were made with)
+    audio_cache = get_audio_cache()
+    audio = await asyncio.to_thread(audio_cache.get, key)
+    if audio is None and (VOICE_ID, MODEL_ID, VOICE_SETTINGS) == _LEGACY_PARAMS:
+        audio = await asyncio.to_thread(audio_cache.get, legacy_key(text), True)
+    if audio is not None:
+        print(f"Loading cached audio for key {key[:8]}...")
+        return audio
 
+    # 3. If not, we must generate it. Verify API Key first.
+    if not API_KEY:
+        raise HTTPException(status_code=500, detail="Missing ELEVENLABS_API_KEY in environment (.env)")
+
+    client = get_client()
+    if not client.in_flight(key):
+        metrics.TTS_CACHE.inc(result="miss")
+        print(f"Generating new audio via ElevenLabs for: '{text[:30]}...'")
+
+    def save(audio):
+        # 4. Save the new audio to the cache (atomic write, then LRU eviction)
+        audio_cache.put(key, audio)
+        print(f"Saved new audio to: {audio_cache.path(key)}")
+
+    try:
+        return await client.synthesize(key, text, on_audio=save)
     except HTTPException:
         raise
     except Exception as e:
         print("TTS Error:")
         traceback.print_exc()
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def stitched_key(text: str):
+    """Key of the whole chunked (sentence by sentence) rendition of text."""
+    return cache_key(text, VOICE_ID, MODEL_ID, {"voice_settings": VOICE_SETTINGS, "chunked": True})
+
+
+def audio_url(key: str):
+    return f"{AUDIO_ROUTE}/{key}.mp3"
+
+
+async def find_cached(text: str, chunked: bool = False):
+    """
+    Key of an already cached clip of text, or None; only stats files. chunked=True also
+    accepts the stitched sentence-by-sentence rendition. A found clip is marked as just
+    used, so LRU eviction doesn't take it before the client follows the redirect.
+    """
+    keys = [cache_key(text, VOICE_ID, MODEL_ID, VOICE_SETTINGS)]
+    if chunked:
+        keys.insert(0, stitched_key(text))
+    legacy = (VOICE_ID, MODEL_ID, VOICE_SETTINGS) == _LEGACY_PARAMS
+    if legacy:
+        keys.append(legacy_key(text))
+    audio_cache = get_audio_cache()
+    for key in keys:
+        # The shipped md5 clips are never evicted, so there's nothing to bump
+        lookup = audio_cache.stat if len(key) == 32 else audio_cache.touch
+        if await asyncio.to_thread(lookup, key) is not None:
+            metrics.TTS_CACHE.inc(result="hit")
+            return key
+    return None
+
+
+def _redirect(key):
+    # 303: the client follows with a GET, which the browser can cache and range-request
+    return RedirectResponse(audio_url(key), status_code=303)
+
+
+async def get_tts_audio(text: str):
+    """
+    Whole-text synthesis. An already cached clip is a redirect to its URL; freshly
+    synthesized audio is sent in this response, since another worker could evict the
+    file before a redirect is followed. Its URL is in Content-Location for later plays.
+    """
+    key = await find_cached(text)
+    if key is not None:
+        return _redirect(key)
+    audio = await synthesize_cached(text)
+    key = cache_key(text, VOICE_ID, MODEL_ID, VOICE_SETTINGS)
+    return Response(content=audio, media_type="audio/mpeg", headers={"Content-Location": audio_url(key)})
+
+
+def _etag_matches(header, etag):
+    if header is None:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison: a W/ prefix doesn't matter
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def _byte_range(header, size):
+    """
+    (start, end) inclusive for a single "bytes=" range, None to ignore the header and send
+    the whole clip (malformed or multi-range), or False if it can't be satisfied.
+    """
+    m = _BYTE_RANGE.match(header.strip())
+    if not m or not (m[1] or m[2]):
+        return None
+    if not m[1]:
+        # bytes=-n: the last n bytes
+        suffix = int(m[2])
+        return (max(size - suffix, 0), size - 1) if suffix else False
+    start = int(m[1])
+    if m[2] and int(m[2]) < start:
+        return None
+    if start >= size:
+        return False
+    return start, min(int(m[2]) if m[2] else size - 1, size - 1)
+
+
+async def cached_audio_response(name: str, headers, head: bool = False):
+    """
+    GET/HEAD {AUDIO_ROUTE}/<key>.mp3: a cached clip, with a strong ETag, If-None-Match
+    (304) and single byte-range (206 / 416) support. A 304 or a HEAD only costs a stat.
+    """
+    m = _AUDIO_NAME.match(name)
+    if not m:
+        raise HTTPException(status_code=404, detail="Unknown audio")
+    key = m[1]
+    audio_cache = get_audio_cache()
+    # A second try covers a clip rewritten between the stat and the read
+    for _ in range(2):
+        st = await asyncio.to_thread(audio_cache.stat, key)
+        if st is None:
+            break
+        response = await _audio_version_response(audio_cache, key, st, headers, head)
+        if response is not None:
+            return response
+    raise HTTPException(status_code=404, detail="Audio not cached")
+
+
+async def _audio_version_response(audio_cache, key, st, headers, head):
+    """The response for the version of the clip that st describes, or None if it's gone."""
+    # Not the mtime (reads bump it for the LRU): a clip is only ever replaced by
+    # os.replace(), which gives it a new inode
+    etag = f'"{key[:16]}-{st.st_ino:x}-{st.st_size:x}"'
+    response_headers = {"ETag": etag, "Cache-Control": AUDIO_CACHE_CONTROL, "Accept-Ranges": "bytes"}
+    if _etag_matches(headers.get("if-none-match"), etag):
+        metrics.TTS_AUDIO_REQUESTS.inc(status="304")
+        return Response(status_code=304, headers=response_headers)
+
+    size = st.st_size
+    byte_range = None
+    # If-Range with an old validator: the client's partial copy is stale, send it all
+    if "range" in headers and headers.get("if-range", etag) == etag:
+        byte_range = _byte_range(headers["range"], size)
+    if byte_range is False:
+        metrics.TTS_AUDIO_REQUESTS.inc(status="416")
+        return Response(status_code=416, headers={**response_headers, "Content-Range": f"bytes */{size}"})
+
+    start, end = byte_range or (0, size - 1)
+    status = 206 if byte_range else 200
+    if byte_range:
+        response_headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    if head:
+        response_headers["Content-Length"] = str(end - start + 1)
+        metrics.TTS_AUDIO_REQUESTS.inc(status=str(status))
+        return Response(status_code=status, media_type="audio/mpeg", headers=response_headers)
+
+    audio = await asyncio.to_thread(audio_cache.read_range, key, start, end - start + 1, st, len(key) == 32)
+    if audio is None:
+        return None
+    metrics.TTS_AUDIO_REQUESTS.inc(status=str(status))
+    return Response(content=audio, status_code=status, media_type="audio/mpeg", headers=response_headers)
+
+
+# Sentence boundary: ., ! or ? (optionally followed by a closing quote/bracket) then whitespace.
+# "…" is left alone: the scripts use it for pauses inside a sentence ("Inhale for four… 1…2").
+_SENTENCE_END = re.compile(r"(?:(?<=[.!?])|(?<=[.!?][\"')\]]))\s+")
+
+
+class SentenceSplitter:
+    """
+    Incremental sentence splitter for chunked synthesis: feed() it text as it arrives
+    (e.g. streamed model output) and it returns the sentences completed so far.
+    Fragments shorter than min_chars ("1…2…3…4.") are merged into the following
+    sentence so the voice keeps its flow and we don't pay an upstream round trip per word.
+    """
+
+    def __init__(self, min_chars: int = TTS_MIN_CHUNK_CHARS):
+        self.min_chars = min_chars
+        self._buffer = ""
+        self._pending = ""
+
+    def feed(self, text: str):
+        self._buffer += text
+        parts = _SENTENCE_END.split(self._buffer)
+        # The last part may still be growing
+        self._buffer = parts.pop()
+        return self._take(parts)
+
+    def flush(self):
+        """Whatever is left once the input has ended."""
+        parts, self._buffer = [self._buffer], ""
+        out = self._take(parts)
+        if self._pending:
+            out.append(self._pending)
+            self._pending = ""
+        return out
+
+    def _take(self, parts):
+        out = []
+        for part in parts:
+            part = part.strip()
+            if not part:
+                continue
+            self._pending = f"{self._pending} {part}" if self._pending else part
+            if len(self._pending) >= self.min_chars:
+                out.append(self._pending)
+                self._pending = ""
+        return out
+
+
+def split_sentences(text: str, min_chars: int = TTS_MIN_CHUNK_CHARS):
+    splitter = SentenceSplitter(min_chars)
+    return splitter.feed(text) + splitter.flush()
+
+
+async def synthesize_stream(sentences, parallelism: int = TTS_CHUNK_PARALLELISM):
+    """
+    Yields the audio for each sentence of the async iterable `sentences`, in order,
+    synthesizing up to `parallelism` sentences ahead of the one being yielded. Each
+    sentence is cached on its own, so phrases shared between scripts are reused.
+    """
+    slots = asyncio.Semaphore(parallelism)
+    queue = asyncio.Queue()
+    tasks = []
+
+    async def produce():
+        try:
+            async for sentence in sentences:
+                await slots.acquire()
+                task = asyncio.ensure_future(synthesize_cached(sentence))
+                tasks.append(task)
+                queue.put_nowait(task)
+            queue.put_nowait(None)
+        except Exception as e:
+            queue.put_nowait(e)
+
+    producer = asyncio.ensure_future(produce())
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            audio = await item
+            slots.release()
+            yield audio
+    finally:
+        producer.cancel()
+        for task in tasks:
+            task.cancel()  # the shared upstream request itself is shielded and still gets cached
+
+
+async def streaming_audio_response(chunks, headers=None):
+    """
+    StreamingResponse over an async iterator of MP3 chunks. MP3 frames concatenate, so the
+    client plays it as one file. Waits for the first chunk before responding, so a failure
+    there still becomes an HTTP error; a later failure can only end the stream early.
+    """
+    try:
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        raise HTTPException(status_code=500, detail="No audio was generated")
+
+    async def body():
+        yield first
+        try:
+            async for chunk in chunks:
+                yield chunk
+        except Exception as e:
+            # Headers are already sent; all we can do is end the stream early
+            print(f"Audio stream stopped early: {getattr(e, 'detail', e)}")
+        finally:
+            await chunks.aclose()
+
+    return StreamingResponse(body(), media_type="audio/mpeg", headers=headers)
+
+
+async def _stitch_and_cache(chunks, key):
+    """Passes chunks through; once all of them were sent, caches them as one clip under key."""
+    parts = []
+    try:
+        async for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+    finally:
+        await chunks.aclose()
+    await asyncio.to_thread(get_audio_cache().put, key, b"".join(parts))
+
+
+async def stream_tts_audio(text: str, parallelism: int = TTS_CHUNK_PARALLELISM):
+    """
+    Chunked synthesis: splits text into sentences and streams their audio in order as it
+    is ready, so time to first audio is the first sentence's synthesis, not the script's.
+    A completed stream is cached whole, so replaying the text redirects to a cached clip.
+    """
+    key = await find_cached(text, chunked=True)
+    if key is not None:
+        return _redirect(key)
+
+    sentences = split_sentences(text)
+
+    async def source():
+        for sentence in sentences:
+            yield sentence
+
+    return await streaming_audio_response(
+        _stitch_and_cache(synthesize_stream(source(), parallelism), stitched_key(text)),
+        headers={"X-TTS-Chunks": str(len(sentences))},
+    )
@@ -26,6 +26,42 @@ const PRESETS = [
   },
 ];
 
+function canStreamMp3() {
+  return typeof window.MediaSource !== "undefined" && window.MediaSource.isTypeSupported("audio/mpeg");
+}
+
+// Appends a streamed MP3 response to a MediaSource and returns its object URL
+function streamToMediaSource(body) {
+  const mediaSource = new MediaSource();
+  const url = URL.createObjectURL(mediaSource);
+
+  mediaSource.addEventListener(
+    "sourceopen",
+    async () => {
+      const sourceBuffer = mediaSource.addSourceBuffer("audio/mpeg");
+      const reader = body.getReader();
+      try {
+        while (true) {
+          const { done, value } = await reader.read();
+          if (done) break;
+          if (mediaSource.readyState !== "open") return; // audio element was given a new src
+          sourceBuffer.appendBuffer(value);
+          await new Promise((resolve) => sourceBuffer.addEventListener("updateend", resolve, { once: true }));
+        }
+        if (mediaSource.readyState === "open") mediaSource.endOfStream();
+      } catch (e) {
+        console.error("TTS stream error:", e);
+        if (mediaSource.readyState === "open") mediaSource.endOfStream("network");
+      } finally {
+        URL.revokeObjectURL(url);
+      }
+    },
+    { once: true }
+  );
+
+  return url;
+}
+
 export default function MeditationPlayer() {
   const audioRef = useRef(null);
 
@@ -59,7 +95,8 @@ export default function MeditationPlayer() {
       {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ text }),
+        // chunked: the server synthesizes sentence by sentence and streams the MP3
+        body: JSON.stringify({ text, chunked: true }),
       },
       90000
     );
@@ -69,12 +106,25 @@ export default function MeditationPlayer() {
       throw new Error(`TTS failed (${res.status}): ${msg}`);
     }
 
-    const blob = await res.blob();
-    const url = URL.createObjectURL(blob);
+    await playAudioResponse(res);
+  }
 
+  async function playAudioResponse(res) {
     audioRef.current.pause();
     audioRef.current.currentTime = 0;
-    audioRef.current.src = url;
+
+    if (res.redirected) {
+      // A cached clip: let the audio element fetch its stable URL itself, so replays come
+      // from the browser cache and seeks are Range requests
+      res.body?.cancel();
+      audioRef.current.src = res.url;
+    } else if (canStreamMp3()) {
+      // Start playing as soon as the first sentence arrives
+      audioRef.current.src = streamToMediaSource(res.body);
+    } else {
+      const blob = await res.blob();
+      audioRef.current.src = URL.createObjectURL(blob);
+    }
 
     setStatus("Playing…");
     await audioRef.current.play();
@@ -99,6 +149,7 @@ export default function MeditationPlayer() {
     setStatus("Generating custom script…");
 
     try {
+      // The server streams the script's audio, voicing each sentence as soon as it is written
       const genRes = await fetchWithTimeout(
         "http://127.0.0.1:8000/custom_meditation_script",
         {
@@ -114,10 +165,7 @@ export default function MeditationPlayer() {
         throw new Error(`Custom script failed (${genRes.status}): ${msg}`);
       }
 
-      const { text } = await genRes.json();
-      if (!text) throw new Error("Custom script returned empty text");
-
-      await playTextViaTTS(text);
+      await playAudioResponse(genRes);
     } catch (e) {
       console.error(e);
       alert(String(e));
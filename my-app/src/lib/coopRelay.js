@@ -0,0 +1,152 @@
+// Client side of the backend co-op relay (/ws/coop/{roomId}, see backend/coop_relay.py).
+// Partners exchange landmarks + stats instead of annotated JPEGs and draw each other's skeleton.
+
+// Each laptop runs its own backend, so partners only meet on the relay when both point
+// VITE_RELAY_URL at the same reachable one. Without it, co-op goes over Supabase broadcast.
+export const RELAY_URL = import.meta.env.VITE_RELAY_URL || null
+
+const POSE = 1
+const KEYFRAME = 1
+const DELTA = 2
+const STATS = 3
+const THUMBNAIL = 4
+const NO_POSE = 5
+
+const NUM_LANDMARKS = 33
+const GRID = 2047
+const VIS_LEVELS = 127
+
+// MediaPipe POSE_CONNECTIONS
+const CONNECTIONS = [
+  [0, 1], [1, 2], [2, 3], [3, 7], [0, 4], [4, 5], [5, 6], [6, 8], [9, 10],
+  [11, 12], [11, 13], [13, 15], [15, 17], [15, 19], [15, 21], [17, 19],
+  [12, 14], [14, 16], [16, 18], [16, 20], [16, 22], [18, 20],
+  [11, 23], [12, 24], [23, 24], [23, 25], [24, 26], [25, 27], [26, 28],
+  [27, 29], [28, 30], [29, 31], [30, 32], [27, 31], [28, 32],
+]
+
+const textEncoder = new TextEncoder()
+const textDecoder = new TextDecoder()
+
+const base64ToBytes = (b64) => Uint8Array.from(atob(b64), (c) => c.charCodeAt(0))
+
+// The "landmarks" of an /ws/analyze result: base64 over JSON, raw bytes over the binary protocol
+const landmarkBytes = (landmarks) => (typeof landmarks === 'string' ? base64ToBytes(landmarks) : landmarks)
+
+export const landmarksToBase64 = (landmarks) => {
+  if (!landmarks || typeof landmarks === 'string') return landmarks || null
+  return btoa(String.fromCharCode(...landmarks))
+}
+
+// landmarks: an /ws/analyze result's landmarks, base64 or bytes (null if no pose)
+export const encodePose = (landmarks, stats) => {
+  landmarks = landmarks ? landmarkBytes(landmarks) : new Uint8Array(0)
+  const statsBytes = textEncoder.encode(JSON.stringify(stats || {}))
+  const out = new Uint8Array(2 + landmarks.length + statsBytes.length)
+  out[0] = POSE
+  out[1] = landmarks.length ? 1 : 0
+  out.set(landmarks, 2)
+  out.set(statsBytes, 2 + landmarks.length)
+  return out
+}
+
+// landmarks (frame_protocol bytes, or base64 of them: 33 x (x, y) as u16 of 65535, then
+// 33 x visibility as u8 of 255) -> the grid layout RelayDecoder produces and drawSkeleton expects
+export const unpackLandmarks = (landmarks) => {
+  if (!landmarks) return null
+  const bytes = landmarkBytes(landmarks)
+  const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength)
+  const q = new Int16Array(NUM_LANDMARKS * 3)
+  for (let i = 0; i < NUM_LANDMARKS; i++) {
+    q[i * 3] = Math.round(view.getUint16(i * 4, true) / 65535 * GRID)
+    q[i * 3 + 1] = Math.round(view.getUint16(i * 4 + 2, true) / 65535 * GRID)
+    q[i * 3 + 2] = Math.round(bytes[NUM_LANDMARKS * 4 + i] / 255 * VIS_LEVELS)
+  }
+  return q
+}
+
+export const encodeThumbnail = (dataUrl) => {
+  const jpeg = base64ToBytes(dataUrl.split(',')[1])
+  const out = new Uint8Array(1 + jpeg.length)
+  out[0] = THUMBNAIL
+  out.set(jpeg, 1)
+  return out
+}
+
+// Keeps the reconstructed state of every other member; handle() returns
+// { slot, landmarks?, stats?, thumbnail? } for the member a message was about.
+export class RelayDecoder {
+  constructor() {
+    this.landmarks = {}
+  }
+
+  handle(buffer) {
+    const view = new DataView(buffer)
+    const kind = view.getUint8(0)
+    const slot = view.getUint8(1)
+    const payload = new Uint8Array(buffer, 4)
+
+    if (kind === KEYFRAME) {
+      const q = new Int16Array(NUM_LANDMARKS * 3)
+      for (let i = 0; i < NUM_LANDMARKS; i++) {
+        q[i * 3] = view.getUint16(4 + i * 4, true)
+        q[i * 3 + 1] = view.getUint16(4 + i * 4 + 2, true)
+        q[i * 3 + 2] = payload[NUM_LANDMARKS * 4 + i]
+      }
+      this.landmarks[slot] = q
+      return { slot, landmarks: q }
+    }
+    if (kind === DELTA) {
+      const q = this.landmarks[slot]
+      if (!q) return null
+      const delta = new Int8Array(buffer, 4)
+      for (let i = 0; i < q.length; i++) q[i] += delta[i]
+      return { slot, landmarks: q }
+    }
+    if (kind === NO_POSE) {
+      delete this.landmarks[slot]
+      return { slot, landmarks: null }
+    }
+    if (kind === STATS) {
+      return { slot, stats: JSON.parse(textDecoder.decode(payload)) }
+    }
+    if (kind === THUMBNAIL) {
+      return { slot, thumbnail: new Blob([payload], { type: 'image/jpeg' }) }
+    }
+    return null
+  }
+}
+
+// Draws a skeleton onto a canvas, over a background image if given (the partner's
+// thumbnail, or our own webcam video for the local view)
+export const drawSkeleton = (canvas, landmarks, background) => {
+  const ctx = canvas.getContext('2d')
+  const { width, height } = canvas
+  ctx.fillStyle = '#0b2545'
+  ctx.fillRect(0, 0, width, height)
+  if (background) ctx.drawImage(background, 0, 0, width, height)
+  if (!landmarks) return
+
+  const point = (i) => [landmarks[i * 3] / GRID * width, landmarks[i * 3 + 1] / GRID * height]
+  const visible = (i) => landmarks[i * 3 + 2] / VIS_LEVELS > 0.5
+
+  ctx.strokeStyle = '#4ade80'
+  ctx.lineWidth = 3
+  for (const [a, b] of CONNECTIONS) {
+    if (!visible(a) || !visible(b)) continue
+    const [ax, ay] = point(a)
+    const [bx, by] = point(b)
+    ctx.beginPath()
+    ctx.moveTo(ax, ay)
+    ctx.lineTo(bx, by)
+    ctx.stroke()
+  }
+  ctx.fillStyle = '#f87171'
+  for (let i = 0; i < NUM_LANDMARKS; i++) {
+    if (!visible(i)) continue
+    const [x, y] = point(i)
+    ctx.beginPath()
+    ctx.arc(x, y, 3, 0, 2 * Math.PI)
+    ctx.fill()
+  }
+}
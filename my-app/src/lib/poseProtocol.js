@@ -0,0 +1,41 @@
+// Client side of the /ws/analyze binary frame protocol (see backend/frame_protocol.py).
+// Frames go up as raw JPEG bytes and results come back with raw landmark bytes, instead of
+// base64 inside JSON both ways.
+
+export const SUBPROTOCOL = 'pose.binary.v1'
+
+const textEncoder = new TextEncoder()
+const textDecoder = new TextDecoder()
+
+// [u8 mode length][mode, utf-8][JPEG bytes]
+export const encodeFrame = (mode, jpegBuffer) => {
+  const modeBytes = textEncoder.encode(mode)
+  const out = new Uint8Array(1 + modeBytes.length + jpegBuffer.byteLength)
+  out[0] = modeBytes.length
+  out.set(modeBytes, 1)
+  out.set(new Uint8Array(jpegBuffer), 1 + modeBytes.length)
+  return out
+}
+
+// [u16 stats length, big-endian][stats JSON, utf-8][payload] -> { stats, landmarks }
+// (landmarks: the packed bytes with ?output=landmarks, null if no pose was found)
+export const decodeResult = (buffer) => {
+  const statsLength = new DataView(buffer).getUint16(0, false)
+  const stats = JSON.parse(textDecoder.decode(new Uint8Array(buffer, 2, statsLength)))
+  const payload = new Uint8Array(buffer, 2 + statsLength)
+  return { stats, landmarks: payload.length ? payload : null }
+}
+
+let captureCanvas = null
+
+// The current video frame as JPEG bytes (resolves null if the video isn't playing yet)
+export const captureJpeg = (video, quality = 0.92) => {
+  if (!video || video.readyState < 2 || !video.videoWidth) return Promise.resolve(null)
+  captureCanvas = captureCanvas || document.createElement('canvas')
+  captureCanvas.width = video.videoWidth
+  captureCanvas.height = video.videoHeight
+  captureCanvas.getContext('2d').drawImage(video, 0, 0)
+  return new Promise((resolve) => {
+    captureCanvas.toBlob((blob) => resolve(blob ? blob.arrayBuffer() : null), 'image/jpeg', quality)
+  })
+}
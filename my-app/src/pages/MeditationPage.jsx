@@ -93,8 +93,13 @@ export default function MeditationPage() {
       throw new Error(await res.text());
     }
 
-    const blob = await res.blob();
-    const url = URL.createObjectURL(blob);
+    // /tts redirects to the clip's cacheable URL; play that directly instead of a blob copy
+    let url = res.url;
+    if (res.redirected) {
+      res.body?.cancel();
+    } else {
+      url = URL.createObjectURL(await res.blob());
+    }
 
     const a = audioRef.current;
     if (!a) {
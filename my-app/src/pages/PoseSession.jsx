@@ -3,6 +3,8 @@ import { useParams, useNavigate, useSearchParams } from 'react-router-dom'
 import { supabase } from '../lib/supabaseClient'
 import Webcam from 'react-webcam'
 import { logTodayAndSave } from '../components/octopusProgress'
+import { RELAY_URL, RelayDecoder, drawSkeleton, encodePose, encodeThumbnail, landmarksToBase64, unpackLandmarks } from '../lib/coopRelay'
+import { SUBPROTOCOL, captureJpeg, decodeResult, encodeFrame } from '../lib/poseProtocol'
 import './PoseSession.css'
 
 const PoseSession = () => {
@@ -18,24 +20,36 @@ const PoseSession = () => {
   // Media & Local Processing
   const webcamRef = useRef(null)
   const ws = useRef(null) // Local Python connection
+  const binaryRef = useRef(false) // Server accepted the binary frame protocol
+  const capturingRef = useRef(false) // A JPEG capture for the binary path is in progress
 
-  // Supabase Realtime Channel
-  const broadcastChannelRef = useRef(null)
+  // Co-op link to the partner: the backend relay if VITE_RELAY_URL is set, else Supabase
+  // broadcast. Either way { ready(), sendPose(landmarks, stats), sendThumbnail(dataUrl) }
+  const partnerLinkRef = useRef(null)
 
   // STREAMS
-  const [myImage, setMyImage] = useState(null)      // Processed locally
-  const [partnerImage, setPartnerImage] = useState(null) // Received via Supabase
+  const [aiReady, setAiReady] = useState(false)     // First local result arrived
+  const myCanvasRef = useRef(null)                   // My skeleton, drawn from local landmarks
+  const [partnerActive, setPartnerActive] = useState(false) // Partner is publishing landmarks
+  const [partnerStats, setPartnerStats] = useState({})
   const [myStats, setMyStats] = useState({})
+  const partnerCanvasRef = useRef(null)
+  const partnerLandmarksRef = useRef(null)
+  const partnerThumbRef = useRef(null)
   
   // Control Refs (Throttling)
   const lastSentRef = useRef(0)
+  const MAX_FPS = 15 // Keep it smooth locally
+  const sendFpsRef = useRef(MAX_FPS) // lowered to the server's granted_fps under load
   const lastBroadcastRef = useRef(0)
+  const lastThumbRef = useRef(0)
+  const THUMBNAIL_INTERVAL = 1000 // ms; a small webcam still behind the partner's skeleton
   const runningRef = useRef(true)
   
   // Progress Logic
   const didLogRef = useRef(false)
 
-  // Low res for speed over Supabase
+  // Low res for speed
   const videoConstraints = { width: 320, height: 240, facingMode: 'user' }
 
   // 1. Setup Session & Determine Room
@@ -66,36 +80,103 @@ const PoseSession = () => {
     }
   }
 
-  // 2. SUPABASE BROADCAST (Robust Cleanup & Reconnect)
+  // 2. CO-OP (landmarks + stats instead of full frames)
   useEffect(() => {
     if (!roomId || roomId === 'solo' || !session) return;
 
     let isMounted = true;
-    const channelName = `room:${roomId}`;
 
-    const connectToRelay = async () => {
-      // Force Cleanup of any existing channel on this Room ID
-      if (broadcastChannelRef.current) {
-        await supabase.removeChannel(broadcastChannelRef.current);
-        broadcastChannelRef.current = null;
+    const repaint = () => {
+      if (partnerCanvasRef.current) {
+        drawSkeleton(partnerCanvasRef.current, partnerLandmarksRef.current, partnerThumbRef.current)
       }
+    }
 
-      if (!isMounted) return;
+    const applyUpdate = async (update) => {
+      if (!update) return
+      if (update.stats) setPartnerStats(update.stats)
+      if ('landmarks' in update) partnerLandmarksRef.current = update.landmarks
+      if (update.thumbnail) partnerThumbRef.current = await createImageBitmap(update.thumbnail)
+      setPartnerActive(true)
+      repaint()
+    }
+
+    const dropPartner = () => {
+      partnerLandmarksRef.current = null
+      partnerThumbRef.current = null
+      setPartnerActive(false)
+    }
+
+    // A. Shared backend relay (every partner's VITE_RELAY_URL points at the same server)
+    if (RELAY_URL) {
+      let retryTimer = null;
+      let socket = null;
+      const decoder = new RelayDecoder();
+      const name = encodeURIComponent(session.user.email || 'partner');
+
+      const connectToRelay = () => {
+        if (!isMounted) return;
+        console.log(`📡 Connecting to Relay: room ${roomId}`);
+
+        socket = new WebSocket(`${RELAY_URL}/ws/coop/${encodeURIComponent(roomId)}?name=${name}`);
+        socket.binaryType = 'arraybuffer';
+        const link = {
+          ready: () => socket.readyState === WebSocket.OPEN,
+          sendPose: (landmarks, stats) => socket.send(encodePose(landmarks, stats)),
+          sendThumbnail: (dataUrl) => socket.send(encodeThumbnail(dataUrl)),
+        };
+
+        socket.onopen = () => console.log("✅ Joined Relay Room");
+
+        socket.onmessage = (event) => {
+          if (typeof event.data === 'string') {
+            // Roster update: drop the partner view when we're alone again
+            const { members } = JSON.parse(event.data)
+            if (members.length < 2) dropPartner()
+            return
+          }
+          applyUpdate(decoder.handle(event.data))
+        };
+
+        socket.onclose = () => {
+          if (partnerLinkRef.current === link) partnerLinkRef.current = null;
+          // Reconnect after a short pause unless we're leaving the page
+          if (isMounted) retryTimer = setTimeout(connectToRelay, 1000);
+        };
 
+        partnerLinkRef.current = link;
+      };
+
+      connectToRelay();
+
+      return () => {
+        isMounted = false;
+        clearTimeout(retryTimer);
+        partnerLinkRef.current = null;
+        if (socket) socket.close();
+      };
+    }
+
+    // B. Supabase broadcast (no shared backend needed)
+    const channelName = `room:${roomId}`;
+    let channel = null;
+
+    const connectToChannel = () => {
+      if (!isMounted) return;
       console.log(`📡 Connecting to Relay: ${channelName}`);
 
-      const channel = supabase.channel(channelName, {
+      channel = supabase.channel(channelName, {
         config: {
           broadcast: { self: false, ack: false } // ack: false makes it faster
         }
       });
 
       channel
-        .on('broadcast', { event: 'frame' }, (payload) => {
-          // RECEIVED PARTNER FRAME
-          if (payload.payload?.image) {
-            setPartnerImage(payload.payload.image)
-          }
+        .on('broadcast', { event: 'pose' }, ({ payload }) => {
+          applyUpdate({ landmarks: unpackLandmarks(payload?.landmarks), stats: payload?.stats })
+        })
+        .on('broadcast', { event: 'thumbnail' }, async ({ payload }) => {
+          if (payload?.image) applyUpdate({ thumbnail: await (await fetch(payload.image)).blob() })
         })
         .subscribe((status) => {
           if (status === 'SUBSCRIBED') {
@@ -103,21 +184,21 @@ const PoseSession = () => {
           }
         });
 
-      broadcastChannelRef.current = channel;
+      partnerLinkRef.current = {
+        ready: () => channel.state === 'joined',
+        sendPose: (landmarks, stats) => channel.send({ type: 'broadcast', event: 'pose', payload: { landmarks: landmarksToBase64(landmarks), stats } }),
+        sendThumbnail: (image) => channel.send({ type: 'broadcast', event: 'thumbnail', payload: { image } }),
+      };
     };
 
     // Safety Timer: Wait 100ms before connecting to prevent race conditions
-    const timer = setTimeout(() => {
-      connectToRelay();
-    }, 100);
+    const timer = setTimeout(connectToChannel, 100);
 
     return () => {
       isMounted = false;
       clearTimeout(timer);
-      if (broadcastChannelRef.current) {
-        supabase.removeChannel(broadcastChannelRef.current);
-        broadcastChannelRef.current = null;
-      }
+      partnerLinkRef.current = null;
+      if (channel) supabase.removeChannel(channel);
     };
   }, [roomId, session]);
 
@@ -125,33 +206,47 @@ const PoseSession = () => {
   useEffect(() => {
     runningRef.current = true
     
-    // Always connect to localhost:8000 because each laptop runs its own backend
-    ws.current = new WebSocket('ws://127.0.0.1:8000/ws/analyze')
-
-    ws.current.onopen = () => console.log('✅ Connected to Local AI')
+    // Always connect to localhost:8000 because each laptop runs its own backend.
+    // output=landmarks: no annotated JPEG to encode and ship back, we draw the skeleton here
+    const url = 'ws://127.0.0.1:8000/ws/analyze?output=landmarks'
 
-    ws.current.onmessage = (event) => {
+    const handleMessage = (event) => {
       try {
-        const response = JSON.parse(event.data)
+        let response
+        if (typeof event.data === 'string') {
+          response = JSON.parse(event.data)
+
+          // Control messages (e.g. flow/backpressure counters) carry no frame
+          if (response.type) {
+            // Don't upload frames faster than the server has granted us; they'd only be dropped
+            if (response.type === 'flow' && response.granted_fps) {
+              sendFpsRef.current = Math.min(MAX_FPS, response.granted_fps)
+            }
+            return
+          }
+        } else {
+          // Binary protocol: stats header + raw landmark bytes
+          response = decodeResult(event.data)
+        }
         
-        // 1. Update My Screen
-        if (response.image) setMyImage(response.image)
+        // 1. Update My Screen: my skeleton over the current webcam frame
+        if (myCanvasRef.current) {
+          drawSkeleton(myCanvasRef.current, unpackLandmarks(response.landmarks), webcamRef.current?.video)
+        }
+        setAiReady(true)
         if (response.stats) setMyStats(response.stats)
 
-        // 2. Broadcast to Partner (If in Co-op)
-        // We limit this to ~10fps to save bandwidth
+        // 2. Send landmarks + stats to Partner (If in Co-op), ~10fps
         const now = performance.now()
-        if (roomId && roomId !== 'solo' && broadcastChannelRef.current && (now - lastBroadcastRef.current > 100)) {
-          
-          // Only send if the channel is actually ready
-          const state = broadcastChannelRef.current.state;
-          if (state === 'joined') {
-             broadcastChannelRef.current.send({
-              type: 'broadcast',
-              event: 'frame',
-              payload: { image: response.image } // Send the processed AI image
-            })
-            lastBroadcastRef.current = now
+        const link = partnerLinkRef.current
+        if (link && link.ready() && (now - lastBroadcastRef.current > 100)) {
+          link.sendPose(response.landmarks, response.stats)
+          lastBroadcastRef.current = now
+
+          if (now - lastThumbRef.current > THUMBNAIL_INTERVAL && webcamRef.current) {
+            const thumb = webcamRef.current.getScreenshot({ width: 160, height: 120 })
+            if (thumb) link.sendThumbnail(thumb)
+            lastThumbRef.current = now
           }
         }
 
@@ -160,6 +255,27 @@ const PoseSession = () => {
       }
     }
 
+    // Ask for the binary protocol (raw JPEG up, raw landmarks down, no base64); a backend
+    // that doesn't speak it fails that handshake, so fall back to plain JSON frames
+    const connect = (binary) => {
+      const socket = binary ? new WebSocket(url, [SUBPROTOCOL]) : new WebSocket(url)
+      socket.binaryType = 'arraybuffer'
+      let opened = false
+
+      socket.onopen = () => {
+        opened = true
+        binaryRef.current = socket.protocol === SUBPROTOCOL
+        console.log(`✅ Connected to Local AI (${binaryRef.current ? 'binary' : 'JSON'} frames)`)
+      }
+      socket.onmessage = handleMessage
+      socket.onclose = () => {
+        if (binary && !opened && runningRef.current && ws.current === socket) connect(false)
+      }
+      ws.current = socket
+    }
+
+    connect(true)
+
     return () => {
       runningRef.current = false
       if (ws.current) ws.current.close()
@@ -169,8 +285,6 @@ const PoseSession = () => {
   // 4. Capture Loop (Send Webcam to Local Python)
   useEffect(() => {
     let rafId = null
-    const targetFps = 15 // Keep it smooth locally
-    const minInterval = 1000 / targetFps
 
     const loop = () => {
       if (!runningRef.current) return
@@ -180,15 +294,29 @@ const PoseSession = () => {
         ws.current && 
         ws.current.readyState === WebSocket.OPEN && 
         webcamRef.current && 
-        (now - lastSentRef.current >= minInterval)
+        (now - lastSentRef.current >= 1000 / sendFpsRef.current)
       ) {
-        const screenshot = webcamRef.current.getScreenshot()
-        if (screenshot) {
-          lastSentRef.current = now
-          ws.current.send(JSON.stringify({
-            image: screenshot,
-            mode: poseName
-          }))
+        if (binaryRef.current) {
+          // Raw JPEG bytes, straight from a canvas; the encode is async, so one at a time
+          if (!capturingRef.current) {
+            const socket = ws.current
+            lastSentRef.current = now
+            capturingRef.current = true
+            captureJpeg(webcamRef.current.video)
+              .then((jpeg) => {
+                if (jpeg && socket.readyState === WebSocket.OPEN) socket.send(encodeFrame(poseName, jpeg))
+              })
+              .finally(() => { capturingRef.current = false })
+          }
+        } else {
+          const screenshot = webcamRef.current.getScreenshot()
+          if (screenshot) {
+            lastSentRef.current = now
+            ws.current.send(JSON.stringify({
+              image: screenshot,
+              mode: poseName
+            }))
+          }
         }
       }
       rafId = requestAnimationFrame(loop)
@@ -250,7 +378,7 @@ const PoseSession = () => {
         <div className="pose-session-content">
           
           {/* VIDEO GRID */}
-          <div className={`pose-video-grid ${partnerImage ? 'dual-mode' : 'solo-mode'}`}>
+          <div className={`pose-video-grid ${partnerActive ? 'dual-mode' : 'solo-mode'}`}>
             
             {/* 1. MY FEED (Processed Locally) */}
             <div className="pose-feed-container">
@@ -264,22 +392,25 @@ const PoseSession = () => {
                   videoConstraints={videoConstraints}
                 />
                 
-                {myImage ? (
-                  <img src={myImage} alt="My AI Overlay" className="pose-stream-img" />
-                ) : (
-                  <div className="pose-loading">Starting AI...</div>
-                )}
+                <canvas
+                  ref={myCanvasRef}
+                  width={320}
+                  height={240}
+                  className="pose-stream-img"
+                  style={aiReady ? undefined : { display: 'none' }}
+                />
+                {!aiReady && <div className="pose-loading">Starting AI...</div>}
               </div>
             </div>
 
-            {/* 2. PARTNER FEED (Received via Supabase) */}
-            {partnerImage && (
+            {/* 2. PARTNER FEED (Skeleton drawn from relayed landmarks) */}
+            {partnerActive && (
               <div className="pose-feed-container">
                 <div className="pose-label" style={{color:'#4ade80'}}>
-                  {partnerName || 'Partner'}
+                  {partnerName || 'Partner'}{partnerStats.Status ? ` · ${partnerStats.Status}` : ''}
                 </div>
                 <div className="pose-video-wrapper">
-                  <img src={partnerImage} alt="Partner AI Overlay" className="pose-stream-img" />
+                  <canvas ref={partnerCanvasRef} width={320} height={240} className="pose-stream-img" />
                 </div>
               </div>
             )}
@@ -369,7 +369,7 @@ export default function Yoga() {
           </h1>
 
           <div className="yogaButtons">
-            {['tree', 'warrior', 'sphinx'].map(pose => (
+            {['tree', 'warrior', 'sphinx', 'auto'].map(pose => (
               <button 
                 key={pose} 
                 className="yogaBtn" 